@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException
+from starlette.responses import StreamingResponse
+import json
+
+from app.services.rag_service import answer as answer_question
+from app.transformers.llm_client import LLMError
+from app.utils.config import RAG_SEED_CONTEXTS, RAG_PROMPT_TOKENS
+
+router = APIRouter()
+
+@router.get("/answer")
+async def answer(q: str, k: int = RAG_SEED_CONTEXTS, budget: int = RAG_PROMPT_TOKENS, stream: bool = True):
+    """
+    Answer a question from the ingested decision contexts. Streams NDJSON
+    events (contexts, token..., done) by default; stream=false returns the
+    final event only.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty question")
+
+    if not stream:
+        try:
+            events = [event async for event in answer_question(q, k, budget)]
+        except LLMError as exc:
+            raise HTTPException(status_code=503, detail=str(exc))
+        return {**events[-1], "citations": events[0]["citations"]}
+
+    async def events():
+        try:
+            async for event in answer_question(q, k, budget):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except LLMError as exc:
+            yield json.dumps({"event": "error", "detail": str(exc), "status": 503}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
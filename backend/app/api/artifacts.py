@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException, Request
+from starlette.responses import FileResponse, Response
+
+from app.services.artifact_service import artifact_cache, is_artifact_key
+
+router = APIRouter()
+
+@router.get("/artifacts/{key}.pdf")
+async def artifact(key: str, request: Request, download: bool = False):
+    """
+    Serve a rendered PDF. Artifacts are content-addressed, so the key is a
+    strong ETag and the response can be cached forever; Range and If-Range
+    requests are handled by FileResponse.
+    """
+    if not is_artifact_key(key):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    path = artifact_cache.get(key)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        headers=headers,
+        filename=f"{key[:16]}.pdf",
+        content_disposition_type="attachment" if download else "inline",
+    )
+
+@router.get("/artifacts")
+async def artifacts_stats():
+    return artifact_cache.stats()
@@ -0,0 +1,39 @@
+import os
+import shutil
+
+from fastapi import APIRouter, UploadFile, File, HTTPException
+
+from app.services.batch_service import batch_manager
+from app.utils.config import MAX_UPLOAD_BYTES
+
+router = APIRouter()
+
+@router.post("/batch")
+async def submit_batch(files: list[UploadFile] = File(...)):
+    """
+    Bulk ingestion: any mix of PDF/DOCX/TXT files and zip archives. The
+    uploads are stored first, then processed in the background; poll
+    GET /batch/{batch_id} for progress and the final report.
+    """
+    batch_id, root = batch_manager.create()
+    for index, file in enumerate(files):
+        # 不同資料夾的同名檔案加上序號區分；沒有檔名的上傳依內容判斷格式
+        path = os.path.join(root, "uploads", f"{index:05d}-{os.path.basename(file.filename or '') or 'upload'}")
+        size = 0
+        with open(path, "wb") as f:
+            while chunk := await file.read(1024 * 1024):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    shutil.rmtree(root, ignore_errors=True)
+                    raise HTTPException(status_code=413, detail=f"{file.filename} exceeds the {MAX_UPLOAD_BYTES} byte limit")
+                f.write(chunk)
+
+    batch_manager.start(batch_id, root)
+    return {"batch_id": batch_id, "status": "running", "files": len(files)}
+
+@router.get("/batch/{batch_id}")
+async def batch_status(batch_id: str):
+    report = batch_manager.report(batch_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"batch_id": batch_id, **report}
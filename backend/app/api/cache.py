@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+from app.services.cache_service import extraction_cache
+
+router = APIRouter()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return extraction_cache.stats()
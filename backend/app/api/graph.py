@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException
+from app.services.graph_service import graph_store
+
+router = APIRouter()
+
+@router.get("/graph/boundaries")
+async def graph_boundaries(
+    boundary_type: str = None,
+    entity: str = None,
+    role: str = None,
+    document_id: str = None,
+):
+    return graph_store.boundaries(boundary_type, entity, role, document_id)
+
+@router.get("/graph/nodes/{node_id:path}")
+async def graph_node(node_id: str):
+    node = graph_store.node(node_id)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return node
+
+@router.get("/graph/stats")
+async def graph_stats():
+    return graph_store.stats()
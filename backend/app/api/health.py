@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from starlette.responses import JSONResponse
+
+from app.services.readiness import readiness
+
+router = APIRouter()
+
+@router.get("/ready")
+async def ready():
+    return JSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from app.services.job_service import job_queue, PIPELINES
+from app.utils.file_parser import UploadTooLarge
+
+router = APIRouter()
+
+@router.post("/jobs")
+async def submit_job(
+    file: UploadFile = File(...),
+    mode: str = Form("document"),
+    priority: int = Form(0),
+):
+    if mode not in PIPELINES:
+        return {"error": "Unsupported mode"}
+
+    try:
+        job_id = await job_queue.submit(file, mode, priority)
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return {
+        "job_id": job["id"],
+        "mode": job["mode"],
+        "filename": job["filename"],
+        "priority": job["priority"],
+        "status": job["status"],
+        "step": job["step"],
+        "error": job["error"],
+        "created": job["created"],
+        "updated": job["updated"],
+    }
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    result = job_queue.result(job_id)
+    output = PIPELINES[job["mode"]].output
+    return {"summary": result.get("summary"), "output": result.get(output)}
@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from starlette.responses import PlainTextResponse
+
+from app.services.artifact_service import artifact_cache
+from app.services.cache_service import extraction_cache
+from app.services.job_service import job_queue
+from app.services.memory_budget import memory_budget
+from app.utils import metrics
+
+router = APIRouter()
+
+# 佇列深度與快取命中率在抓取時才讀取，不在熱路徑上額外記錄
+metrics.Gauge("graphrag_job_queue_depth", "Jobs waiting for a worker.", function=job_queue.depth)
+metrics.Gauge("graphrag_memory_budget_used_bytes", "Upload memory reserved by in-flight requests.",
+              function=lambda: memory_budget.used)
+metrics.Counter("graphrag_extraction_cache_hits_total", "Extraction cache hits.", function=lambda: extraction_cache.hits)
+metrics.Counter("graphrag_extraction_cache_misses_total", "Extraction cache misses.", function=lambda: extraction_cache.misses)
+metrics.Gauge("graphrag_extraction_cache_hit_ratio", "Extraction cache hit ratio since start.",
+              function=lambda: extraction_cache.hits / ((extraction_cache.hits + extraction_cache.misses) or 1))
+metrics.Counter("graphrag_pdf_artifact_hits_total", "Rendered PDFs served from the artifact cache.", function=lambda: artifact_cache.hits)
+metrics.Counter("graphrag_pdf_artifact_misses_total", "PDFs rendered because no cached artifact matched.", function=lambda: artifact_cache.misses)
+metrics.Gauge("graphrag_pdf_artifact_bytes", "Disk used by cached PDFs.", function=lambda: artifact_cache.total)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,17 +1,102 @@
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, Request
 from app.pipelines.context import PipelineContext
 from app.pipelines.document_pipeline import DocumentPipeline
-from starlette.responses import StreamingResponse
+from app.pipelines.meeting_minutes import MeetingMinutesPipeline
+from starlette.responses import StreamingResponse, Response, JSONResponse
 from app.services.pdf_service import decision_to_view, decision_pdf
+from app.services.memory_budget import MemoryBudgetExceeded
+from app.utils.file_parser import UploadTooLarge, NoExtractableText
+from app.utils.config import MEMORY_WAIT_TIMEOUT
+from app.utils.metrics import REQUEST_LATENCY
+import asyncio
 import io
+import json
 import os
+import time
 
 router = APIRouter()
 
+async def run_until_disconnect(request: Request, coro, poll_interval: float = 1.0):
+    """Run coro, cancelling it if the HTTP client goes away before it finishes."""
+    task = asyncio.ensure_future(coro)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=poll_interval)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            return None
+
+def server_timing(metrics: dict) -> str:
+    """Per-step wall times as a Server-Timing header value."""
+    return ", ".join(
+        f"{name};dur={step['wall_s'] * 1000:.1f}"
+        for name, step in metrics["steps"].items()
+        if "wall_s" in step
+    )
+
+def error_status(exc: BaseException):
+    """HTTP status for errors that are the client's or the server's capacity, else None."""
+    if isinstance(exc, UploadTooLarge):
+        return 413
+    if isinstance(exc, NoExtractableText):
+        return 422
+    if isinstance(exc, MemoryBudgetExceeded):
+        return 503
+    return None
+
+def stream_pipeline(pipeline, ctx: PipelineContext, mode: str) -> StreamingResponse:
+    """
+    Run the pipeline in the background and stream its events as NDJSON:
+    progress events per step, each decision context as soon as the model has
+    finished it, then a final result (or error) event.
+    """
+    queue = asyncio.Queue()
+    ctx.listener = queue.put_nowait
+
+    async def events():
+        started = time.perf_counter()
+        task = asyncio.ensure_future(pipeline.run(ctx))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+
+            if task.exception() is not None:
+                event = {"event": "error", "detail": str(task.exception())}
+                if status := error_status(task.exception()):
+                    event["status"] = status
+            else:
+                result = task.result()
+                event = {
+                    "event": "result",
+                    "summary": result.summary,
+                    "result_key": result.result_key,
+                    "output": getattr(result, pipeline.output),
+                    "metrics": result.metrics,
+                }
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+            REQUEST_LATENCY.observe(time.perf_counter() - started, mode=mode, stream="true")
+        finally:
+            # 用戶端中途斷線時停止管線
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @router.post("/process")
 async def process(
+    request: Request,
     file: UploadFile = File(...),
     mode: str = Form("document"),
+    stream: bool = Form(False),
 ):
     ctx = None
     pipeline = None
@@ -19,12 +104,30 @@ async def process(
     if mode == "document":
         ctx = PipelineContext(file=file)
         pipeline = DocumentPipeline()
+    elif mode == "meeting":
+        ctx = PipelineContext(file=file)
+        pipeline = MeetingMinutesPipeline()
     else:
         return {"error": "Unsupported mode"}
 
-    result = await pipeline.run(ctx)
+    if stream:
+        return stream_pipeline(pipeline, ctx, mode)
+
+    started = time.perf_counter()
+    try:
+        result = await run_until_disconnect(request, pipeline.run(ctx))
+    except (UploadTooLarge, NoExtractableText, MemoryBudgetExceeded) as exc:
+        headers = {"Retry-After": str(MEMORY_WAIT_TIMEOUT)} if isinstance(exc, MemoryBudgetExceeded) else None
+        return JSONResponse({"detail": str(exc)}, status_code=error_status(exc), headers=headers)
+    if result is None:
+        # 用戶端已斷線，回應不會被讀取
+        return Response(status_code=499)
+    REQUEST_LATENCY.observe(time.perf_counter() - started, mode=mode, stream="false")
 
-    return result.pdf_json
+    return JSONResponse(
+        getattr(result, pipeline.output),
+        headers={"Server-Timing": server_timing(result.metrics)},
+    )
     # return StreamingResponse(
     #     io.BytesIO(result.pdf_bytes),
     #     media_type="application/pdf",
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from app.services.vector_service import vector_index
+from app.services.graph_service import graph_store, context_node
+
+router = APIRouter()
+
+@router.get("/query")
+async def query(q: str, k: int = 10, alpha: float = None):
+    kwargs = {} if alpha is None else {"alpha": alpha}
+    results = vector_index.search(q, k, **kwargs)
+    for result in results:
+        node = graph_store.nodes.get(context_node(result["document_key"], result["context_id"]))
+        result["context"] = node["context"] if node else None
+    return results
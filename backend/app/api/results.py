@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException
+
+from app.services.artifact_service import artifact_cache, artifact_url
+from app.services.pdf_service import decision_to_view
+from app.services.result_service import result_store, LEVELS
+
+router = APIRouter()
+
+@router.get("/results")
+async def results(offset: int = 0, limit: int = 100, latest: bool = True):
+    return result_store.catalog(offset, limit, latest)
+
+@router.get("/results/stats")
+async def results_stats():
+    return result_store.stats()
+
+@router.get("/results/contexts")
+async def results_contexts(decision_level: str = None, offset: int = 0, limit: int = 100):
+    """Stored contexts across all documents, filtered by decision level."""
+    if decision_level is not None and decision_level not in LEVELS:
+        raise HTTPException(status_code=400, detail=f"decision_level must be one of {', '.join(LEVELS)}")
+    rows = result_store.scan(decision_level, offset=offset, limit=limit)
+    return [
+        {"key": entry["key"], "document_id": entry["document_id"], "context": context}
+        for entry, context in rows
+    ]
+
+@router.get("/results/{key}")
+async def result(key: str, contexts: bool = True):
+    entry = result_store.entry(key)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    if not contexts:
+        return entry
+    return {**entry, "contexts": list(result_store.iter_contexts(key))}
+
+@router.get("/results/{key}/contexts/{index}")
+async def result_context(key: str, index: int):
+    context = result_store.context(key, index)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Context not found")
+    return context
+
+@router.post("/results/{key}/render")
+async def render_result(key: str):
+    """PDF of a stored result, without calling the model (rendered only if not cached)."""
+    summary = result_store.load_summary(key)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    artifact = await artifact_cache.render(decision_to_view(summary))
+    return {"key": key, "pdf_json": artifact_url(artifact)}
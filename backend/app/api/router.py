@@ -1,5 +1,25 @@
 from fastapi import APIRouter
 from .process import router as process_router
+from .cache import router as cache_router
+from .jobs import router as jobs_router
+from .graph import router as graph_router
+from .query import router as query_router
+from .answer import router as answer_router
+from .results import router as results_router
+from .artifacts import router as artifacts_router
+from .batch import router as batch_router
+from .health import router as health_router
+from .metrics import router as metrics_router
 
 router = APIRouter()
-router.include_router(process_router, prefix="/api")
\ No newline at end of file
+router.include_router(process_router, prefix="/api")
+router.include_router(cache_router, prefix="/api")
+router.include_router(jobs_router, prefix="/api")
+router.include_router(graph_router, prefix="/api")
+router.include_router(query_router, prefix="/api")
+router.include_router(answer_router, prefix="/api")
+router.include_router(results_router, prefix="/api")
+router.include_router(artifacts_router, prefix="/api")
+router.include_router(batch_router, prefix="/api")
+router.include_router(health_router, prefix="/api")
+router.include_router(metrics_router)
@@ -0,0 +1,122 @@
+import asyncio
+import inspect
+import time
+
+from app.pipelines.context import PipelineContext
+from app.services.worker_pool import run_cpu, measured_call
+from app.utils.metrics import STEP_DURATION
+
+
+def step(inputs=(), outputs=(), timeout=None, retries=0):
+    """
+    Declare which PipelineContext attributes a step reads and writes. The
+    pipeline runs a step once every earlier step producing one of its
+    inputs has finished, so independent steps run concurrently.
+    """
+    def decorate(fn):
+        fn.inputs = tuple(inputs)
+        fn.outputs = tuple(outputs)
+        fn.timeout = timeout
+        fn.retries = retries
+        return fn
+    return decorate
+
+
+def step_name(fn) -> str:
+    return fn.__name__.removesuffix("_step")
+
+
+class Pipeline:
+    steps = []
+    output = None   # PipelineContext attribute returned to the client
+
+    def dependencies(self) -> dict:
+        """Step name -> names of earlier steps that produce one of its inputs."""
+        deps = {}
+        for i, fn in enumerate(self.steps):
+            deps[step_name(fn)] = {
+                step_name(earlier)
+                for earlier in self.steps[:i]
+                if set(getattr(earlier, "outputs", ())) & set(getattr(fn, "inputs", ()))
+            }
+        return deps
+
+    async def run(self, ctx: PipelineContext, skip=(), on_step=None) -> PipelineContext:
+        """
+        Run the step graph. Steps named in `skip` are treated as already
+        done; on_step(name, outputs) is called after each step with the
+        values it produced. Per-step wall time and CPU time are recorded in
+        ctx.metrics, plus how far a process-pool step raised its worker's
+        peak RSS.
+        """
+        deps = self.dependencies()
+        by_name = {step_name(fn): fn for fn in self.steps}
+        done = set(skip) & set(by_name)
+        running = {}
+        ctx.metrics = {"steps": {}}
+        started = time.perf_counter()
+
+        try:
+            while len(done) < len(by_name):
+                for name, fn in by_name.items():
+                    if name not in done and name not in running and deps[name] <= done:
+                        running[name] = asyncio.ensure_future(self._run_step(name, fn, ctx))
+
+                finished, _ = await asyncio.wait(running.values(), return_when=asyncio.FIRST_COMPLETED)
+                for name in [n for n, task in running.items() if task in finished]:
+                    running.pop(name).result()
+                    done.add(name)
+                    if on_step:
+                        on_step(name, {k: getattr(ctx, k, None) for k in getattr(by_name[name], "outputs", ())})
+        finally:
+            # 某一步失敗時取消其他仍在執行的步驟
+            for task in running.values():
+                task.cancel()
+            ctx.metrics["wall_s"] = round(time.perf_counter() - started, 4)
+        return ctx
+
+    async def _run_step(self, name: str, fn, ctx: PipelineContext):
+        ctx.emit("progress", step=name, status="started")
+        metrics = {"attempts": 0}
+        ctx.metrics["steps"][name] = metrics
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        retries = getattr(fn, "retries", 0)
+        for attempt in range(retries + 1):
+            metrics["attempts"] = attempt + 1
+            try:
+                await asyncio.wait_for(self._call(fn, ctx, metrics), getattr(fn, "timeout", None))
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if attempt == retries:
+                    metrics["status"] = "failed"
+                    STEP_DURATION.observe(time.perf_counter() - wall, pipeline=type(self).__name__, step=name, status="failed")
+                    raise
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+        metrics["status"] = "completed"
+        metrics["wall_s"] = round(time.perf_counter() - wall, 4)
+        STEP_DURATION.observe(metrics["wall_s"], pipeline=type(self).__name__, step=name, status="completed")
+        # 行程內步驟的 CPU 時間包含同時執行的其他步驟，僅供參考
+        metrics.setdefault("cpu_s", round(time.process_time() - cpu, 4))
+        ctx.emit("progress", step=name, status="completed")
+
+    async def _call(self, fn, ctx: PipelineContext, metrics: dict):
+        if getattr(fn, "cpu_bound", False):
+            # CPU 密集步驟交給 process pool，避免卡住事件迴圈
+            args = [getattr(ctx, name) for name in fn.inputs]
+            result, cpu_s, rss_growth = await run_cpu(measured_call, fn, *args)
+            setattr(ctx, fn.output, result)
+            metrics["cpu_s"] = round(cpu_s, 4)
+            metrics["peak_rss_growth_mb"] = rss_growth
+            return
+
+        if inspect.iscoroutinefunction(fn):
+            await fn(ctx)
+        else:
+            # 同步步驟（檔案、SQLite、numpy）在執行緒中跑，其他步驟與請求不會被卡住；
+            # 逾時只會停止等待，執行緒本身會跑完
+            await asyncio.to_thread(fn, ctx)
@@ -1,7 +1,35 @@
+from app.utils.file_parser import ParsedDocument
+
+
 class PipelineContext:
-    def __init__(self, file=None, text=None):
+    # Fields that make up the persistable result of each step
+    STATE_FIELDS = ("raw_text", "content_hash", "transcript", "summary", "revision_key", "result_key", "pdf_json", "docx_path")
+
+    def __init__(self, file=None, text=None, listener=None):
         self.file = file          # UploadFile
+        self.document = None      # ParsedDocument: page texts and offsets
         self.raw_text = None      # Extracted text from the file
+        self.content_hash = None  # sha256 of the uploaded bytes
+        self.transcript = None    # Meeting transcript segments (speaker, start, end, text)
         self.summary = None       # LLM-generated summary
+        self.revision_key = None  # Document the summary is a revision of, in the revision store
+        self.result_key = None    # Key of the summary in the result store
         self.pdf_bytes = None     # PDF bytes of the summary
-        self.pdf_json = None      # PDF JSON structure for viewer
\ No newline at end of file
+        self.pdf_json = None      # PDF JSON structure for viewer
+        self.docx_path = None     # Exported meeting minutes
+        self.listener = listener  # Optional callback receiving progress events
+        self.metrics = None       # Per-step wall time, CPU time and peak RSS
+
+    def emit(self, event: str, **data):
+        if self.listener is not None:
+            self.listener({"event": event, **data})
+
+    def state(self) -> dict:
+        return {name: getattr(self, name) for name in self.STATE_FIELDS}
+
+    def restore(self, state: dict):
+        for name, value in state.items():
+            if name in self.STATE_FIELDS:
+                setattr(self, name, value)
+        if self.document is None and self.raw_text is not None:
+            self.document = ParsedDocument.from_text(self.raw_text)
@@ -1,21 +1,20 @@
 from app.pipelines.steps.parse import parse_step
 from app.pipelines.steps.summarize import summarize_step
+from app.pipelines.steps.graph import graph_step
+from app.pipelines.steps.index import index_step
+from app.pipelines.steps.store import store_step
 from app.pipelines.steps.pdf import pdf_step
-from app.pipelines.context import PipelineContext
+from app.pipelines.base import Pipeline
+
+class DocumentPipeline(Pipeline):
+    output = "pdf_json"
 
-class DocumentPipeline:
     def __init__(self):
         self.steps = [
             parse_step,
             summarize_step,
+            graph_step,
+            index_step,
+            store_step,
             pdf_step,
         ]
-
-    async def run(self, ctx: PipelineContext) -> PipelineContext:
-        for step in self.steps:
-            result = step(ctx)
-            if hasattr(result, "__await__"):
-                ctx = await result
-            else:
-                ctx = result
-        return ctx
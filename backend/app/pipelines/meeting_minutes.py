@@ -1,7 +1,14 @@
-class MeetingMinutesPipeline:
-    steps = [
-        "speech_to_text",
-        "clean_text",
-        "summarize",
-        "export_docx"
-    ]
+from app.pipelines.steps.speech import speech_to_text_step
+from app.pipelines.steps.summarize import summarize_step
+from app.pipelines.steps.docx import export_docx_step
+from app.pipelines.base import Pipeline
+
+class MeetingMinutesPipeline(Pipeline):
+    output = "docx_path"
+
+    def __init__(self):
+        self.steps = [
+            speech_to_text_step,   # 串流解碼、分段、轉錄與文字清理同時進行
+            summarize_step,
+            export_docx_step,
+        ]
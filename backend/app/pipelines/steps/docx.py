@@ -0,0 +1,7 @@
+from app.services.docx_service import minutes_docx
+from app.services.worker_pool import cpu_bound
+from app.utils.config import RENDER_TIMEOUT
+
+@cpu_bound(inputs=("summary", "transcript"), output="docx_path", timeout=RENDER_TIMEOUT, retries=1)
+def export_docx_step(summary: dict, transcript: list):
+    return minutes_docx(summary, transcript)
@@ -0,0 +1,8 @@
+from app.services.graph_service import graph_store
+from app.pipelines.context import PipelineContext
+from app.pipelines.base import step
+
+@step(inputs=("summary", "revision_key"))
+def graph_step(ctx: PipelineContext):
+    graph_store.ingest(ctx.summary, ctx.revision_key)
+    return ctx
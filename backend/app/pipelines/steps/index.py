@@ -0,0 +1,8 @@
+from app.services.vector_service import vector_index
+from app.pipelines.context import PipelineContext
+from app.pipelines.base import step
+
+@step(inputs=("summary", "revision_key"))
+def index_step(ctx: PipelineContext):
+    vector_index.add_summary(ctx.summary, ctx.revision_key)
+    return ctx
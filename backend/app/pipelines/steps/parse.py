@@ -1,7 +1,16 @@
-from app.utils.file_parser import parse_file
+from app.utils.file_parser import spool_upload, parse_upload
 from app.pipelines.context import PipelineContext
+from app.pipelines.base import step
+from app.utils.config import PARSE_TIMEOUT
 
+@step(inputs=("file",), outputs=("document", "raw_text", "content_hash"), timeout=PARSE_TIMEOUT)
 async def parse_step(ctx: PipelineContext):
     if ctx.file:
-        ctx.raw_text = await parse_file(ctx.file)
+        upload = await spool_upload(ctx.file)
+        try:
+            ctx.content_hash = upload.sha256
+            ctx.document = await parse_upload(upload)
+        finally:
+            upload.close()
+        ctx.raw_text = ctx.document.text
     return ctx
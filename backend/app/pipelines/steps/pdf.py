@@ -1,6 +1,12 @@
-from app.services.pdf_service import decision_pdf
+from app.services.artifact_service import artifact_cache, artifact_url
+from app.services.pdf_service import decision_to_view
 from app.pipelines.context import PipelineContext
+from app.pipelines.base import step
+from app.utils.config import RENDER_TIMEOUT
 
-def pdf_step(ctx: PipelineContext):
-    ctx.pdf_json = decision_pdf(ctx.summary)
-    return ctx
\ No newline at end of file
+# 算圖在 process pool 中進行；相同內容的 PDF 直接取用快取
+@step(inputs=("summary",), outputs=("pdf_json",), timeout=RENDER_TIMEOUT, retries=1)
+async def pdf_step(ctx: PipelineContext):
+    key = await artifact_cache.render(decision_to_view(ctx.summary))
+    ctx.pdf_json = artifact_url(key)
+    return ctx
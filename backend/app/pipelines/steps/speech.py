@@ -0,0 +1,105 @@
+import asyncio
+
+from app.pipelines.context import PipelineContext
+from app.pipelines.base import step
+from app.sources.audio_source import AudioSource, SAMPLE_RATE
+from app.transformers.speakers import SpeakerTracker
+from app.transformers.text_cleaner import clean_segments
+from app.utils.file_parser import ParsedDocument, spool_upload
+from app.utils.config import MEETING_WINDOW_SECONDS, MEETING_WINDOW_OVERLAP
+
+def _format_segment(segment: dict) -> str:
+    minutes, seconds = divmod(int(segment["start"]), 60)
+    return f"{segment['speaker']} [{minutes // 60:02}:{minutes % 60:02}:{seconds:02}] {segment['text']}"
+
+def _midpoint(start: float, end: float) -> float:
+    return (start + end) / 2
+
+def _transcribe_window(start: float, waveform, keep_from: float = 0.0):
+    """
+    Diarize and transcribe one window. Turns centred before keep_from
+    (seconds into the window) belong to the previous window and are not
+    transcribed. Returns the segments on the meeting clock and the window's
+    {local speaker: embedding}.
+    """
+    # torch / whisper 只在會議模式才載入
+    from app.transformers.ASR import get_asr_service
+
+    service = get_asr_service()
+    turns, embeddings = service.diarize_speakers(waveform)
+    turns = [turn for turn in turns if _midpoint(turn[0], turn[1]) >= keep_from]
+    segments = service.transcribe_segments(waveform, turns)
+    for segment in segments:
+        segment["start"] += start
+        segment["end"] += start
+    return segments, embeddings
+
+@step(inputs=("file",), outputs=("transcript", "document", "raw_text", "content_hash"))
+async def speech_to_text_step(ctx: PipelineContext):
+    """
+    Three overlapping stages joined by small bounded queues: ffmpeg decodes
+    window N+1 while window N is diarized and transcribed, and finished
+    windows are cleaned and emitted as transcript events.
+
+    Consecutive windows share MEETING_WINDOW_OVERLAP seconds. A turn in the
+    shared audio is kept by the window whose half of the overlap holds its
+    midpoint, so a turn cut by one window's edge is taken whole from the
+    other. Speakers are relabelled meeting-wide by matching each window's
+    speaker embeddings (SpeakerTracker).
+    """
+    upload = await spool_upload(ctx.file, threshold=0)
+    if not upload.spooled:
+        raise ValueError("Empty audio upload")
+    ctx.content_hash = upload.sha256
+    path = upload.source
+
+    overlap = min(MEETING_WINDOW_OVERLAP, MEETING_WINDOW_SECONDS / 2)
+    decoded = asyncio.Queue(maxsize=2)
+    transcribed = asyncio.Queue(maxsize=2)
+
+    async def decode():
+        async for window in AudioSource(path, MEETING_WINDOW_SECONDS, overlap).windows():
+            await decoded.put(window)
+        await decoded.put(None)
+
+    async def transcribe():
+        speakers = SpeakerTracker()
+        held = []
+        while (window := await decoded.get()) is not None:
+            start, waveform = window
+            keep_from = overlap / 2 if start > 0 else 0.0
+            segments, embeddings = await asyncio.to_thread(_transcribe_window, start, waveform, keep_from)
+            labels = speakers.assign(embeddings)
+            for segment in segments:
+                segment["speaker"] = labels.get(segment["speaker"], segment["speaker"])
+            # 落在視窗結尾 overlap 後半段的段落屬於下一個視窗；最後一個視窗則全部保留
+            cut = start + len(waveform) / SAMPLE_RATE - overlap / 2
+            await transcribed.put([s for s in segments if _midpoint(s["start"], s["end"]) < cut])
+            held = [s for s in segments if _midpoint(s["start"], s["end"]) >= cut]
+        if held:
+            await transcribed.put(held)
+        await transcribed.put(None)
+
+    async def clean():
+        transcript = []
+        while (segments := await transcribed.get()) is not None:
+            for segment in clean_segments(segments):
+                transcript.append(segment)
+                ctx.emit("transcript", segment=segment)
+        return transcript
+
+    try:
+        # TaskGroup：任一階段失敗時取消其他階段（包含 ffmpeg）
+        async with asyncio.TaskGroup() as group:
+            group.create_task(decode())
+            group.create_task(transcribe())
+            cleaning = group.create_task(clean())
+        ctx.transcript = cleaning.result()
+    except ExceptionGroup as group:
+        raise group.exceptions[0]
+    finally:
+        upload.close()
+
+    ctx.raw_text = "\n".join(_format_segment(s) for s in ctx.transcript)
+    ctx.document = ParsedDocument([ctx.raw_text])
+    return ctx
@@ -0,0 +1,8 @@
+from app.services.result_service import result_store
+from app.pipelines.context import PipelineContext
+from app.pipelines.base import step
+
+@step(inputs=("summary", "revision_key"), outputs=("result_key",))
+def store_step(ctx: PipelineContext):
+    ctx.result_key = result_store.put(ctx.summary, ctx.content_hash, ctx.revision_key)
+    return ctx
@@ -1,6 +1,69 @@
-from app.transformers.summarizer import summarize
+import asyncio
+
+from app.transformers.chunking import chunk_document
+from app.transformers.summarizer import summarize_chunks, extraction_key
+from app.services.cache_service import extraction_cache
+from app.services.revision_service import revision_store
 from app.pipelines.context import PipelineContext
+from app.pipelines.base import step
+from app.utils.file_parser import ParsedDocument, NoExtractableText
+
+# 同一份內容同時上傳時只呼叫一次模型：key -> [task, 等待中的請求數]
+_inflight = {}
+
+async def _extract(key: str, document: ParsedDocument, on_context) -> tuple:
+    """(summary, doc_key of the document in the revision store)."""
+    try:
+        # 已知文件的新版本：只重新擷取內容有變動的區塊
+        chunks = chunk_document(document)
+        doc_key, known = revision_store.find_revision(chunks)
+        summary, results = await summarize_chunks(chunks, on_context=on_context, known=known)
+        doc_key = revision_store.save(summary, results, doc_key)
+        extraction_cache.put(key, summary)
+        return summary, doc_key
+    finally:
+        _inflight.pop(key, None)
+
+def _emit_context(ctx: PipelineContext, context: dict):
+    ctx.emit("context", context=context)
+
+def _revision_key(document: ParsedDocument, summary: dict):
+    return revision_store.document_key(chunk_document(document), summary.get("document_metadata") or {})
 
+@step(inputs=("document", "raw_text"), outputs=("summary", "revision_key"))
 async def summarize_step(ctx: PipelineContext):
-    ctx.summary = await summarize(ctx.raw_text)
+    # 空白上傳或純掃描檔：沒有區塊可擷取，也就沒有 document_metadata
+    if not ctx.raw_text.strip():
+        raise NoExtractableText("No extractable text in the upload")
+
+    key = extraction_key(ctx.raw_text)
+
+    cached = extraction_cache.get(key)
+    if cached is not None:
+        ctx.summary = cached
+        ctx.revision_key = await asyncio.to_thread(_revision_key, ctx.document, cached)
+        for context in cached.get("contexts", []):
+            _emit_context(ctx, context)
+        return ctx
+
+    entry = _inflight.get(key)
+    owner = entry is None
+    if owner:
+        on_context = lambda context: _emit_context(ctx, context)
+        entry = [asyncio.ensure_future(_extract(key, ctx.document, on_context)), 0]
+        _inflight[key] = entry
+    entry[1] += 1
+    try:
+        ctx.summary, ctx.revision_key = await asyncio.shield(entry[0])
+    except asyncio.CancelledError:
+        # 最後一個等待者離開（例如用戶端斷線）時才取消模型呼叫
+        if entry[1] == 1:
+            entry[0].cancel()
+        raise
+    finally:
+        entry[1] -= 1
+
+    if not owner:
+        for context in ctx.summary.get("contexts", []):
+            _emit_context(ctx, context)
     return ctx
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from app.services.pdf_service import view_key, render_file
+from app.services.worker_pool import run_cpu
+from app.utils.config import ARTIFACT_DIR, ARTIFACT_MAX_BYTES, RENDER_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_KEY = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_artifact_key(key: str) -> bool:
+    return bool(_KEY.match(key))
+
+
+def artifact_url(key: str) -> str:
+    return f"/api/artifacts/{key}.pdf"
+
+
+class ArtifactCache:
+    """
+    Content-addressed cache of rendered PDFs, one file per view hash.
+
+    Renders of the same view are coalesced and run in the process pool;
+    later requests for it are served from disk without touching reportlab.
+    Total size is kept under max_bytes by evicting the least recently used
+    files; file mtimes carry the recency across restarts.
+    """
+
+    def __init__(self, directory: str = ARTIFACT_DIR, max_bytes: int = ARTIFACT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self._sizes = OrderedDict()     # key -> bytes, least recently used first
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            found = []
+            for entry in os.scandir(self.directory):
+                key, ext = os.path.splitext(entry.name)
+                if ext == ".pdf" and is_artifact_key(key):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, key, stat.st_size))
+                elif entry.name.endswith(".tmp"):
+                    # 中斷的算圖留下的暫存檔
+                    os.remove(entry.path)
+            for _, key, size in sorted(found):
+                self._sizes[key] = size
+                self.total += size
+            self._loaded = True
+        self._evict()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str):
+        """Path of a cached artifact, marking it recently used, or None."""
+        self.load()
+        with self._lock:
+            if key not in self._sizes:
+                return None
+            self._sizes.move_to_end(key)
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # 被外部刪除
+            with self._lock:
+                self.total -= self._sizes.pop(key, 0)
+            return None
+        return path
+
+    async def render(self, view: dict) -> str:
+        """Key of the PDF for a view, rendering it only if it is not cached yet."""
+        key = view_key(view)
+        if self.get(key) is not None:
+            self.hits += 1
+            return key
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._render(key, view))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.hits += 1
+        # 一個請求被取消時不影響同一份 PDF 的其他等待者
+        await asyncio.shield(task)
+        return key
+
+    async def _render(self, key: str, view: dict):
+        size = await asyncio.wait_for(run_cpu(render_file, view, self.path(key)), RENDER_TIMEOUT)
+        with self._lock:
+            self._sizes[key] = size
+            self.total += size
+        self._evict(keep=key)
+
+    def _evict(self, keep: str = None):
+        removed = []
+        with self._lock:
+            for key in list(self._sizes):
+                if self.total <= self.max_bytes:
+                    break
+                if key == keep or key in self._inflight:
+                    continue
+                self.total -= self._sizes.pop(key)
+                removed.append(key)
+        for key in removed:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+        if removed:
+            logger.info("evicted rendered PDFs", extra={"count": len(removed), "total_bytes": self.total})
+
+    def stats(self) -> dict:
+        self.load()
+        return {"artifacts": len(self._sizes), "bytes": self.total, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+artifact_cache = ArtifactCache()
@@ -0,0 +1,420 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zipfile
+
+from starlette.datastructures import UploadFile
+
+from app.pipelines.context import PipelineContext
+from app.pipelines.document_pipeline import DocumentPipeline
+from app.transformers.llm_router import llm_router
+from app.utils.config import BATCH_DIR, BATCH_QUEUE_SIZE, PROCESS_POOL_WORKERS
+from app.utils import parsers
+from app.utils.file_parser import spool_upload, parse_upload
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED = parsers.extensions()
+
+
+def iter_sources(paths: list):
+    """
+    Yield (name, opener) for every supported document under the given
+    files, directories and zip archives. opener() returns (binary file, size).
+    Files named explicitly are always yielded and recognised by content;
+    inside directories and archives only known extensions are picked up.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    full = os.path.join(root, filename)
+                    if filename.lower().endswith(SUPPORTED):
+                        yield os.path.relpath(full, path), _file_opener(full)
+                    elif filename.lower().endswith(".zip"):
+                        yield from _zip_sources(full, os.path.relpath(full, path))
+        elif path.lower().endswith(".zip"):
+            yield from _zip_sources(path, os.path.basename(path))
+        else:
+            yield os.path.basename(path), _file_opener(path)
+
+
+def _file_opener(path: str):
+    return lambda: (open(path, "rb"), os.path.getsize(path))
+
+
+class _Archive:
+    """
+    A zip archive shared by the openers of its members. It is closed once
+    the listing is done and every listed member has been opened; members
+    still being read keep the file open until they are closed themselves.
+    """
+
+    def __init__(self, path: str):
+        self.zip = zipfile.ZipFile(path)
+        self.pending = 0
+        self.listed = False
+        self._lock = threading.Lock()   # opener 在 worker 執行緒中呼叫
+
+    def opener(self, info: zipfile.ZipInfo):
+        with self._lock:
+            self.pending += 1
+
+        def open_member():
+            with self._lock:
+                stream = self.zip.open(info)
+                self.pending -= 1
+                self._maybe_close()
+            return stream, info.file_size
+        return open_member
+
+    def done(self):
+        with self._lock:
+            self.listed = True
+            self._maybe_close()
+
+    def _maybe_close(self):
+        if self.listed and not self.pending:
+            self.zip.close()
+
+
+def _zip_sources(path: str, prefix: str):
+    # ZipFile 支援同時開啟多個成員，各文件直接從壓縮檔串流讀取，不先解壓到磁碟
+    archive = _Archive(path)
+    try:
+        for info in archive.zip.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(SUPPORTED):
+                yield f"{prefix}/{info.filename}", archive.opener(info)
+    finally:
+        archive.done()
+
+
+class Checkpoint:
+    """
+    Append-only JSONL record of finished documents, keyed by content hash,
+    so a restarted backfill skips what is done (and identical files are
+    processed once). Failed documents are retried on the next run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        if record["status"] == "completed":
+                            self.done[record["sha256"]] = record
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, record: dict):
+        if record["status"] == "completed":
+            self.done[record["sha256"]] = record
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _Stage:
+    """
+    Worker count and busy time of one pipeline stage, for the utilization
+    report. `steps` splits the busy time by the DocumentPipeline steps the
+    stage runs; steps running concurrently both count their full wall time.
+    """
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.busy = 0.0
+        self.count = 0
+        self.steps = {}
+
+    def add_steps(self, metrics: dict):
+        for name, step in metrics.get("steps", {}).items():
+            self.steps[name] = self.steps.get(name, 0.0) + step.get("wall_s", 0.0)
+
+    def report(self, wall: float) -> dict:
+        return {
+            "workers": self.workers,
+            "documents": self.count,
+            "busy_s": round(self.busy, 3),
+            "utilization": round(self.busy / (self.workers * wall), 3) if wall else 0.0,
+            "steps_busy_s": {name: round(seconds, 3) for name, seconds in self.steps.items()},
+        }
+
+
+class BatchIngest:
+    """
+    Bulk document ingestion as three stages joined by bounded queues:
+
+        parse (CPU, one worker per core) -> summarize (one per LLM slot)
+        -> store: graph / index / store / pdf (one worker per core)
+
+    Parsing runs ahead of the model by at most BATCH_QUEUE_SIZE documents
+    per LLM slot, so the LLM never waits for parsing and memory stays
+    bounded. The per-document steps are the DocumentPipeline steps, split
+    with `skip`, so a batch produces exactly what /api/process would.
+
+    In the store stage graph, index and store run in threads and pdf in the
+    process pool, so the stage's workers really overlap; but the graph,
+    index and result stores each serialize their writes behind one lock, so
+    a store stage near full utilization is usually waiting on one of them.
+    The report's per-step busy times (steps_busy_s) show which.
+    """
+
+    def __init__(self, sources, out_dir: str, parse_workers: int = None, llm_slots: int = None, store_workers: int = None):
+        self.sources = sources
+        self.out_dir = out_dir
+        self.results_dir = os.path.join(out_dir, "results")
+        os.makedirs(self.results_dir, exist_ok=True)
+        cores = PROCESS_POOL_WORKERS
+        slots = llm_slots or sum(b.max_concurrency for b in llm_router.backends)
+        self.stages = {
+            "parse": _Stage("parse", parse_workers or cores),
+            "summarize": _Stage("summarize", slots),
+            "store": _Stage("store", store_workers or cores),
+        }
+        self.checkpoint = Checkpoint(os.path.join(out_dir, "checkpoint.jsonl"))
+        self.pipeline = DocumentPipeline()
+        self.counts = {"total": 0, "completed": 0, "skipped": 0, "failed": 0}
+        self.failures = []
+        self.status = "pending"
+        self.started = None
+        self.finished = None
+        self._claimed = set()   # 本批次處理中的內容雜湊，重複檔案只處理一次
+
+    async def run(self) -> dict:
+        self.status = "running"
+        self.started = time.time()
+        sources = asyncio.Queue(maxsize=self.stages["parse"].workers * 2)
+        parsed = asyncio.Queue(maxsize=self.stages["summarize"].workers * BATCH_QUEUE_SIZE)
+        summarized = asyncio.Queue(maxsize=self.stages["store"].workers * 2)
+
+        async def feed():
+            for source in self.sources:
+                self.counts["total"] += 1
+                await sources.put(source)
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(self._stage(feed(), sources, self.stages["parse"], self._parse, parsed))
+                group.create_task(self._stage(None, parsed, self.stages["summarize"], self._summarize, summarized))
+                group.create_task(self._stage(None, summarized, self.stages["store"], self._store, None))
+            self.status = "completed"
+        except ExceptionGroup as group:
+            self.status = "failed"
+            raise group.exceptions[0]
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        finally:
+            self.finished = time.time()
+            self.checkpoint.close()
+            self._write_report()
+        return self.report()
+
+    async def _stage(self, producer, inbox: asyncio.Queue, stage: _Stage, handle, outbox):
+        """Run `stage.workers` workers over inbox, then pass the end marker on."""
+        async def worker():
+            while (item := await inbox.get()) is not None:
+                started = time.perf_counter()
+                result = await self._guard(handle, item)
+                stage.busy += time.perf_counter() - started
+                stage.count += 1
+                if result is not None and outbox is not None:
+                    await outbox.put(result)
+            # 結束標記交給同一階段的下一個 worker
+            await inbox.put(None)
+
+        if producer is not None:
+            async def produce():
+                await producer
+                await inbox.put(None)
+            await asyncio.gather(produce(), *(worker() for _ in range(stage.workers)))
+        else:
+            await asyncio.gather(*(worker() for _ in range(stage.workers)))
+        if outbox is not None:
+            await outbox.put(None)
+
+    async def _guard(self, handle, item):
+        """A failing document is recorded and dropped; it does not stop the batch."""
+        try:
+            return await handle(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            name = item[0] if isinstance(item, tuple) else item["name"]
+            sha256 = None if isinstance(item, tuple) else item["ctx"].content_hash
+            self._claimed.discard(sha256)
+            self.counts["failed"] += 1
+            self.failures.append({"name": name, "error": str(exc)})
+            self.checkpoint.record({"name": name, "sha256": sha256, "status": "failed", "error": str(exc)})
+            logger.warning("batch document failed", extra={"document": name, "error": str(exc)})
+            return None
+
+    async def _parse(self, source: tuple):
+        name, opener = source
+        started = time.perf_counter()
+        stream, size = await asyncio.to_thread(opener)
+        try:
+            upload = await spool_upload(UploadFile(stream, filename=name, size=size))
+        finally:
+            stream.close()
+        try:
+            if upload.sha256 in self.checkpoint.done or upload.sha256 in self._claimed:
+                self.counts["skipped"] += 1
+                return None
+            self._claimed.add(upload.sha256)
+            ctx = PipelineContext()
+            ctx.content_hash = upload.sha256
+            ctx.document = await parse_upload(upload)
+            ctx.raw_text = ctx.document.text
+        finally:
+            upload.close()
+        return {"name": name, "ctx": ctx, "started": started}
+
+    async def _summarize(self, item: dict):
+        await self.pipeline.run(item["ctx"], skip={"parse", "graph", "index", "store", "pdf"})
+        item["summarize"] = item["ctx"].metrics
+        self.stages["summarize"].add_steps(item["summarize"])
+        return item
+
+    async def _store(self, item: dict):
+        ctx = item["ctx"]
+        await self.pipeline.run(ctx, skip={"parse", "summarize"})
+        self.stages["store"].add_steps(ctx.metrics)
+        result_path = os.path.join(self.results_dir, f"{ctx.content_hash[:16]}.json")
+        steps = {**item["summarize"]["steps"], **ctx.metrics["steps"]}
+        with open(result_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"name": item["name"], "sha256": ctx.content_hash, "output": ctx.pdf_json, "summary": ctx.summary, "steps": steps},
+                f, ensure_ascii=False,
+            )
+        self.counts["completed"] += 1
+        self.checkpoint.record({
+            "name": item["name"],
+            "sha256": ctx.content_hash,
+            "status": "completed",
+            "result": result_path,
+            "output": ctx.pdf_json,
+            "result_key": ctx.result_key,
+            "contexts": len(ctx.summary.get("contexts", [])),
+            "wall_s": round(time.perf_counter() - item["started"], 3),
+        })
+        return item
+
+    def report(self) -> dict:
+        wall = (self.finished or time.time()) - self.started if self.started else 0.0
+        return {
+            "status": self.status,
+            "out_dir": self.out_dir,
+            **self.counts,
+            "wall_s": round(wall, 3),
+            "documents_per_minute": round(self.counts["completed"] / wall * 60, 2) if wall else 0.0,
+            "stages": {name: stage.report(wall) for name, stage in self.stages.items()},
+            "failures": self.failures,
+        }
+
+    def _write_report(self):
+        with open(os.path.join(self.out_dir, "report.json"), "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+class BatchManager:
+    """
+    Batches started through the API, run in the background one at a time per
+    id. Running batches are reported from memory; a finished batch is dropped
+    from memory and reported from the report.json it wrote.
+    """
+
+    def __init__(self, batch_dir: str = BATCH_DIR):
+        self.batch_dir = batch_dir
+        self.batches = {}
+        self._tasks = {}
+
+    def create(self) -> tuple:
+        batch_id = uuid.uuid4().hex
+        root = os.path.join(self.batch_dir, batch_id)
+        os.makedirs(os.path.join(root, "uploads"), exist_ok=True)
+        return batch_id, root
+
+    def start(self, batch_id: str, root: str) -> BatchIngest:
+        uploads = os.path.join(root, "uploads")
+        # 逐一列出上傳檔：明確指定的檔案依內容判斷格式，沒有副檔名的上傳也會處理
+        paths = [os.path.join(uploads, name) for name in sorted(os.listdir(uploads))]
+        batch = BatchIngest(iter_sources(paths), root)
+        self.batches[batch_id] = batch
+        task = asyncio.create_task(batch.run())
+        self._tasks[batch_id] = task
+        task.add_done_callback(lambda t: self._finished(batch_id))
+        return batch
+
+    def _finished(self, batch_id: str):
+        # run() 結束前已寫好 report.json，之後改由檔案回報
+        self._tasks.pop(batch_id, None)
+        self.batches.pop(batch_id, None)
+
+    def report(self, batch_id: str):
+        batch = self.batches.get(batch_id)
+        if batch is not None:
+            return batch.report()
+        path = os.path.join(self.batch_dir, batch_id, "report.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return None
+
+    async def stop(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+
+batch_manager = BatchManager()
+
+
+async def _main(args):
+    from app.services import worker_pool
+    from app.services.graph_service import graph_store
+    from app.services.vector_service import vector_index
+    from app.transformers.summarizer import load_assets
+
+    load_assets()
+    await asyncio.to_thread(graph_store.load)
+    await asyncio.to_thread(vector_index.load)
+    try:
+        batch = BatchIngest(iter_sources(args.paths), args.out, args.parse_workers, args.llm_slots, args.store_workers)
+        report = await batch.run()
+    finally:
+        await llm_router.aclose()
+        worker_pool.shutdown()
+    print(json.dumps({k: v for k, v in report.items() if k != "failures"}, indent=2))
+    for failure in report["failures"]:
+        print(f"[FAILED] {failure['name']}: {failure['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest documents from files, directories and zip archives.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--out", required=True, help="results, checkpoint and report; reuse it to resume")
+    parser.add_argument("--parse-workers", type=int)
+    parser.add_argument("--llm-slots", type=int, help="documents summarized at once (default: total backend capacity)")
+    parser.add_argument("--store-workers", type=int, help="documents in the graph / index / store / pdf stage at once")
+    args = parser.parse_args()
+
+    from app.utils.tracing import setup_logging
+    setup_logging()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
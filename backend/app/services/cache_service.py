@@ -0,0 +1,93 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.utils.config import CACHE_PATH, CACHE_MAX_ENTRIES
+
+
+class ExtractionCache:
+    """
+    Persistent content-addressed cache for extraction results.
+    Entries are evicted least-recently-used once max_entries is exceeded.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS extractions ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_extractions_access"
+                " ON extractions (last_access)"
+            )
+        return self._conn
+
+    def get(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE extractions SET last_access = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict):
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, value, last_access)"
+                " VALUES (?, ?, ?)",
+                (key, data, time.time()),
+            )
+            # LRU 淘汰：只保留最近使用的 max_entries 筆
+            conn.execute(
+                "DELETE FROM extractions WHERE key IN ("
+                " SELECT key FROM extractions ORDER BY last_access DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._connect().execute(
+                "SELECT COUNT(*) FROM extractions"
+            ).fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+extraction_cache = ExtractionCache()
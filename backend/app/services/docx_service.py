@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+
+import docx
+
+from app.utils.config import DATAPATH
+
+
+def _format_time(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes // 60:02}:{minutes % 60:02}:{secs:02}"
+
+
+def minutes_docx(summary: dict, transcript: list, output_dir: str = DATAPATH) -> str:
+    """
+    Write meeting minutes (decisions followed by the cleaned transcript) to a
+    .docx file. The name carries a hash of the content, so meetings with the
+    same (or no) document_id do not overwrite each other's minutes.
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    metadata = summary.get("document_metadata") or {}
+    document_id = metadata.get("document_id") or "meeting"
+    digest = hashlib.sha256(
+        json.dumps([summary, transcript], sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+    file_path = os.path.join(output_dir, f"{document_id}-{digest}-minutes.docx")
+
+    doc = docx.Document()
+    doc.add_heading(metadata.get("document_title") or "會議紀錄", level=0)
+
+    # 決策事項
+    doc.add_heading("決策事項", level=1)
+    for context in summary.get("contexts") or []:
+        title = context.get("title") or {}
+        doc.add_heading(
+            f"[{context.get('decision_level', '')}] {title.get('zh') or title.get('en', '')}",
+            level=2,
+        )
+        if context.get("primary_roles"):
+            doc.add_paragraph("主要角色: " + " • ".join(context["primary_roles"]))
+        for boundary in context.get("decision_boundaries") or []:
+            description = (boundary.get("description") or {}).get("zh", "")
+            doc.add_paragraph(f"{boundary.get('boundary_type', '未分類')}: {description}", style="List Bullet")
+
+    # 逐字稿
+    doc.add_heading("逐字稿", level=1)
+    for segment in transcript or []:
+        paragraph = doc.add_paragraph()
+        paragraph.add_run(
+            f"{segment['speaker']} [{_format_time(segment['start'])} - {_format_time(segment['end'])}] "
+        ).bold = True
+        paragraph.add_run(segment["text"])
+
+    # 先寫暫存檔再改名，讀取端不會看到寫到一半的檔案
+    tmp = f"{file_path}.{os.getpid()}.tmp"
+    try:
+        doc.save(tmp)
+        os.replace(tmp, file_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return file_path
@@ -0,0 +1,318 @@
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+
+from app.services.result_service import document_id as summary_document_id, lineage_key
+from app.utils.config import GRAPH_PATH, GRAPH_COMPACT_MIN_OPS
+
+# 邊的類型
+HAS_CONTEXT = "HAS_CONTEXT"      # document -> context
+MENTIONS = "MENTIONS"            # context -> entity
+PRIMARY_ROLE = "PRIMARY_ROLE"    # context -> role
+HAS_BOUNDARY = "HAS_BOUNDARY"    # context -> boundary
+OF_TYPE = "OF_TYPE"              # boundary -> boundary_type
+AFFECTS = "AFFECTS"              # boundary -> role
+
+
+def _key(name: str) -> str:
+    return re.sub(r"\s+", " ", (name or "").strip().lower())
+
+
+def document_node(document_key: str) -> str:
+    return f"doc:{document_key}"
+
+def context_node(document_key: str, context_id: str) -> str:
+    return f"ctx:{document_key}/{context_id}"
+
+def entity_node(name: str) -> str:
+    return f"entity:{_key(name)}"
+
+def role_node(name: str) -> str:
+    return f"role:{_key(name)}"
+
+def boundary_type_node(name: str) -> str:
+    return f"btype:{_key(name)}"
+
+
+class GraphStore:
+    """
+    Embedded graph of extraction results.
+
+    Nodes (documents, contexts, entities, roles, boundaries, boundary types)
+    live in memory with outgoing and incoming adjacency sets per edge type,
+    so each hop of a traversal is a dict lookup. Every change is appended to
+    a JSONL log that is replayed on load; compact() rewrites it as a snapshot
+    once the log holds more than twice the records of the last snapshot.
+    """
+
+    def __init__(self, path: str = GRAPH_PATH):
+        self.path = path
+        self.nodes = {}
+        self.out = defaultdict(lambda: defaultdict(set))
+        self.inc = defaultdict(lambda: defaultdict(set))
+        self.by_type = defaultdict(set)
+        self._lock = threading.RLock()
+        self._log = None
+        self._loaded = False
+        self._ops = 0           # records in the log
+        self._snapshot = 0      # records written by the last compaction
+        self.version = 0    # bumped on every ingest, for caches built on graph queries
+
+    # ---------- persistence ----------
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            self._apply(json.loads(line))
+                            self._ops += 1
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._log = open(self.path, "a", encoding="utf-8")
+            self._loaded = True
+            self._snapshot = len(self.nodes) + sum(len(t) for edges in self.out.values() for t in edges.values())
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        # 重複擷取的文件會留下大量已刪除的紀錄，超過快照兩倍時重寫
+        if self._ops > 2 * max(self._snapshot, GRAPH_COMPACT_MIN_OPS):
+            self.compact()
+
+    def compact(self):
+        with self._lock:
+            self.load()
+            self._log.close()
+            tmp_path = self.path + ".tmp"
+            written = 0
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for node_id, node in self.nodes.items():
+                    f.write(json.dumps(["n", node_id, node], ensure_ascii=False) + "\n")
+                    written += 1
+                for src, edges in self.out.items():
+                    for etype, targets in edges.items():
+                        for dst in targets:
+                            f.write(json.dumps(["e", src, etype, dst], ensure_ascii=False) + "\n")
+                            written += 1
+            os.replace(tmp_path, self.path)
+            self._log = open(self.path, "a", encoding="utf-8")
+            self._ops = self._snapshot = written
+
+    def _record(self, op: list):
+        self._apply(op)
+        self._log.write(json.dumps(op, ensure_ascii=False) + "\n")
+        self._ops += 1
+
+    def _apply(self, op: list):
+        kind = op[0]
+        if kind == "n":
+            _, node_id, node = op
+            old = self.nodes.get(node_id)
+            if old is not None:
+                self.by_type[old["type"]].discard(node_id)
+            self.nodes[node_id] = node
+            self.by_type[node["type"]].add(node_id)
+        elif kind == "e":
+            _, src, etype, dst = op
+            self.out[src][etype].add(dst)
+            self.inc[dst][etype].add(src)
+        elif kind == "d":
+            self._remove(op[1])
+
+    def _remove(self, node_id: str):
+        node = self.nodes.pop(node_id, None)
+        if node is not None:
+            self.by_type[node["type"]].discard(node_id)
+        for etype, targets in self.out.pop(node_id, {}).items():
+            for dst in targets:
+                self.inc[dst][etype].discard(node_id)
+        for etype, sources in self.inc.pop(node_id, {}).items():
+            for src in sources:
+                self.out[src][etype].discard(node_id)
+
+    # ---------- writes ----------
+
+    def _node(self, node_id: str, type: str, **props):
+        if self.nodes.get(node_id, {}).get("type") != type or props:
+            self._record(["n", node_id, {"type": type, **props}])
+
+    def _edge(self, src: str, etype: str, dst: str):
+        if dst not in self.out[src][etype]:
+            self._record(["e", src, etype, dst])
+
+    def ingest(self, summary: dict, lineage: str = None) -> str:
+        """
+        Add one extraction result. Document, context and boundary nodes are
+        keyed by the revision lineage (see lineage_key), so re-ingesting a
+        revision replaces its contexts and boundaries while another document
+        with the same extracted id is left alone; shared entity/role nodes
+        are kept.
+        """
+        with self._lock:
+            self.load()
+            metadata = summary.get("document_metadata") or {}
+            document_id = summary_document_id(summary)
+            document_key = lineage_key(summary, lineage)
+            doc = document_node(document_key)
+
+            for ctx in list(self.out[doc][HAS_CONTEXT]):
+                for boundary in list(self.out[ctx][HAS_BOUNDARY]):
+                    self._record(["d", boundary])
+                self._record(["d", ctx])
+
+            self._node(doc, "document", **{**metadata, "document_id": document_id})
+            for context in summary.get("contexts") or []:
+                context_id = context.get("context_id")
+                ctx = context_node(document_key, context_id)
+                self._node(ctx, "context", document_id=document_id, document_key=document_key, context=context)
+                self._edge(doc, HAS_CONTEXT, ctx)
+
+                for entity in context.get("entities") or []:
+                    if entity.get("name"):
+                        node = entity_node(entity["name"])
+                        if node not in self.nodes:
+                            self._node(node, "entity", name=entity["name"], entity_type=entity.get("type"))
+                        self._edge(ctx, MENTIONS, node)
+
+                for role in context.get("primary_roles") or []:
+                    node = role_node(role)
+                    if node not in self.nodes:
+                        self._node(node, "role", name=role)
+                    self._edge(ctx, PRIMARY_ROLE, node)
+
+                for i, boundary in enumerate(context.get("decision_boundaries") or []):
+                    node = f"boundary:{document_key}/{context_id}/{i}"
+                    self._node(node, "boundary", boundary=boundary)
+                    self._edge(ctx, HAS_BOUNDARY, node)
+                    if boundary.get("boundary_type"):
+                        btype = boundary_type_node(boundary["boundary_type"])
+                        if btype not in self.nodes:
+                            self._node(btype, "boundary_type", name=boundary["boundary_type"])
+                        self._edge(node, OF_TYPE, btype)
+                    for role in boundary.get("affected_roles") or []:
+                        role_id = role_node(role)
+                        if role_id not in self.nodes:
+                            self._node(role_id, "role", name=role)
+                        self._edge(node, AFFECTS, role_id)
+
+            self._log.flush()
+            self.version += 1
+            self._maybe_compact()
+            return doc
+
+    # ---------- queries ----------
+
+    def neighbors(self, node_id: str, etype: str, direction: str = "out") -> set:
+        self.load()
+        index = self.out if direction == "out" else self.inc
+        return set(index[node_id][etype]) if node_id in index else set()
+
+    def traverse(self, start, path: list) -> set:
+        """Follow a path of (edge_type, direction) hops from a node or set of nodes."""
+        frontier = {start} if isinstance(start, str) else set(start)
+        for etype, direction in path:
+            frontier = set().union(*(self.neighbors(node, etype, direction) for node in frontier))
+            if not frontier:
+                break
+        return frontier
+
+    def boundaries(self, boundary_type=None, entity=None, role=None, document_id=None) -> list:
+        """
+        Decision boundaries filtered by type, by an entity or role the owning
+        context touches, and/or by document (its extracted id or its key),
+        across all documents.
+        """
+        with self._lock:
+            self.load()
+            contexts = None
+            if entity:
+                contexts = self.neighbors(entity_node(entity), MENTIONS, "in")
+            if role:
+                by_role = self.neighbors(role_node(role), PRIMARY_ROLE, "in")
+                contexts = by_role if contexts is None else contexts & by_role
+            if document_id:
+                # 不同文件可能擷取出相同的 document_id，全部列出
+                docs = {document_node(document_id)} | {
+                    node for node in self.by_type["document"] if self.nodes[node].get("document_id") == document_id
+                }
+                by_doc = self.traverse(docs, [(HAS_CONTEXT, "out")])
+                contexts = by_doc if contexts is None else contexts & by_doc
+
+            if boundary_type:
+                found = self.neighbors(boundary_type_node(boundary_type), OF_TYPE, "in")
+                if contexts is not None:
+                    found &= self.traverse(contexts, [(HAS_BOUNDARY, "out")])
+            elif contexts is not None:
+                found = self.traverse(contexts, [(HAS_BOUNDARY, "out")])
+            else:
+                found = set(self.by_type["boundary"])
+
+            results = []
+            for node_id in sorted(found):
+                ctx = next(iter(self.inc[node_id][HAS_BOUNDARY]), None)
+                context = self.nodes[ctx]["context"] if ctx else {}
+                results.append({
+                    "boundary_id": node_id,
+                    "document_id": self.nodes[ctx]["document_id"] if ctx else None,
+                    "document_key": self.nodes[ctx].get("document_key") if ctx else None,
+                    "context_id": context.get("context_id"),
+                    "context_title": context.get("title"),
+                    **self.nodes[node_id]["boundary"],
+                })
+            return results
+
+    def related_contexts(self, contexts: dict) -> dict:
+        """
+        Contexts linked to the given ones through a shared entity or primary
+        role, scored by the sum over shared links of the source context's
+        weight divided by how many contexts share that entity/role (so a
+        ubiquitous role adds little). `contexts` maps context node -> weight.
+        """
+        with self._lock:
+            self.load()
+            scores = defaultdict(float)
+            for ctx, weight in contexts.items():
+                for etype in (MENTIONS, PRIMARY_ROLE):
+                    for hub in self.out[ctx][etype] if ctx in self.out else ():
+                        members = self.inc[hub][etype]
+                        share = weight / len(members)
+                        for other in members:
+                            if other not in contexts:
+                                scores[other] += share
+            return dict(scores)
+
+    def context(self, node_id: str):
+        """(document_id, context) of a context node, or None."""
+        with self._lock:
+            self.load()
+            node = self.nodes.get(node_id)
+            if node is None or node.get("type") != "context":
+                return None
+            return node["document_id"], node["context"]
+
+    def node(self, node_id: str):
+        with self._lock:
+            self.load()
+            node = self.nodes.get(node_id)
+            if node is None:
+                return None
+            return {
+                "id": node_id,
+                **node,
+                "out": {etype: sorted(ids) for etype, ids in self.out[node_id].items() if ids},
+                "in": {etype: sorted(ids) for etype, ids in self.inc[node_id].items() if ids},
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            self.load()
+            return {node_type: len(ids) for node_type, ids in self.by_type.items()}
+
+
+graph_store = GraphStore()
@@ -0,0 +1,226 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from starlette.datastructures import UploadFile
+
+from app.pipelines.context import PipelineContext
+from app.pipelines.document_pipeline import DocumentPipeline
+from app.pipelines.meeting_minutes import MeetingMinutesPipeline
+from app.utils.config import JOBS_PATH, JOBS_DIR, JOB_WORKERS, MAX_UPLOAD_BYTES
+from app.utils.file_parser import UploadTooLarge
+
+logger = logging.getLogger(__name__)
+
+PIPELINES = {
+    "document": DocumentPipeline,
+    "meeting": MeetingMinutesPipeline,
+}
+
+
+class JobStore:
+    """SQLite store for jobs and the PipelineContext state after each completed step."""
+
+    def __init__(self, path: str = JOBS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " mode TEXT NOT NULL,"
+                " filename TEXT NOT NULL,"
+                " upload_path TEXT NOT NULL,"
+                " priority INTEGER NOT NULL,"
+                " status TEXT NOT NULL,"
+                " step TEXT,"
+                " error TEXT,"
+                " created REAL NOT NULL,"
+                " updated REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_stages ("
+                " job_id TEXT NOT NULL,"
+                " step TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " PRIMARY KEY (job_id, step))"
+            )
+        return self._conn
+
+    def create(self, job_id, mode, filename, upload_path, priority):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO jobs (id, mode, filename, upload_path, priority, status, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, mode, filename, upload_path, priority, now, now),
+            )
+            conn.commit()
+
+    def update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self) -> list:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running')"
+                " ORDER BY priority DESC, created"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def save_stage(self, job_id, step, data: dict):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO job_stages (job_id, step, data) VALUES (?, ?, ?)",
+                (job_id, step, json.dumps(data, ensure_ascii=False)),
+            )
+            conn.execute(
+                "UPDATE jobs SET step = ?, updated = ? WHERE id = ?",
+                (step, time.time(), job_id),
+            )
+            conn.commit()
+
+    def stages(self, job_id) -> dict:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT step, data FROM job_stages WHERE job_id = ? ORDER BY rowid", (job_id,)
+            ).fetchall()
+        return {row["step"]: json.loads(row["data"]) for row in rows}
+
+
+class JobQueue:
+    """
+    Priority queue of pipeline jobs served by a fixed number of workers.
+    Higher priority runs first; equal priorities run in submission order.
+    """
+
+    def __init__(self, store: JobStore = None, workers: int = JOB_WORKERS, jobs_dir: str = JOBS_DIR):
+        self.store = store or JobStore()
+        self.workers = workers
+        self.jobs_dir = jobs_dir
+        self._queue = asyncio.PriorityQueue()
+        self._counter = itertools.count()
+        self._tasks = []
+
+    async def start(self):
+        # 重新排入上次未完成的工作（例如 worker 當機）
+        for job in self.store.unfinished():
+            self._enqueue(job["id"], job["priority"])
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _enqueue(self, job_id: str, priority: int):
+        self._queue.put_nowait((-priority, next(self._counter), job_id))
+
+    async def submit(self, file, mode: str = "document", priority: int = 0) -> str:
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+
+        # 沒有檔名的上傳依內容判斷格式
+        filename = os.path.basename(file.filename or "") or "upload"
+        upload_path = os.path.join(job_dir, filename)
+        size = 0
+        try:
+            with open(upload_path, "wb") as f:
+                while chunk := await file.read(1024 * 1024):
+                    size += len(chunk)
+                    if size > MAX_UPLOAD_BYTES:
+                        raise UploadTooLarge(f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit")
+                    f.write(chunk)
+        except BaseException:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        self.store.create(job_id, mode, filename, upload_path, priority)
+        self._enqueue(job_id, priority)
+        return job_id
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # 管線外的錯誤（上傳檔遺失、SQLite、還原狀態）只讓這個工作失敗，worker 繼續執行
+                logger.exception("job failed outside the pipeline", extra={"job_id": job_id})
+                try:
+                    self.store.update(job_id, status="failed", error=str(exc))
+                except Exception:
+                    logger.exception("could not record job failure", extra={"job_id": job_id})
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in ("queued", "running"):
+            return
+        self.store.update(job_id, status="running")
+
+        # 從最後完成的步驟之後接續執行
+        stages = self.store.stages(job_id)
+        with open(job["upload_path"], "rb") as upload:
+            ctx = PipelineContext(file=UploadFile(upload, filename=job["filename"]))
+            for data in stages.values():
+                ctx.restore(data)
+
+            def on_step(name: str, outputs: dict):
+                state = {k: v for k, v in outputs.items() if k in PipelineContext.STATE_FIELDS}
+                self.store.save_stage(job_id, name, state)
+
+            try:
+                pipeline = PIPELINES[job["mode"]]()
+                await pipeline.run(ctx, skip=set(stages), on_step=on_step)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.store.update(job_id, status="failed", error=str(exc))
+                return
+        self.store.update(job_id, status="completed")
+
+    def result(self, job_id: str) -> dict:
+        state = {}
+        for data in self.store.stages(job_id).values():
+            state.update(data)
+        return state
+
+
+job_queue = JobQueue()
@@ -0,0 +1,79 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from app.utils.config import MEMORY_BUDGET, MEMORY_WAIT_TIMEOUT
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    pass
+
+
+class MemoryBudget:
+    """
+    Byte budget shared by all requests. Callers reserve what they expect to
+    hold in memory; reservations wait in FIFO order until enough is released
+    and fail with MemoryBudgetExceeded after `timeout`. A single reservation
+    larger than the whole budget is clamped so it can still run alone.
+    """
+
+    def __init__(self, total: int = MEMORY_BUDGET, timeout: float = MEMORY_WAIT_TIMEOUT):
+        self.total = total
+        self.timeout = timeout
+        self.used = 0
+        self._waiters = []
+
+    def _fits(self, nbytes: int) -> bool:
+        return self.used + nbytes <= self.total
+
+    def try_acquire(self, nbytes: int) -> bool:
+        """Reserve without waiting; False when it does not fit right now."""
+        nbytes = min(nbytes, self.total)
+        if self._waiters or not self._fits(nbytes):
+            return False
+        self.used += nbytes
+        return True
+
+    async def acquire(self, nbytes: int, timeout: float = None):
+        nbytes = min(nbytes, self.total)
+        if not self._waiters and self._fits(nbytes):
+            self.used += nbytes
+            return
+        waiter = (nbytes, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), self.timeout if timeout is None else timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter[1].done() and not waiter[1].cancelled():
+                # 逾時與授予同時發生：歸還剛拿到的額度
+                self.release(nbytes)
+            else:
+                self._waiters.remove(waiter)
+                waiter[1].cancel()
+                self._wake()
+            if isinstance(exc, asyncio.TimeoutError):
+                raise MemoryBudgetExceeded(
+                    f"Server is out of upload memory ({self.used} of {self.total} bytes in use)"
+                ) from None
+            raise
+
+    def release(self, nbytes: int):
+        self.used -= min(nbytes, self.total)
+        self._wake()
+
+    def _wake(self):
+        # 依序授予，前面的請求放不下時後面的也要等，避免大檔案被餓死
+        while self._waiters and self._fits(self._waiters[0][0]):
+            nbytes, future = self._waiters.pop(0)
+            self.used += nbytes
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int, timeout: float = None):
+        await self.acquire(nbytes, timeout)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+
+memory_budget = MemoryBudget()
@@ -5,10 +5,19 @@ from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
-import io
+import hashlib
+import json
+import logging
 import os
 from app.utils.config import DATAPATH, FONT_MSYH, FONT_MYSHBD, FONT_ARIALUNI
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# 版面或字體邏輯改變時加一，讓舊的快取 PDF 失效
+RENDER_VERSION = 1
 
 def decision_to_view(summary: dict) -> dict:
     return summary
@@ -29,7 +38,7 @@ def register_chinese_fonts():
         except:
             return False
 
-def get_custom_styles():
+def get_custom_styles(font: str = 'Microsoft-YaHei', bold_font: str = 'Microsoft-YaHei-Bold'):
     """創建自定義樣式"""
     styles = getSampleStyleSheet()
     
@@ -37,7 +46,7 @@ def get_custom_styles():
     styles.add(ParagraphStyle(
         name='ChineseTitle',
         parent=styles['Title'],
-        fontName='Microsoft-YaHei-Bold',
+        fontName=bold_font,
         fontSize=24,
         textColor=colors.HexColor('#1a1a1a'),
         spaceAfter=30,
@@ -48,7 +57,7 @@ def get_custom_styles():
     styles.add(ParagraphStyle(
         name='ContextTitle',
         parent=styles['Heading2'],
-        fontName='Microsoft-YaHei-Bold',
+        fontName=bold_font,
         fontSize=14,
         textColor=colors.HexColor('#2c3e50'),
         spaceBefore=20,
@@ -60,7 +69,7 @@ def get_custom_styles():
     styles.add(ParagraphStyle(
         name='SectionTitle',
         parent=styles['Heading3'],
-        fontName='Microsoft-YaHei-Bold',
+        fontName=bold_font,
         fontSize=11,
         textColor=colors.HexColor('#34495e'),
         spaceBefore=12,
@@ -71,7 +80,7 @@ def get_custom_styles():
     styles.add(ParagraphStyle(
         name='ChineseBody',
         parent=styles['Normal'],
-        fontName='Microsoft-YaHei',
+        fontName=font,
         fontSize=10,
         textColor=colors.HexColor('#2c3e50'),
         leading=16,
@@ -82,7 +91,7 @@ def get_custom_styles():
     styles.add(ParagraphStyle(
         name='RoleStyle',
         parent=styles['Normal'],
-        fontName='Microsoft-YaHei',
+        fontName=font,
         fontSize=9,
         textColor=colors.HexColor('#7f8c8d'),
         leftIndent=20
@@ -90,181 +99,237 @@ def get_custom_styles():
     
     return styles
 
+LEVEL_COLORS = {
+    'L': '#e74c3c',  # 紅色
+    'M': '#f39c12',  # 橙色
+    'S': '#3498db'   # 藍色
+}
+
+BOUNDARY_COLORS = {
+    'Safety-Critical': '#e74c3c',
+    'Irreversible': '#e67e22',
+    'Architectural': '#3498db',
+    'Technical': '#9b59b6',
+    'Operational': '#1abc9c',
+    'Performance': '#f39c12'
+}
+
 def create_level_badge(level: str) -> str:
     """創建決策層級徽章"""
-    colors_map = {
-        'L': '#e74c3c',  # 紅色
-        'M': '#f39c12',  # 橙色
-        'S': '#3498db'   # 藍色
-    }
-    color = colors_map.get(level, '#95a5a6')
+    color = LEVEL_COLORS.get(level, '#95a5a6')
     return f'<font color="{color}"><b>[{level}]</b></font>'
 
-def decision_pdf(view: dict, output_dir: str = DATAPATH) -> str:
-    # 註冊中文字體
-    font_registered = register_chinese_fonts()
-    if not font_registered:
-        print("警告: 無法註冊中文字體，可能會出現亂碼")
-    
-    # 確保輸出目錄存在
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
 
-    file_name = f"{view['document_metadata']['document_id']}.pdf"
-    file_path = os.path.join(output_dir, file_name)
+class PdfRenderer:
+    """
+    Decision-document renderer. Fonts, the stylesheet and the static table
+    styles are set up once in the constructor, so one instance per process
+    can render any number of documents.
+    """
 
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer, 
-        pagesize=A4,
-        rightMargin=50,
-        leftMargin=50,
-        topMargin=50,
-        bottomMargin=50
-    )
-    
-    styles = get_custom_styles()
-    story = []
+    def __init__(self):
+        # 註冊中文字體
+        if register_chinese_fonts():
+            self.font, self.bold_font = 'Microsoft-YaHei', 'Microsoft-YaHei-Bold'
+        else:
+            logger.warning("無法註冊中文字體，改用內建 STSong-Light")
+            pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
+            self.font = self.bold_font = 'STSong-Light'
+
+        self.styles = get_custom_styles(self.font, self.bold_font)
+
+        self.metadata_style = TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), self.font),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#7f8c8d')),
+            ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#2c3e50')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ])
+        self.divider_style = TableStyle([
+            ('LINEABOVE', (0, 0), (-1, 0), 1, colors.HexColor('#ecf0f1'))
+        ])
+
+    def render(self, view: dict, out):
+        """Render view into out, a file path or any writable binary stream."""
+        doc = SimpleDocTemplate(
+            out,
+            pagesize=A4,
+            rightMargin=50,
+            leftMargin=50,
+            topMargin=50,
+            bottomMargin=50
+        )
+        doc.build(self.build_story(view))
+
+    def build_story(self, view: dict) -> list:
+        styles = self.styles
+        story = []
+
+        # 文檔標題（模型可能漏填元數據欄位）
+        metadata = view.get("document_metadata") or {}
+        title = metadata.get("document_title") or "N/A"
+        story.append(Paragraph(title, styles["ChineseTitle"]))
+
+        # 文檔元數據
+        metadata_data = [
+            ['文檔ID:', metadata.get("document_id") or "N/A"],
+            ['文檔類型:', metadata.get("document_type", "N/A")],
+            ['版本:', metadata.get("version", "N/A")]
+        ]
+
+        metadata_table = Table(metadata_data, colWidths=[1.5*inch, 4*inch])
+        metadata_table.setStyle(self.metadata_style)
+        story.append(metadata_table)
+        story.append(Spacer(1, 30))
+
+        # 決策情境列表
+        for idx, ctx in enumerate(view["contexts"], 1):
+            # 決策標題（帶層級徽章）
+            level_badge = create_level_badge(ctx['decision_level'])
+            title_zh = ctx['title'].get('zh', '')
+            title_en = ctx['title'].get('en', '')
+
+            context_title = f"{level_badge} {title_zh}"
+            story.append(Paragraph(context_title, styles["ContextTitle"]))
+
+            if title_en and title_en != title_zh:
+                story.append(Paragraph(
+                    f'<i><font size="9" color="#7f8c8d">{title_en}</font></i>',
+                    styles["ChineseBody"]
+                ))
 
-    # 文檔標題
-    title = view["document_metadata"]["document_title"]
-    story.append(Paragraph(title, styles["ChineseTitle"]))
-    
-    # 文檔元數據
-    metadata_data = [
-        ['文檔ID:', view["document_metadata"]["document_id"]],
-        ['文檔類型:', view["document_metadata"].get("document_type", "N/A")],
-        ['版本:', view["document_metadata"].get("version", "N/A")]
-    ]
-    
-    metadata_table = Table(metadata_data, colWidths=[1.5*inch, 4*inch])
-    metadata_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Microsoft-YaHei'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#7f8c8d')),
-        ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#2c3e50')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    story.append(metadata_table)
-    story.append(Spacer(1, 30))
-
-    # 決策情境列表
-    for idx, ctx in enumerate(view["contexts"], 1):
-        # 決策標題（帶層級徽章）
-        level_badge = create_level_badge(ctx['decision_level'])
-        title_zh = ctx['title'].get('zh', '')
-        title_en = ctx['title'].get('en', '')
-        
-        context_title = f"{level_badge} {title_zh}"
-        story.append(Paragraph(context_title, styles["ContextTitle"]))
-        
-        if title_en and title_en != title_zh:
-            story.append(Paragraph(
-                f'<i><font size="9" color="#7f8c8d">{title_en}</font></i>',
-                styles["ChineseBody"]
-            ))
-        
-        story.append(Paragraph(
-            f'<font color="#95a5a6" size="8">ID: {ctx["context_id"]}</font>',
-            styles["RoleStyle"]
-        ))
-        story.append(Spacer(1, 8))
-
-        # 主要角色
-        if ctx.get("primary_roles"):
-            roles_text = " • ".join(ctx["primary_roles"])
             story.append(Paragraph(
-                f'<b>主要角色:</b> {roles_text}',
+                f'<font color="#95a5a6" size="8">ID: {ctx["context_id"]}</font>',
                 styles["RoleStyle"]
             ))
-            story.append(Spacer(1, 10))
-
-        # 決策邊界
-        if ctx.get("decision_boundaries"):
-            story.append(Paragraph("<b>🚨 決策邊界</b>", styles["SectionTitle"]))
-            for boundary in ctx["decision_boundaries"]:
-                boundary_type = boundary.get("boundary_type", "未分類")
-                desc_zh = boundary.get("description", {}).get("zh", "")
-                desc_en = boundary.get("description", {}).get("en", "")
-                
-                # 邊界類型徽章
-                type_color = {
-                    'Safety-Critical': '#e74c3c',
-                    'Irreversible': '#e67e22',
-                    'Architectural': '#3498db',
-                    'Technical': '#9b59b6',
-                    'Operational': '#1abc9c',
-                    'Performance': '#f39c12'
-                }.get(boundary_type, '#95a5a6')
-                
+            story.append(Spacer(1, 8))
+
+            # 主要角色
+            if ctx.get("primary_roles"):
+                roles_text = " • ".join(ctx["primary_roles"])
                 story.append(Paragraph(
-                    f'<font color="{type_color}"><b>▸ {boundary_type}</b></font>',
-                    styles["ChineseBody"]
+                    f'<b>主要角色:</b> {roles_text}',
+                    styles["RoleStyle"]
                 ))
-                story.append(Paragraph(f'  {desc_zh}', styles["ChineseBody"]))
-                if desc_en and desc_en != desc_zh:
+                story.append(Spacer(1, 10))
+
+            # 決策邊界
+            if ctx.get("decision_boundaries"):
+                story.append(Paragraph("<b>🚨 決策邊界</b>", styles["SectionTitle"]))
+                for boundary in ctx["decision_boundaries"]:
+                    boundary_type = boundary.get("boundary_type", "未分類")
+                    desc_zh = boundary.get("description", {}).get("zh", "")
+                    desc_en = boundary.get("description", {}).get("en", "")
+
+                    # 邊界類型徽章
+                    type_color = BOUNDARY_COLORS.get(boundary_type, '#95a5a6')
+
+                    story.append(Paragraph(
+                        f'<font color="{type_color}"><b>▸ {boundary_type}</b></font>',
+                        styles["ChineseBody"]
+                    ))
+                    story.append(Paragraph(f'  {desc_zh}', styles["ChineseBody"]))
+                    if desc_en and desc_en != desc_zh:
+                        story.append(Paragraph(
+                            f'  <i><font size="8" color="#7f8c8d">{desc_en}</font></i>',
+                            styles["ChineseBody"]
+                        ))
+                    story.append(Spacer(1, 6))
+
+            # 不適用情況
+            if ctx.get("non_applicability_notes"):
+                story.append(Paragraph("<b>⚠️ 不適用情況</b>", styles["SectionTitle"]))
+                na_zh = ctx["non_applicability_notes"].get("zh", "")
+                na_en = ctx["non_applicability_notes"].get("en", "")
+
+                story.append(Paragraph(f'  {na_zh}', styles["ChineseBody"]))
+                if na_en and na_en != na_zh:
                     story.append(Paragraph(
-                        f'  <i><font size="8" color="#7f8c8d">{desc_en}</font></i>',
+                        f'  <i><font size="8" color="#7f8c8d">{na_en}</font></i>',
                         styles["ChineseBody"]
                     ))
                 story.append(Spacer(1, 6))
 
-        # 不適用情況
-        if ctx.get("non_applicability_notes"):
-            story.append(Paragraph("<b>⚠️ 不適用情況</b>", styles["SectionTitle"]))
-            na_zh = ctx["non_applicability_notes"].get("zh", "")
-            na_en = ctx["non_applicability_notes"].get("en", "")
-            
-            story.append(Paragraph(f'  {na_zh}', styles["ChineseBody"]))
-            if na_en and na_en != na_zh:
-                story.append(Paragraph(
-                    f'  <i><font size="8" color="#7f8c8d">{na_en}</font></i>',
-                    styles["ChineseBody"]
-                ))
-            story.append(Spacer(1, 6))
-
-        # 架構演化說明
-        if ctx.get("architecture_evolution_note"):
-            story.append(Paragraph("<b>🔄 架構演化</b>", styles["SectionTitle"]))
-            evo_zh = ctx["architecture_evolution_note"].get("zh", "")
-            evo_en = ctx["architecture_evolution_note"].get("en", "")
-            
-            story.append(Paragraph(f'  {evo_zh}', styles["ChineseBody"]))
-            if evo_en and evo_en != evo_zh:
+            # 架構演化說明
+            if ctx.get("architecture_evolution_note"):
+                story.append(Paragraph("<b>🔄 架構演化</b>", styles["SectionTitle"]))
+                evo_zh = ctx["architecture_evolution_note"].get("zh", "")
+                evo_en = ctx["architecture_evolution_note"].get("en", "")
+
+                story.append(Paragraph(f'  {evo_zh}', styles["ChineseBody"]))
+                if evo_en and evo_en != evo_zh:
+                    story.append(Paragraph(
+                        f'  <i><font size="8" color="#7f8c8d">{evo_en}</font></i>',
+                        styles["ChineseBody"]
+                    ))
+                story.append(Spacer(1, 6))
+
+            # 信心度
+            if ctx.get("confidence_score"):
+                score = ctx["confidence_score"]
+                score_color = '#27ae60' if score >= 0.9 else '#f39c12' if score >= 0.8 else '#e74c3c'
                 story.append(Paragraph(
-                    f'  <i><font size="8" color="#7f8c8d">{evo_en}</font></i>',
-                    styles["ChineseBody"]
+                    f'<font color="{score_color}"><b>信心度: {score:.0%}</b></font>',
+                    styles["RoleStyle"]
                 ))
-            story.append(Spacer(1, 6))
 
-        # 信心度
-        if ctx.get("confidence_score"):
-            score = ctx["confidence_score"]
-            score_color = '#27ae60' if score >= 0.9 else '#f39c12' if score >= 0.8 else '#e74c3c'
-            story.append(Paragraph(
-                f'<font color="{score_color}"><b>信心度: {score:.0%}</b></font>',
-                styles["RoleStyle"]
-            ))
+            # 分隔線
+            if idx < len(view["contexts"]):
+                story.append(Spacer(1, 20))
+                divider = Table([['']], colWidths=[6.5*inch], rowHeights=[1])
+                divider.setStyle(self.divider_style)
+                story.append(divider)
+                story.append(Spacer(1, 20))
 
-        # 分隔線
-        if idx < len(view["contexts"]):
-            story.append(Spacer(1, 20))
-            story.append(Table([['']], colWidths=[6.5*inch], rowHeights=[1]))
-            story[-1].setStyle(TableStyle([
-                ('LINEABOVE', (0, 0), (-1, 0), 1, colors.HexColor('#ecf0f1'))
-            ]))
-            story.append(Spacer(1, 20))
-
-    # 生成 PDF
-    doc.build(story)
-    buffer.seek(0)
-
-    # 寫入文件
-    with open(file_path, "wb") as f:
-        f.write(buffer.read())
-
-    buffer.close()
-    print(f"✅ PDF 已生成: {file_path}")
-    return file_path
+        return story
+
+
+_renderer = None
+
+def get_renderer() -> PdfRenderer:
+    """Process-wide renderer, created on first use."""
+    global _renderer
+    if _renderer is None:
+        _renderer = PdfRenderer()
+    return _renderer
+
+def render_pdf(view: dict, out):
+    """Render straight into a caller-provided path, buffer or response stream."""
+    get_renderer().render(view, out)
 
+def view_key(view: dict) -> str:
+    """Content address of the PDF a view renders to."""
+    h = hashlib.sha256(json.dumps(view, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    h.update(f"\0{RENDER_VERSION}".encode("utf-8"))
+    return h.hexdigest()
+
+def render_file(view: dict, path: str) -> int:
+    """
+    Render into path atomically (temp file + rename), so a concurrent
+    reader never sees a half-written PDF. Returns the file size.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with span("decision_pdf", contexts=len(view["contexts"])):
+            render_pdf(view, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return os.path.getsize(path)
+
+def decision_pdf(view: dict, output_dir: str = DATAPATH) -> str:
+    # 確保輸出目錄存在
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    file_name = f"{(view.get('document_metadata') or {}).get('document_id') or 'document'}.pdf"
+    file_path = os.path.join(output_dir, file_name)
+
+    # 直接寫入檔案，不再經過 BytesIO 複製
+    with span("decision_pdf", contexts=len(view["contexts"])):
+        render_pdf(view, file_path)
+
+    logger.info("PDF 已生成", extra={"path": file_path})
+    return file_path
@@ -8,10 +8,9 @@ async def run_pipeline(mode, file):
     if mode == "document":
         source = DocumentSource(file)
         pipeline = DocumentPipeline()
+    else:
+        raise ValueError("Unsupported mode")
 
-    data = await source.load()
-
-    for step in pipeline.steps:
-        data = step(data)
-
-    return data
+    # DocumentSource 已完成解析，跳過 parse 步驟
+    ctx = await source.load()
+    return await pipeline.run(ctx, skip={"parse"})
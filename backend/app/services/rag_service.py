@@ -0,0 +1,294 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from app.services.graph_service import graph_store, context_node
+from app.services.vector_service import vector_index
+from app.transformers.llm_router import llm_router
+from app.transformers.tokens import estimate_tokens, fit_num_ctx
+from app.utils.config import (
+    LLM_NUM_CTX, RAG_MODEL, RAG_SEED_CONTEXTS, RAG_EXPAND_CONTEXTS,
+    RAG_PROMPT_TOKENS, RAG_CACHE_SIZE, RAG_MAX_ANSWER_TOKENS,
+)
+from app.utils.metrics import ANSWER_LATENCY, CONTEXT_PACK_CACHE
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# num_ctx 依 prompt 大小選 bucket；後端正以更大的 num_ctx 擷取時 router 直接沿用，不重新載入模型
+OPTIONS = {
+    "temperature": 0,
+    "num_ctx": LLM_NUM_CTX,
+    "num_predict": RAG_MAX_ANSWER_TOKENS,
+}
+TRAP_BOOST = 1.5    # 擴展時「陷阱」情境（有不適用說明）的加權
+
+_CJK = re.compile(r"[㐀-鿿]")
+_SPACE = re.compile(r"\s+")
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=None)
+def load_answer_prompt() -> str:
+    path = os.path.join(current_dir, "..", "transformers", "answer_prompt.txt")
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def question_language(question: str) -> str:
+    return "zh" if _CJK.search(question) else "en"
+
+
+def _localized(value, lang: str):
+    """A {"zh": ..., "en": ...} field in lang, falling back to the other language."""
+    if not isinstance(value, dict):
+        return value
+    other = "en" if lang == "zh" else "zh"
+    return value.get(lang) or value.get(other)
+
+
+def is_trap(context: dict) -> bool:
+    notes = context.get("non_applicability_notes") or {}
+    return any(notes.get(lang) for lang in ("zh", "en"))
+
+
+def citation_key(document_id: str, context_id: str) -> str:
+    return f"{document_id}/{context_id}"
+
+
+def format_context(document_id: str, context: dict, lang: str) -> str:
+    """Compact prompt block for one context, headed by its citation key."""
+    key = citation_key(document_id, context.get("context_id"))
+    lines = [f"[{key}] ({context.get('decision_level', '?')}) {_localized(context.get('title'), lang) or ''}"]
+    if context.get("primary_roles"):
+        lines.append("Roles: " + ", ".join(context["primary_roles"]))
+    for label, field in (
+        ("Conditions", "conditions"),
+        ("Risks", "observed_issues_or_risks"),
+        ("Outcomes", "outcomes_or_consequences"),
+    ):
+        items = _localized(context.get(field), lang) or []
+        if items:
+            lines.append(f"{label}:")
+            lines.extend(f"- {item}" for item in items)
+    boundaries = context.get("decision_boundaries") or []
+    if boundaries:
+        lines.append("Boundaries:")
+        for boundary in boundaries:
+            line = f"- [{boundary.get('boundary_type', '')}] {_localized(boundary.get('description'), lang) or ''}"
+            if boundary.get("affected_roles"):
+                line += f" (affects: {', '.join(boundary['affected_roles'])})"
+            lines.append(line)
+    if is_trap(context):
+        lines.append(f"TRAP: {_localized(context['non_applicability_notes'], lang)}")
+    evolution = _localized(context.get("architecture_evolution_note"), lang)
+    if evolution:
+        lines.append(f"Evolution: {evolution}")
+    return "\n".join(lines)
+
+
+def retrieve(question: str, seeds: int = RAG_SEED_CONTEXTS, expand: int = RAG_EXPAND_CONTEXTS) -> list:
+    """
+    Seed contexts from the hybrid index, then the contexts that share
+    entities or primary roles with them, weighted by the seeds' scores.
+    Trap contexts are boosted so that "where this does not apply" reaches
+    the prompt alongside the decisions it qualifies.
+    """
+    found = []
+    weights = {}
+    for hit in vector_index.search(question, seeds):
+        node = context_node(hit["document_key"], hit["context_id"])
+        entry = graph_store.context(node)
+        if entry is None:
+            continue
+        weights[node] = max(hit["score"], 1e-3)
+        found.append({"node": node, "context": entry[1], "document_id": entry[0], "score": hit["score"], "via": "search"})
+
+    related = []
+    for node, score in graph_store.related_contexts(weights).items():
+        entry = graph_store.context(node)
+        if entry is None:
+            continue
+        if is_trap(entry[1]):
+            score *= TRAP_BOOST
+        related.append({"node": node, "context": entry[1], "document_id": entry[0], "score": round(score, 4), "via": "graph"})
+    related.sort(key=lambda item: (-item["score"], item["node"]))
+    return found + related[:expand]
+
+
+def pack(question: str, contexts: list, budget: int = RAG_PROMPT_TOKENS) -> dict:
+    """
+    Format contexts in rank order until the token budget is spent. A block
+    that does not fit is skipped rather than truncated, so a smaller
+    lower-ranked one can still use the remaining budget.
+    """
+    lang = question_language(question)
+    blocks = []
+    citations = []
+    used = 0
+    for item in contexts:
+        block = format_context(item["document_id"], item["context"], lang)
+        tokens = estimate_tokens(block)
+        if used + tokens > budget:
+            continue
+        used += tokens
+        blocks.append(block)
+        citations.append({
+            "key": citation_key(item["document_id"], item["context"].get("context_id")),
+            "document_id": item["document_id"],
+            "context_id": item["context"].get("context_id"),
+            "title": _localized(item["context"].get("title"), lang),
+            "decision_level": item["context"].get("decision_level"),
+            "trap": is_trap(item["context"]),
+            "via": item["via"],
+            "score": item["score"],
+        })
+    return {"lang": lang, "text": "\n\n".join(blocks), "tokens": used, "citations": citations}
+
+
+class ContextPackCache:
+    """
+    In-memory LRU of assembled context packs keyed by the normalized
+    question. Entries are tagged with the graph and vector index versions
+    and the whole cache is dropped as soon as either changes, so an answer
+    never misses a newly ingested document.
+    """
+
+    def __init__(self, max_entries: int = RAG_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                CONTEXT_PACK_CACHE.inc(result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CONTEXT_PACK_CACHE.inc(result="hit")
+            return value
+
+    def put(self, key, version, value):
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+pack_cache = ContextPackCache()
+
+
+def _versions() -> tuple:
+    return graph_store.version, vector_index.version
+
+
+def assemble(question: str, seeds: int = RAG_SEED_CONTEXTS, budget: int = RAG_PROMPT_TOKENS) -> tuple:
+    """(context pack, cached) for a question."""
+    key = (_SPACE.sub(" ", question.strip().lower()), seeds, budget)
+    version = _versions()
+    cached = pack_cache.get(key, version)
+    if cached is not None:
+        return cached, True
+    with span("rag_assemble", seeds=seeds) as attrs:
+        result = pack(question, retrieve(question, seeds), budget)
+        attrs["contexts"] = len(result["citations"])
+        attrs["tokens"] = result["tokens"]
+    # 組裝期間有新文件寫入時不快取
+    if _versions() == version:
+        pack_cache.put(key, version, result)
+    return result, False
+
+
+async def _strip_think(stream):
+    """Drop a leading <think>...</think> block from a streamed answer."""
+    head = ""
+    async for content in stream:
+        if head is None:
+            yield content
+            continue
+        head += content
+        stripped = head.lstrip()
+        if stripped.startswith("<think>"):
+            _, end, rest = stripped.partition("</think>")
+            if not end:
+                continue
+            head, content = None, rest.lstrip()
+        elif "<think>".startswith(stripped):
+            continue
+        else:
+            head, content = None, head
+        if content:
+            yield content
+    if head:
+        yield head
+
+
+async def answer(question: str, seeds: int = RAG_SEED_CONTEXTS, budget: int = RAG_PROMPT_TOKENS):
+    """
+    Answer a question from the knowledge base as a stream of events: the
+    contexts used (with citation keys), the answer tokens, then a final
+    event with the citations the answer actually used and phase timings.
+    """
+    started = time.perf_counter()
+    result, cached = await asyncio.to_thread(assemble, question, seeds, budget)
+    retrieval = time.perf_counter() - started
+    ANSWER_LATENCY.observe(retrieval, phase="retrieval")
+    yield {
+        "event": "contexts",
+        "cached": cached,
+        "tokens": result["tokens"],
+        "citations": result["citations"],
+    }
+
+    parts = []
+    first_token = None
+    if result["citations"]:
+        messages = [
+            {"role": "system", "content": load_answer_prompt()},
+            {"role": "user", "content": f"CONTEXTS:\n\n{result['text']}\n\nQUESTION: {question}"},
+        ]
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        options = {**OPTIONS, "num_ctx": fit_num_ctx(prompt_tokens + RAG_MAX_ANSWER_TOKENS)}
+        stream = llm_router.chat_stream(RAG_MODEL, messages, options=options, interactive=True)
+        async for content in _strip_think(stream):
+            if first_token is None:
+                first_token = time.perf_counter() - started
+                ANSWER_LATENCY.observe(first_token, phase="first_token")
+            parts.append(content)
+            yield {"event": "token", "content": content}
+
+    text = "".join(parts)
+    total = time.perf_counter() - started
+    ANSWER_LATENCY.observe(total, phase="total")
+    yield {
+        "event": "done",
+        "answer": text,
+        "citations_used": [c["key"] for c in result["citations"] if c["key"] in text],
+        "timing": {
+            "retrieval_ms": round(retrieval * 1000, 1),
+            "first_token_ms": round(first_token * 1000, 1) if first_token is not None else None,
+            "total_ms": round(total * 1000, 1),
+        },
+    }
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+
+from app.transformers.llm_client import LLMError
+from app.transformers.llm_router import llm_router
+from app.transformers import summarizer
+from app.transformers.tokens import fit_num_ctx
+from app.utils.metrics import STARTUP_TO_FIRST_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# 盡量接近行程啟動時間：main 在建立 app 之前就會匯入本模組
+PROCESS_STARTED = time.perf_counter()
+
+
+class Readiness:
+    """
+    Startup checks behind GET /api/ready. Assets and stores are loaded
+    synchronously in the lifespan; the model warm-up runs in the background
+    so liveness probes pass while Ollama loads the weights.
+    """
+
+    def __init__(self):
+        self.checks = {"assets": False, "stores": False, "model": False}
+        self.error = None
+        self.warmup_s = None
+        self.start_to_first_token_s = None
+        self.warm = {}              # host -> warm-up seconds
+
+    @property
+    def ready(self) -> bool:
+        return all(self.checks.values())
+
+    def load_assets(self):
+        summarizer.load_assets()
+        self.checks["assets"] = True
+
+    async def warm_up(self, backoff: float = 2.0, max_backoff: float = 30.0):
+        """
+        Ask every backend for a single token with the extraction model and
+        options, so Ollama loads the weights before the first real request.
+        With num_ctx buckets the smallest one is loaded: busy backends only
+        grow num_ctx (see Backend.context_for), so starting small avoids a
+        reload for the first small document. Each backend is retried until
+        it answers; the service is ready as soon as one of them is warm.
+        """
+        await asyncio.gather(*(self._warm_backend(b, backoff, max_backoff) for b in llm_router.backends))
+
+    async def _warm_backend(self, backend, backoff: float, max_backoff: float):
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                num_ctx = fit_num_ctx(0, summarizer.OPTIONS["num_ctx"])
+                stream = backend.client.chat_stream(
+                    model=summarizer.MODEL,
+                    messages=[{"role": "user", "content": "ping"}],
+                    options={**summarizer.OPTIONS, "num_ctx": num_ctx, "num_predict": 1},
+                )
+                async with aclosing(stream):
+                    async for _ in stream:
+                        break
+            except Exception as exc:
+                # 任何錯誤（連線、非預期的回應格式）都退避重試，背景工作不能就此結束
+                self.error = str(exc) if isinstance(exc, LLMError) else repr(exc)
+                logger.warning("model warm-up failed", extra={"backend": backend.host, "attempt": attempt + 1, "error": self.error})
+                await asyncio.sleep(min(backoff * 2 ** attempt, max_backoff))
+                attempt += 1
+                continue
+
+            now = time.perf_counter()
+            backend.num_ctx = num_ctx
+            self.warm[backend.host] = round(now - started, 3)
+            logger.info("model ready", extra={"backend": backend.host, "warmup_s": self.warm[backend.host]})
+            if not self.checks["model"]:
+                self.warmup_s = self.warm[backend.host]
+                self.start_to_first_token_s = round(now - PROCESS_STARTED, 3)
+                STARTUP_TO_FIRST_TOKEN.set(self.start_to_first_token_s)
+                self.checks["model"] = True
+                self.error = None
+            return
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "checks": self.checks,
+            "error": self.error,
+            "warmup_s": self.warmup_s,
+            "start_to_first_token_s": self.start_to_first_token_s,
+            "backends": [{**b, "warmup_s": self.warm.get(b["host"])} for b in llm_router.status()],
+        }
+
+
+readiness = Readiness()
@@ -0,0 +1,327 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from app.utils.config import RESULTS_DIR
+
+LEVELS = ("L", "M", "S")
+NO_LEVEL = 255
+
+# 每個情境一列，各欄位一個檔案；掃描 decision_level 只需讀 1 byte / 情境
+COLUMNS = {
+    "doc": np.uint32,       # catalog row of the owning document
+    "offset": np.uint64,    # byte offset of the record in contexts.bin
+    "length": np.uint32,    # compressed record length
+    "level": np.uint8,      # index into LEVELS, NO_LEVEL if missing
+}
+
+
+def result_key(summary: dict) -> str:
+    """Content address of an extraction result."""
+    return hashlib.sha256(json.dumps(summary, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def document_id(summary: dict) -> str:
+    """
+    Id an extraction result is filed under in the graph, vector index and
+    result store: the extracted document_id, else the title, else a prefix
+    of its content hash, so documents without either never share an id.
+    """
+    metadata = summary.get("document_metadata") or {}
+    return metadata.get("document_id") or metadata.get("document_title") or result_key(summary)[:16]
+
+
+def lineage_key(summary: dict, lineage: str = None) -> str:
+    """
+    Key a result is filed under in the graph and vector index: its revision
+    store lineage, so a newer revision replaces the older one while
+    unrelated documents sharing an extracted id or title stay apart. A result
+    without a lineage is keyed by its content hash.
+    """
+    return lineage or result_key(summary)[:16]
+
+
+class ResultStore:
+    """
+    Append-only store of extraction results.
+
+    Each context is kept as its own zlib-compressed JSON record in
+    contexts.bin, with role, entity and boundary-type strings replaced by
+    ids into a shared string table, so one context can be read with a
+    single positioned read. Per-context columns (owning document, offset,
+    length, decision level) are raw arrays loaded as memory maps, and the
+    catalog of documents is a JSONL log. The catalog line is written last
+    and is the commit point: rows beyond the last catalogued document are
+    ignored on load.
+    """
+
+    def __init__(self, directory: str = RESULTS_DIR):
+        self.directory = directory
+        self.strings = []
+        self._string_ids = {}
+        self.documents = []         # catalog entries, in append order
+        self._by_key = {}
+        self._latest = {}           # lineage -> catalog row of its newest result
+        self.rows = 0
+        self.columns = {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._file = None
+        self._read_lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # ---------- persistence ----------
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._replay(self._path("strings.jsonl"), self._add_string)
+            self._replay(self._path("catalog.jsonl"), self._add_entry)
+            self.rows = max((e["first"] + e["count"] for e in self.documents), default=0)
+            for name, dtype in COLUMNS.items():
+                path = self._path(f"{name}.col")
+                # 截掉未登錄到 catalog 的尾端資料列
+                if os.path.exists(path) and os.path.getsize(path) > self.rows * np.dtype(dtype).itemsize:
+                    os.truncate(path, self.rows * np.dtype(dtype).itemsize)
+            open(self._path("contexts.bin"), "ab").close()
+            self._file = open(self._path("contexts.bin"), "rb")
+            self._map_columns()
+            self._loaded = True
+
+    @staticmethod
+    def _replay(path: str, apply):
+        """Apply every complete JSONL record in path; a partial last line left by a crash is cut off."""
+        if not os.path.exists(path):
+            return
+        good = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                apply(record)
+                good += len(line)
+        # 截掉寫到一半的最後一行，之後的追加才不會接在它後面
+        if good < os.path.getsize(path):
+            os.truncate(path, good)
+
+    def _map_columns(self):
+        for name, dtype in COLUMNS.items():
+            path = self._path(f"{name}.col")
+            if self.rows and os.path.exists(path):
+                self.columns[name] = np.memmap(path, dtype=dtype, mode="r", shape=(self.rows,))
+            else:
+                self.columns[name] = np.zeros(0, dtype=dtype)
+
+    def _add_string(self, value: str) -> int:
+        self._string_ids[value] = len(self.strings)
+        self.strings.append(value)
+        return len(self.strings) - 1
+
+    def _add_entry(self, entry: dict):
+        row = len(self.documents)
+        self.documents.append(entry)
+        self._by_key[entry["key"]] = row
+        # 只有同一文件的修訂版（revision store 判定）才互相取代；模型產生的 document_id 可能重複
+        self._latest[entry.get("lineage") or entry["key"]] = row
+
+    # ---------- encoding ----------
+
+    def _intern(self, value, new: list) -> int:
+        if value not in self._string_ids:
+            new.append(value)
+            return self._add_string(value)
+        return self._string_ids[value]
+
+    def _encode(self, context: dict, new: list) -> bytes:
+        record = dict(context)
+        if record.get("primary_roles"):
+            record["primary_roles"] = [self._intern(r, new) for r in record["primary_roles"]]
+        if record.get("entities"):
+            record["entities"] = [
+                {**e, **{k: self._intern(e[k], new) for k in ("name", "type") if isinstance(e.get(k), str)}}
+                for e in record["entities"]
+            ]
+        if record.get("decision_boundaries"):
+            boundaries = []
+            for b in record["decision_boundaries"]:
+                b = dict(b)
+                if isinstance(b.get("boundary_type"), str):
+                    b["boundary_type"] = self._intern(b["boundary_type"], new)
+                if b.get("affected_roles"):
+                    b["affected_roles"] = [self._intern(r, new) for r in b["affected_roles"]]
+                boundaries.append(b)
+            record["decision_boundaries"] = boundaries
+        return zlib.compress(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    def _decode(self, data: bytes) -> dict:
+        s = self.strings
+        record = json.loads(zlib.decompress(data))
+        if record.get("primary_roles"):
+            record["primary_roles"] = [s[i] for i in record["primary_roles"]]
+        for e in record.get("entities") or []:
+            for k in ("name", "type"):
+                if isinstance(e.get(k), int):
+                    e[k] = s[e[k]]
+        for b in record.get("decision_boundaries") or []:
+            if isinstance(b.get("boundary_type"), int):
+                b["boundary_type"] = s[b["boundary_type"]]
+            if b.get("affected_roles"):
+                b["affected_roles"] = [s[i] for i in b["affected_roles"]]
+        return record
+
+    # ---------- writes ----------
+
+    def put(self, summary: dict, source_hash: str = None, lineage: str = None) -> str:
+        """
+        Store an extraction result under its content hash and return the
+        key. Storing the same result twice is a no-op. source_hash is the
+        sha256 of the upload it was extracted from, if any; lineage is the
+        revision-store key of the document, under which a newer result
+        supersedes older ones.
+        """
+        key = result_key(summary)
+        with self._lock:
+            self.load()
+            if key in self._by_key:
+                return key
+            new_strings = []
+            records = [self._encode(context, new_strings) for context in summary.get("contexts") or []]
+            levels = [context.get("decision_level") for context in summary.get("contexts") or []]
+
+            if new_strings:
+                with open(self._path("strings.jsonl"), "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(v, ensure_ascii=False) + "\n" for v in new_strings))
+            with open(self._path("contexts.bin"), "ab") as f:
+                start = f.tell()
+                f.write(b"".join(records))
+            lengths = np.array([len(r) for r in records], dtype=np.uint64)
+            values = {
+                "doc": np.full(len(records), len(self.documents), dtype=np.uint32),
+                "offset": np.uint64(start) + np.concatenate((np.zeros(1, np.uint64), np.cumsum(lengths)))[:-1],
+                "length": lengths.astype(np.uint32),
+                "level": np.array([LEVELS.index(l) if l in LEVELS else NO_LEVEL for l in levels], dtype=np.uint8),
+            }
+            for name, dtype in COLUMNS.items():
+                with open(self._path(f"{name}.col"), "ab") as f:
+                    # 先前寫入失敗留下的多餘資料列不能讓欄位錯位
+                    f.truncate(self.rows * np.dtype(dtype).itemsize)
+                    f.write(np.ascontiguousarray(values[name], dtype=dtype).tobytes())
+
+            metadata = summary.get("document_metadata") or {}
+            entry = {
+                "key": key,
+                "document_id": document_id(summary),
+                "metadata": metadata,
+                "source_sha256": source_hash,
+                "lineage": lineage,
+                "first": self.rows,
+                "count": len(records),
+                "stored": time.time(),
+            }
+            with open(self._path("catalog.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._add_entry(entry)
+            self.rows += len(records)
+            self._map_columns()
+            return key
+
+    # ---------- reads ----------
+
+    def _read(self, row: int) -> dict:
+        offset, length = int(self.columns["offset"][row]), int(self.columns["length"][row])
+        with self._read_lock:
+            self._file.seek(offset)
+            data = self._file.read(length)
+        return self._decode(data)
+
+    def _mask(self, decision_level: str = None, latest: bool = True) -> np.ndarray:
+        """Rows matching a decision level, optionally only of each document's newest result."""
+        mask = np.ones(self.rows, dtype=bool)
+        if decision_level is not None:
+            mask &= self.columns["level"] == (LEVELS.index(decision_level) if decision_level in LEVELS else NO_LEVEL)
+        if latest:
+            current = np.zeros(len(self.documents), dtype=bool)
+            current[list(self._latest.values())] = True
+            mask &= current[self.columns["doc"]]
+        return mask
+
+    def entry(self, key: str):
+        with self._lock:
+            self.load()
+            row = self._by_key.get(key)
+            return None if row is None else self.documents[row]
+
+    def catalog(self, offset: int = 0, limit: int = 100, latest: bool = True) -> list:
+        """Catalog entries, newest first; latest=True hides results superseded by a newer one of the same document."""
+        with self._lock:
+            self.load()
+            rows = sorted(self._latest.values()) if latest else range(len(self.documents))
+            return [self.documents[row] for row in list(rows)[::-1][offset:offset + limit]]
+
+    def context(self, key: str, index: int):
+        """One context of a stored result, read without touching the others."""
+        entry = self.entry(key)
+        if entry is None or not 0 <= index < entry["count"]:
+            return None
+        return self._read(entry["first"] + index)
+
+    def iter_contexts(self, key: str):
+        entry = self.entry(key)
+        if entry is None:
+            return
+        for row in range(entry["first"], entry["first"] + entry["count"]):
+            yield self._read(row)
+
+    def load_summary(self, key: str):
+        """The full extraction result, as it was stored."""
+        entry = self.entry(key)
+        if entry is None:
+            return None
+        return {"document_metadata": entry["metadata"], "contexts": list(self.iter_contexts(key))}
+
+    def scan(self, decision_level: str = None, latest: bool = True, offset: int = 0, limit: int = None):
+        """
+        Yield (catalog entry, context) for every stored context at the given
+        decision level. The level column is filtered and paged as an array;
+        only the records in the requested page are read and decoded.
+        """
+        with self._lock:
+            self.load()
+            rows = np.flatnonzero(self._mask(decision_level, latest))
+            rows = rows[offset:None if limit is None else offset + limit]
+            doc = self.columns["doc"]
+        for row in rows:
+            yield self.documents[int(doc[row])], self._read(int(row))
+
+    def count(self, latest: bool = True) -> dict:
+        """Context counts per decision level, from the level column alone."""
+        with self._lock:
+            self.load()
+            counts = np.bincount(self.columns["level"][self._mask(latest=latest)], minlength=256)
+        return {level: int(counts[i]) for i, level in enumerate(LEVELS)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            self.load()
+            return {
+                "documents": len(self._latest),
+                "results": len(self.documents),
+                "contexts": self.count(),
+                "strings": len(self.strings),
+            }
+
+
+result_store = ResultStore()
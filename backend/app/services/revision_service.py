@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.utils.config import REVISIONS_PATH, REVISION_MIN_OVERLAP
+
+
+class RevisionStore:
+    """
+    Per-chunk extraction results of every processed document, used to
+    recognise new revisions of a known document and re-extract only the
+    chunks that changed.
+    """
+
+    def __init__(self, path: str = REVISIONS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " doc_key TEXT PRIMARY KEY,"
+                " document_id TEXT,"
+                " title TEXT,"
+                " version TEXT,"
+                " revision INTEGER NOT NULL,"
+                " updated REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " doc_key TEXT NOT NULL,"
+                " position INTEGER NOT NULL,"
+                " fingerprint TEXT NOT NULL,"
+                " first_page INTEGER NOT NULL,"
+                " result TEXT NOT NULL,"
+                " PRIMARY KEY (doc_key, position))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_fp ON chunks (fingerprint)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_id ON documents (document_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_title ON documents (title)")
+        return self._conn
+
+    def find_revision(self, chunks: list):
+        """
+        Find the stored document sharing the most chunk fingerprints with
+        `chunks`. Returns (doc_key, {fingerprint: {"first_page", "result"}}),
+        or (None, {}) if no document shares at least REVISION_MIN_OVERLAP of
+        the new chunks; a shared cover, legal page or table of contents alone
+        does not make two manuals revisions of each other.
+        """
+        fingerprints = list({chunk["fingerprint"] for chunk in chunks})
+        if not fingerprints:
+            return None, {}
+        marks = ",".join("?" * len(fingerprints))
+        with self._lock:
+            conn = self._connect()
+            doc_key = self._best_match(conn, fingerprints)
+            if doc_key is None:
+                return None, {}
+            rows = conn.execute(
+                f"SELECT fingerprint, first_page, result FROM chunks"
+                f" WHERE doc_key = ? AND fingerprint IN ({marks})",
+                (doc_key, *fingerprints),
+            ).fetchall()
+        known = {
+            fingerprint: {"first_page": first_page, "result": json.loads(result)}
+            for fingerprint, first_page, result in rows
+        }
+        return doc_key, known
+
+    def _best_match(self, conn, fingerprints: list):
+        marks = ",".join("?" * len(fingerprints))
+        row = conn.execute(
+            f"SELECT doc_key, COUNT(DISTINCT fingerprint) AS n FROM chunks WHERE fingerprint IN ({marks})"
+            " GROUP BY doc_key ORDER BY n DESC, doc_key LIMIT 1",
+            fingerprints,
+        ).fetchone()
+        if row is None or row[1] < REVISION_MIN_OVERLAP * len(fingerprints):
+            return None
+        return row[0]
+
+    def document_key(self, chunks: list, metadata: dict):
+        """
+        doc_key of the stored document an already extracted upload belongs
+        to (same rules as find_revision and save), or None.
+        """
+        fingerprints = list({chunk["fingerprint"] for chunk in chunks})
+        if not fingerprints:
+            return None
+        with self._lock:
+            conn = self._connect()
+            doc_key = self._best_match(conn, fingerprints)
+            if doc_key is None or not self._same_document(conn, doc_key, metadata):
+                return None
+            return doc_key
+
+    def _same_document(self, conn, doc_key: str, metadata: dict) -> bool:
+        """Whether the extracted document_id or title agrees with the stored document."""
+        row = conn.execute(
+            "SELECT document_id, title FROM documents WHERE doc_key = ?", (doc_key,)
+        ).fetchone()
+        if row is None:
+            return False
+        document_id = metadata.get("document_id")
+        title = metadata.get("document_title")
+        return bool((document_id and document_id == row[0]) or (title and title == row[1]))
+
+    def save(self, summary: dict, results: list, doc_key: str = None) -> str:
+        """
+        Store the chunk results of an extraction. It becomes the next revision
+        of doc_key (from find_revision) only if the extracted document_id or
+        title agrees with the stored one; otherwise it is recorded as a new
+        document and nothing stored is overwritten.
+        """
+        metadata = summary.get("document_metadata") or {}
+        with self._lock:
+            conn = self._connect()
+            if doc_key is not None and self._same_document(conn, doc_key, metadata):
+                row = conn.execute(
+                    "SELECT revision FROM documents WHERE doc_key = ?", (doc_key,)
+                ).fetchone()
+                revision = row[0] + 1
+            else:
+                doc_key = uuid.uuid4().hex
+                revision = 1
+
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_key, document_id, title, version, revision, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    doc_key,
+                    metadata.get("document_id"),
+                    metadata.get("document_title"),
+                    metadata.get("version"),
+                    revision,
+                    time.time(),
+                ),
+            )
+            conn.execute("DELETE FROM chunks WHERE doc_key = ?", (doc_key,))
+            conn.executemany(
+                "INSERT INTO chunks (doc_key, position, fingerprint, first_page, result)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (doc_key, position, chunk["fingerprint"], chunk["first_page"],
+                     json.dumps(result, ensure_ascii=False))
+                    for position, (result, chunk) in enumerate(results)
+                ],
+            )
+            conn.commit()
+        return doc_key
+
+
+revision_store = RevisionStore()
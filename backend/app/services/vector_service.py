@@ -0,0 +1,365 @@
+import importlib
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from app.services.result_service import document_id as summary_document_id, lineage_key
+from app.utils.config import (
+    VECTOR_DIR, EMBEDDING_DIM, EMBEDDING_BATCH, EMBEDDING_FN,
+    IVF_MIN_VECTORS, IVF_NPROBE, HYBRID_ALPHA,
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+|[㐀-鿿]")
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased words for Latin text, single characters plus bigrams for CJK."""
+    tokens = _TOKEN.findall((text or "").lower())
+    cjk = [t for t in tokens if len(t) == 1 and t >= "㐀"]
+    return tokens + [a + b for a, b in zip(cjk, cjk[1:])]
+
+
+def hash_embedding(texts: list, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Dependency-free local embedding: signed feature hashing of tokens and
+    character trigrams. Good enough for lexical-semantic recall; swap in a
+    real model with set_embedder() or EMBEDDING_FN.
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        lowered = (text or "").lower()
+        features = tokenize(lowered) + [lowered[i:i + 3] for i in range(len(lowered) - 2)]
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            matrix[row, h % dim] += 1.0 if h & 0x80000000 else -1.0
+    return _normalize(matrix)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _load_embedder():
+    if not EMBEDDING_FN:
+        return hash_embedding
+    module, _, name = EMBEDDING_FN.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def context_texts(context: dict) -> dict:
+    """Searchable text of a context per language: title, conditions and boundary descriptions."""
+    texts = {}
+    for lang in ("zh", "en"):
+        parts = [(context.get("title") or {}).get(lang, "")]
+        parts += (context.get("conditions") or {}).get(lang, []) or []
+        for boundary in context.get("decision_boundaries") or []:
+            parts.append((boundary.get("description") or {}).get(lang, ""))
+        text = "\n".join(p for p in parts if p)
+        if text.strip():
+            texts[lang] = text
+    return texts
+
+
+def _document_key(item: dict) -> str:
+    # 舊版的資料列沒有 document_key，當時以 document_id 為鍵
+    return item.get("document_key") or item["document_id"]
+
+
+class VectorIndex:
+    """
+    Embedded hybrid index over extracted contexts.
+
+    Vectors are appended to a raw float32 file and loaded as a read-only
+    memory map. Small corpora are searched brute force; above
+    IVF_MIN_VECTORS an inverted-file index (k-means centroids) narrows the
+    search to the nearest lists. BM25 keyword scores are mixed into the
+    vector scores with weight 1 - HYBRID_ALPHA.
+
+    Vectors are written before their items.jsonl lines, which are the
+    commit point: on load both files are cut back to the rows that are
+    complete in each, so a crash between the two writes loses at most the
+    document being added.
+    """
+
+    def __init__(self, directory: str = VECTOR_DIR, dim: int = EMBEDDING_DIM):
+        self.directory = directory
+        self.dim = dim
+        self.embed = _load_embedder()
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._building = None      # background IVF build thread
+        self.version = 0           # bumped on every change, for caches built on search results
+        self._reset()
+
+    def _reset(self):
+        self.items = []
+        self.deleted_before = {}   # document key -> rows below this index are stale
+        self.documents = set()
+        self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self.postings = defaultdict(dict)
+        self.lengths = []
+        self.centroids = None
+        self.lists = []
+        self.indexed = 0
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _items_path(self):
+        return os.path.join(self.directory, "items.jsonl")
+
+    @property
+    def _ivf_path(self):
+        return os.path.join(self.directory, "ivf.npz")
+
+    def set_embedder(self, fn):
+        """fn(list[str]) -> float32 array (n, dim), rows L2-normalized."""
+        self.embed = fn
+
+    # ---------- persistence ----------
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            starts = self._replay_items()
+            row_bytes = self.dim * np.dtype(np.float32).itemsize
+            size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+            if size < len(self.items) * row_bytes:
+                # 向量不足的資料列無法搜尋：截掉它們的 items 行後重新載入
+                os.truncate(self._items_path, starts[size // row_bytes])
+                self._reset()
+                self._replay_items()
+            if size > len(self.items) * row_bytes:
+                # 向量已寫入但 items 行沒寫完的文件
+                os.truncate(self._vectors_path, len(self.items) * row_bytes)
+            self._map_vectors()
+            if os.path.exists(self._ivf_path):
+                data = np.load(self._ivf_path)
+                if int(data["indexed"]) <= len(self.items):
+                    self.centroids = data["centroids"]
+                    self.indexed = int(data["indexed"])
+                    offsets = data["offsets"]
+                    self.lists = np.split(data["rows"], offsets[1:-1])
+            self._loaded = True
+
+    def _replay_items(self) -> list:
+        """
+        Apply every complete line of items.jsonl and cut off a partial last
+        one. Returns the byte offset at which each item row's line starts.
+        """
+        starts = []
+        if not os.path.exists(self._items_path):
+            return starts
+        good = 0
+        with open(self._items_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if "deleted" in record:
+                    self.deleted_before[record["deleted"]] = record["before"]
+                else:
+                    starts.append(good)
+                    self._append_item(record)
+                good += len(line)
+        if good < os.path.getsize(self._items_path):
+            os.truncate(self._items_path, good)
+        return starts
+
+    def _map_vectors(self):
+        n = len(self.items)
+        if n and os.path.exists(self._vectors_path):
+            # 零複製載入：直接映射磁碟上的 float32 矩陣
+            self.matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        else:
+            self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+
+    def _append_item(self, record: dict):
+        row = len(self.items)
+        counts = Counter(tokenize(record["text"]))
+        for term, tf in counts.items():
+            self.postings[term][row] = tf
+        self.lengths.append(sum(counts.values()))
+        # 文字只留在磁碟上，記憶體中只保留查詢結果需要的欄位
+        self.items.append({key: value for key, value in record.items() if key != "text"})
+        self.documents.add(_document_key(record))
+
+    # ---------- writes ----------
+
+    def add_summary(self, summary: dict, lineage: str = None):
+        """
+        Index every context of an extraction result, replacing older rows of
+        the same document. Rows are keyed by the revision lineage (see
+        lineage_key), not by the extracted document_id, which unrelated
+        documents may share.
+        """
+        document_id = summary_document_id(summary)
+        document_key = lineage_key(summary, lineage)
+        records = []
+        for context in summary.get("contexts") or []:
+            for lang, text in context_texts(context).items():
+                records.append({
+                    "id": f"{document_key}/{context.get('context_id')}",
+                    "document_id": document_id,
+                    "document_key": document_key,
+                    "context_id": context.get("context_id"),
+                    "lang": lang,
+                    "title": (context.get("title") or {}).get(lang, ""),
+                    "text": text,
+                })
+
+        vectors = [
+            self.embed([r["text"] for r in records[i:i + EMBEDDING_BATCH]])
+            for i in range(0, len(records), EMBEDDING_BATCH)
+        ]
+
+        with self._lock:
+            self.load()
+            # 先寫向量，再寫 items 行作為提交點
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(len(self.items) * self.dim * np.dtype(np.float32).itemsize)
+                for block in vectors:
+                    f.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+            lines = []
+            # 同一文件重新擷取時，舊的列標記為失效
+            if document_key in self.documents:
+                lines.append(json.dumps({"deleted": document_key, "before": len(self.items)}) + "\n")
+            lines += [json.dumps(record, ensure_ascii=False) + "\n" for record in records]
+            with open(self._items_path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            if document_key in self.documents:
+                self.deleted_before[document_key] = len(self.items)
+            for record in records:
+                self._append_item(record)
+            self._map_vectors()
+            self.version += 1
+
+            if len(self.items) >= IVF_MIN_VECTORS and len(self.items) - self.indexed > 0.1 * len(self.items):
+                self._schedule_ivf()
+
+    def _schedule_ivf(self):
+        # k-means 可能要數十秒，在背景執行緒中重建，搜尋期間沿用舊索引
+        if self._building is None or not self._building.is_alive():
+            self._building = threading.Thread(target=self.build_ivf, name="ivf-build", daemon=True)
+            self._building.start()
+
+    def build_ivf(self, nlist: int = None, iterations: int = 8, sample: int = 100_000):
+        """
+        Train k-means centroids on a sample and assign every vector to its
+        nearest list. Training runs on a snapshot without holding the lock;
+        rows added meanwhile are searched brute force until the next build.
+        """
+        with self._lock:
+            self.load()
+            n = len(self.items)
+            matrix = self.matrix
+        if n == 0:
+            return
+        nlist = nlist or max(int(math.sqrt(n)), 1)
+        rng = np.random.default_rng(0)
+        train = np.asarray(matrix[rng.choice(n, min(sample, n), replace=False)])
+        centroids = train[rng.choice(len(train), nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = train[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        assign = np.concatenate([
+            np.argmax(matrix[i:i + 65536] @ centroids.T, axis=1)
+            for i in range(0, n, 65536)
+        ])
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        tmp_path = self._ivf_path + ".tmp.npz"
+        np.savez(tmp_path, centroids=centroids, rows=order, offsets=offsets, indexed=n)
+        with self._lock:
+            os.replace(tmp_path, self._ivf_path)
+            self.centroids = centroids
+            self.lists = np.split(order, offsets[1:-1])
+            self.indexed = n
+
+    # ---------- search ----------
+
+    def _vector_candidates(self, query: np.ndarray, limit: int):
+        n = len(self.items)
+        if self.centroids is not None:
+            nearest = np.argsort(self.centroids @ query)[::-1][:IVF_NPROBE]
+            rows = np.sort(np.concatenate([self.lists[c] for c in nearest] + [np.arange(self.indexed, n)]))
+            scores = self.matrix[rows] @ query
+        else:
+            rows = np.arange(n)
+            scores = self.matrix @ query
+        if len(rows) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            rows, scores = rows[top], scores[top]
+        return dict(zip(rows.tolist(), scores.tolist()))
+
+    def _bm25(self, terms: list, rows, k1: float = 1.5, b: float = 0.75) -> dict:
+        n = len(self.items)
+        avg = sum(self.lengths) / n
+        scores = defaultdict(float)
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            # 常見詞只對候選列計分，避免掃描整個 posting list
+            targets = posting.keys() if len(posting) <= 10_000 else (r for r in rows if r in posting)
+            for row in targets:
+                tf = posting[row]
+                scores[row] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * self.lengths[row] / avg))
+        return scores
+
+    def search(self, query: str, k: int = 10, alpha: float = HYBRID_ALPHA) -> list:
+        """Top-k contexts for a query, scored alpha * cosine + (1 - alpha) * normalized BM25."""
+        with self._lock:
+            self.load()
+            if not self.items:
+                return []
+            vector = self.embed([query])[0]
+            candidates = self._vector_candidates(vector, k * 20)
+            keyword = self._bm25(tokenize(query), list(candidates))
+            top_keyword = max(keyword.values(), default=0.0) or 1.0
+
+            best = {}
+            for row in set(candidates) | set(keyword):
+                item = self.items[row]
+                if row < self.deleted_before.get(_document_key(item), 0):
+                    continue
+                score = alpha * candidates.get(row, 0.0) + (1 - alpha) * keyword.get(row, 0.0) / top_keyword
+                if score > best.get(item["id"], (float("-inf"),))[0]:
+                    best[item["id"]] = (score, item)
+
+            ranked = sorted(best.values(), key=lambda pair: pair[0], reverse=True)[:k]
+            return [
+                {
+                    "document_id": item["document_id"],
+                    "document_key": _document_key(item),
+                    "context_id": item["context_id"],
+                    "title": item["title"],
+                    "score": round(score, 4),
+                }
+                for score, item in ranked
+            ]
+
+
+vector_index = VectorIndex()
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from app.utils.config import PROCESS_POOL_WORKERS
+
+_executor = None
+
+
+def _init_worker():
+    # spawn 啟動的 worker 不會繼承主程序的 logging 設定
+    from app.utils.tracing import setup_logging
+    setup_logging()
+    # 每個 worker 啟動時先載入字體與樣式，之後的渲染直接重用
+    from app.services.pdf_service import get_renderer
+    get_renderer()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=PROCESS_POOL_WORKERS,
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+async def run_cpu(fn, *args):
+    """Run a picklable function in the process pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), fn, *args)
+
+
+def peak_rss_mb():
+    """Peak resident memory of the current process in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measured_call(fn, *args):
+    """
+    Call fn in a worker and also return the CPU seconds it used and how many
+    MB it raised the worker's peak RSS by (0 if it stayed below an earlier
+    peak, None where unsupported).
+    """
+    peak = peak_rss_mb()
+    started = time.process_time()
+    result = fn(*args)
+    cpu_s = time.process_time() - started
+    return result, cpu_s, None if peak is None else round(peak_rss_mb() - peak, 1)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def cpu_bound(inputs, output, timeout=None, retries=0):
+    """
+    Mark a module-level function as a CPU-bound pipeline step. The pipeline
+    calls it in the process pool with the named PipelineContext attributes
+    and stores the return value on ctx.<output>.
+    """
+    def decorate(fn):
+        fn.cpu_bound = True
+        fn.inputs = tuple(inputs)
+        fn.output = output
+        fn.outputs = (output,)
+        fn.timeout = timeout
+        fn.retries = retries
+        return fn
+    return decorate
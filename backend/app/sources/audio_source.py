@@ -0,0 +1,56 @@
+import asyncio
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+
+
+class AudioSource:
+    """
+    Decode an audio file with ffmpeg into 16 kHz mono windows, one window at
+    a time, so long recordings never sit fully decoded in memory. Consecutive
+    windows share `overlap_seconds` of audio, so speech at a window edge is
+    whole in at least one of them.
+    """
+
+    def __init__(self, path: str, window_seconds: float, overlap_seconds: float = 0.0):
+        self.path = path
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+
+    async def windows(self):
+        """Yield (start_seconds, float32 waveform) per window."""
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-loglevel", "error", "-i", self.path,
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        window_bytes = int(self.window_seconds * SAMPLE_RATE) * BYTES_PER_SAMPLE
+        overlap_bytes = min(int(self.overlap_seconds * SAMPLE_RATE) * BYTES_PER_SAMPLE, window_bytes // 2)
+        start = 0.0
+        tail = b""
+        try:
+            while True:
+                wanted = window_bytes - len(tail)
+                try:
+                    data = await process.stdout.readexactly(wanted)
+                except asyncio.IncompleteReadError as exc:
+                    data = exc.partial
+                if data:
+                    window = tail + data
+                    samples = np.frombuffer(window, dtype=np.int16).astype(np.float32) / 32768.0
+                    yield start, samples
+                    # 視窗結尾的 overlap 段落作為下一個視窗的開頭
+                    tail = window[len(window) - overlap_bytes:] if overlap_bytes else b""
+                    start += (len(window) - len(tail)) / BYTES_PER_SAMPLE / SAMPLE_RATE
+                if len(data) < wanted:
+                    break
+            if await process.wait() != 0:
+                error = await process.stderr.read()
+                raise ValueError(f"ffmpeg failed: {error.decode(errors='replace').strip()}")
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
@@ -1,8 +1,17 @@
-from app.utils.file_parser import parse_file
+from app.utils.file_parser import spool_upload, parse_upload
+from app.pipelines.context import PipelineContext
 
 class DocumentSource:
     def __init__(self, file):
         self.file = file
 
-    async def load(self):
-        return await parse_file(self.file)
+    async def load(self) -> PipelineContext:
+        ctx = PipelineContext(file=self.file)
+        upload = await spool_upload(self.file)
+        try:
+            ctx.content_hash = upload.sha256
+            ctx.document = await parse_upload(upload)
+        finally:
+            upload.close()
+        ctx.raw_text = ctx.document.text
+        return ctx
@@ -1,10 +1,19 @@
+import logging
 import os
+import threading
 import torch
 import numpy as np
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 from pyannote.audio import Pipeline
 from pydub import AudioSegment
-from app.utils.config import WHISPER_LOCAL_DIR, PYANNOTE_LOCAL_DIR
+from app.utils.config import (
+    WHISPER_LOCAL_DIR, PYANNOTE_LOCAL_DIR,
+    ASR_BATCH_SIZE, ASR_NUM_THREADS, ASR_INT8,
+)
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
 
 
 def format_timestamp(seconds: float) -> str:
@@ -14,8 +23,157 @@ def format_timestamp(seconds: float) -> str:
     return f"{hours:02}:{minutes:02}:{secs:06.3f}"
 
 
-def cut_audio(audio: AudioSegment, start_sec: float, end_sec: float) -> AudioSegment:
-    return audio[int(start_sec * 1000): int(end_sec * 1000)]
+def load_audio(path: str) -> np.ndarray:
+    """Decode an audio file to a mono 16 kHz float32 waveform."""
+    audio = AudioSegment.from_file(path).set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+    return np.frombuffer(audio.raw_data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class ASRService:
+    """
+    Whisper transcription plus pyannote diarization, loaded once and reused.
+
+    Segments are sliced from an in-memory waveform (no temp files) and sent
+    to Whisper in batches, sorted by length so each batch pads little.
+    """
+
+    def __init__(
+        self,
+        whisper_dir: str = WHISPER_LOCAL_DIR,
+        pyannote_dir: str = PYANNOTE_LOCAL_DIR,
+        language: str = "zh",
+        batch_size: int = ASR_BATCH_SIZE,
+        num_threads: int = ASR_NUM_THREADS,
+        int8: bool = ASR_INT8,
+    ):
+        if not os.path.exists(whisper_dir):
+            raise FileNotFoundError(f"Whisper 模型資料夾不存在: {whisper_dir}")
+        if not os.path.exists(pyannote_dir):
+            raise FileNotFoundError(f"Pyannote 模型資料夾不存在: {pyannote_dir}")
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.language = language
+        self.batch_size = batch_size
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        dtype = torch.float16 if self.device == "cuda" else torch.float32
+
+        logger.info("ASR device", extra={"device": self.device, "dtype": str(dtype), "int8": int8 and self.device == "cpu"})
+
+        # ============ Whisper (HF Transformers pipeline) ============
+
+        logger.info("Loading Whisper model from local folder")
+        model = AutoModelForSpeechSeq2Seq.from_pretrained(
+            whisper_dir,
+            torch_dtype=dtype,
+            low_cpu_mem_usage=True
+        ).to(self.device)
+
+        if int8 and self.device == "cpu":
+            # CPU 上以動態 int8 量化 Linear 層
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        processor = AutoProcessor.from_pretrained(whisper_dir)
+
+        self.whisper = pipeline(
+            "automatic-speech-recognition",
+            model=model,
+            tokenizer=processor.tokenizer,
+            feature_extractor=processor.feature_extractor,
+            device=0 if self.device == "cuda" else -1
+        )
+
+        # ============ Pyannote diarization ============
+
+        logger.info("Loading Pyannote pipeline from local folder")
+        self.diarization = Pipeline.from_pretrained(pyannote_dir)
+
+        # 模型本身不是 thread-safe，同時只允許一個呼叫
+        self._lock = threading.Lock()
+
+    def diarize(self, waveform: np.ndarray) -> list:
+        """Speaker turns as (start, end, speaker), in seconds from the start of waveform."""
+        return self.diarize_speakers(waveform)[0]
+
+    def diarize_speakers(self, waveform: np.ndarray) -> tuple:
+        """
+        (speaker turns, {speaker: embedding}). The embeddings let callers
+        that diarize a recording in pieces match speakers across the pieces;
+        the dict is empty if the pipeline does not return them.
+        """
+        with self._lock:
+            result = self.diarization({
+                "waveform": torch.from_numpy(waveform).unsqueeze(0),
+                "sample_rate": SAMPLE_RATE,
+            })
+        annotation = getattr(result, "speaker_diarization", result)
+        turns = [
+            (float(turn.start), float(turn.end), speaker)
+            for turn, _, speaker in annotation.itertracks(yield_label=True)
+        ]
+        # pyannote 4: speaker_embeddings[i] 對應 labels()[i]
+        vectors = getattr(result, "speaker_embeddings", None)
+        embeddings = dict(zip(annotation.labels(), vectors)) if vectors is not None else {}
+        return turns, embeddings
+
+    def transcribe_segments(self, waveform: np.ndarray, segments: list, min_duration: float = 0.5) -> list:
+        # 太短的段落直接跳過
+        segments = [s for s in segments if s[1] - s[0] >= min_duration]
+        if not segments:
+            return []
+
+        # 依長度排序後分批送進 Whisper
+        order = sorted(range(len(segments)), key=lambda i: segments[i][1] - segments[i][0])
+        inputs = [
+            {
+                "raw": waveform[int(segments[i][0] * SAMPLE_RATE): int(segments[i][1] * SAMPLE_RATE)],
+                "sampling_rate": SAMPLE_RATE,
+            }
+            for i in order
+        ]
+        with self._lock:
+            outputs = self.whisper(
+                inputs,
+                batch_size=self.batch_size,
+                generate_kwargs={"language": self.language},
+                return_timestamps=False
+            )
+
+        results = [None] * len(segments)
+        for i, output in zip(order, outputs):
+            start, end, speaker = segments[i]
+            results[i] = {
+                "speaker": speaker,
+                "start": start,
+                "end": end,
+                "text": output["text"].strip(),
+            }
+        return results
+
+    def transcribe(self, audio) -> list:
+        """Diarize and transcribe a file path or a 16 kHz float32 waveform."""
+        waveform = load_audio(audio) if isinstance(audio, str) else audio
+        return self.transcribe_segments(waveform, self.diarize(waveform))
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_asr_service() -> ASRService:
+    """Process-wide ASR service, loaded on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ASRService()
+    return _service
+
+
+def write_transcript(results: list, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for r in results:
+            f.write(f"{r['speaker']} [{format_timestamp(r['start'])} - {format_timestamp(r['end'])}]\n")
+            f.write(r["text"] + "\n\n")
 
 
 def main():
@@ -34,104 +192,22 @@ def main():
         print(f"[ERROR] 音檔不存在: {AUDIO_PATH}")
         return
 
-    if not os.path.exists(WHISPER_LOCAL_DIR):
-        print(f"[ERROR] Whisper 模型資料夾不存在: {WHISPER_LOCAL_DIR}")
-        return
-
-    if not os.path.exists(PYANNOTE_LOCAL_DIR):
-        print(f"[ERROR] Pyannote 模型資料夾不存在: {PYANNOTE_LOCAL_DIR}")
+    try:
+        service = ASRService(language=LANGUAGE)
+    except FileNotFoundError as exc:
+        print(f"[ERROR] {exc}")
         return
 
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-
-    print(f"[INFO] device={device}, dtype={dtype}")
-
-    # ============ Whisper (HF Transformers pipeline) ============
-
-    print("[INFO] Loading Whisper model from local folder...")
-
-    model = AutoModelForSpeechSeq2Seq.from_pretrained(
-        WHISPER_LOCAL_DIR,
-        torch_dtype=dtype,
-        low_cpu_mem_usage=True
-    ).to(device)
-
-    processor = AutoProcessor.from_pretrained(WHISPER_LOCAL_DIR)
-
-    whisper_asr = pipeline(
-        "automatic-speech-recognition",
-        model=model,
-        tokenizer=processor.tokenizer,
-        feature_extractor=processor.feature_extractor,
-        device=0 if device == "cuda" else -1
-    )
-
-    # ============ Pyannote diarization ============
-
-    print("[INFO] Loading Pyannote pipeline from local folder...")
-    diarization_pipeline = Pipeline.from_pretrained(PYANNOTE_LOCAL_DIR)
-
-    # ============ Load full audio ============
-
-    print("[INFO] Loading audio...")
-    audio = AudioSegment.from_file(AUDIO_PATH)
-
-    # ============ Speaker diarization ============
-
-    print("[INFO] Running diarization...")
-    diarization = diarization_pipeline(AUDIO_PATH)
-
-    # ============ Transcribe each speaker segment ============
-
-    print("[INFO] Transcribing segments...")
-    results = []
-
-    for turn, _, speaker in diarization.itertracks(yield_label=True):
-        start = float(turn.start)
-        end = float(turn.end)
-
-        # 太短的段落直接跳過
-        if end - start < 0.5:
-            continue
-
-        segment_audio = cut_audio(audio, start, end)
-
-        temp_wav = "temp_segment.wav"
-        segment_audio.export(temp_wav, format="wav")
-
-        # Whisper transcription
-        asr_result = whisper_asr(
-            temp_wav,
-            generate_kwargs={"language": LANGUAGE},
-            return_timestamps=False
-        )
-
-        text = asr_result["text"].strip()
-
-        results.append({
-            "speaker": speaker,
-            "start": start,
-            "end": end,
-            "text": text
-        })
-
-        print(f"{speaker} [{format_timestamp(start)} - {format_timestamp(end)}] {text}")
-
-    # ============ Save output ============
+    print("[INFO] Transcribing...")
+    results = service.transcribe(AUDIO_PATH)
+    for r in results:
+        print(f"{r['speaker']} [{format_timestamp(r['start'])} - {format_timestamp(r['end'])}] {r['text']}")
 
     print("[INFO] Writing output...")
-    with open(OUTPUT_TXT, "w", encoding="utf-8") as f:
-        for r in results:
-            f.write(f"{r['speaker']} [{format_timestamp(r['start'])} - {format_timestamp(r['end'])}]\n")
-            f.write(r["text"] + "\n\n")
+    write_transcript(results, OUTPUT_TXT)
 
     print(f"[DONE] Saved to {OUTPUT_TXT}")
 
-    # 清除暫存檔
-    if os.path.exists("temp_segment.wav"):
-        os.remove("temp_segment.wav")
-
 
 if __name__ == "__main__":
     main()
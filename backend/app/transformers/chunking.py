@@ -0,0 +1,151 @@
+import hashlib
+import re
+
+from app.utils.config import CHUNK_MAX_CHARS, CHUNK_ANCHOR_PAGES
+from app.utils.file_parser import ParsedDocument
+
+# 空行，或以章節編號 / Markdown 標題開頭的行
+SECTION_BOUNDARY = re.compile(
+    r"\n\s*\n|\n(?=\s*(?:\d+(?:\.\d+)*\.?\s|第[一二三四五六七八九十百零\d]+[章節條]|#{1,6}\s))"
+)
+
+
+def split_sections(text: str) -> list:
+    return [s for s in SECTION_BOUNDARY.split(text) if s.strip()]
+
+
+def _hard_split(text: str, max_chars: int) -> list:
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_MAX_CHARS) -> list:
+    return chunk_document(ParsedDocument.from_text(text), max_chars)
+
+
+def chunk_document(document: ParsedDocument, max_chars: int = CHUNK_MAX_CHARS) -> list:
+    """
+    Pack pages (and, for oversized pages, sections) into chunks of at most
+    max_chars characters. Each chunk remembers the page range it covers.
+
+    Besides the size limit, a chunk also ends after an "anchor" page, chosen
+    from the page content itself. Chunk boundaries therefore follow the
+    content: editing or inserting a page in a new revision only changes the
+    chunks around it, and the other chunks keep their fingerprints.
+    """
+    pieces = []
+    for page_no, page in document.pages():
+        if not page.strip():
+            continue
+        if len(page) <= max_chars:
+            pieces.append((page_no, page, _is_anchor(page)))
+            continue
+        parts = [part for section in split_sections(page) for part in _hard_split(section, max_chars)]
+        for i, part in enumerate(parts):
+            pieces.append((page_no, part, i == len(parts) - 1 and _is_anchor(page)))
+
+    chunks = []
+    current, size = [], 0
+    for page_no, piece, anchor in pieces:
+        if current and size + len(piece) > max_chars:
+            chunks.append(current)
+            current, size = [], 0
+        current.append((page_no, piece))
+        size += len(piece)
+        if anchor:
+            chunks.append(current)
+            current, size = [], 0
+    if current:
+        chunks.append(current)
+
+    return [_make_chunk(parts) for parts in chunks]
+
+
+def _is_anchor(page: str) -> bool:
+    digest = hashlib.blake2b(page.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % CHUNK_ANCHOR_PAGES == 0
+
+
+def _make_chunk(parts: list) -> dict:
+    lines = []
+    last_page = None
+    # 指紋只看內容，不含頁碼，頁面位移時仍可比對
+    fingerprint = hashlib.sha256()
+    for page_no, piece in parts:
+        fingerprint.update(piece.encode("utf-8"))
+        fingerprint.update(b"\0")
+        if page_no != last_page:
+            lines.append(f"--- Page {page_no} ---")
+            last_page = page_no
+        lines.append(piece)
+    return {
+        "text": "\n".join(lines),
+        "first_page": parts[0][0],
+        "last_page": parts[-1][0],
+        "fingerprint": fingerprint.hexdigest(),
+    }
+
+
+def shift_pages(result: dict, offset: int) -> dict:
+    """Copy of a chunk result with every source_reference.page moved by offset pages."""
+    if not offset:
+        return result
+    contexts = []
+    for context in result.get("contexts") or []:
+        reference = context.get("source_reference") or {}
+        if reference.get("page"):
+            page = re.sub(r"\d+", lambda m: str(int(m.group()) + offset), reference["page"])
+            context = {**context, "source_reference": {**reference, "page": page}}
+        contexts.append(context)
+    return {**result, "contexts": contexts}
+
+
+def _normalize(value: str) -> str:
+    return re.sub(r"[\W_]+", "", (value or "").lower())
+
+
+class ContextMerger:
+    """Dedupe contexts coming from several chunks and renumber them CTX-001, CTX-002, ..."""
+
+    def __init__(self):
+        self.contexts = []
+        self._seen = set()
+
+    def add(self, context: dict, chunk: dict = None):
+        title = context.get("title") or {}
+        key = (
+            context.get("decision_level"),
+            _normalize(title.get("en")) or _normalize(title.get("zh")),
+        )
+        if key[1] and key in self._seen:
+            return None
+        self._seen.add(key)
+
+        context = dict(context)
+        context["context_id"] = f"CTX-{len(self.contexts) + 1:03d}"
+        reference = dict(context.get("source_reference") or {})
+        if not reference.get("page") and chunk:
+            first, last = chunk["first_page"], chunk["last_page"]
+            reference["page"] = str(first) if first == last else f"{first}-{last}"
+        if reference:
+            context["source_reference"] = reference
+        self.contexts.append(context)
+        return context
+
+
+def merge_extractions(results: list, merger: ContextMerger = None) -> dict:
+    """
+    Merge (summary, chunk) pairs from chunked extraction into one summary.
+    If the contexts were already fed to `merger` while streaming, its
+    numbering is kept as is.
+    """
+    metadata = {}
+    if merger is None:
+        merger = ContextMerger()
+        for summary, chunk in results:
+            for context in summary.get("contexts") or []:
+                merger.add(context, chunk)
+    for summary, _ in results:
+        for key, value in (summary.get("document_metadata") or {}).items():
+            if value and not metadata.get(key):
+                metadata[key] = value
+    return {"document_metadata": metadata, "contexts": merger.contexts}
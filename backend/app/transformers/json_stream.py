@@ -0,0 +1,63 @@
+import json
+
+
+class ContextStreamParser:
+    """
+    Incremental JSON scanner over the model's token stream.
+
+    feed() returns every element of the top-level array under `key` that has
+    been completed by the text seen so far, so contexts can be forwarded to
+    the client long before the whole object is closed.
+    """
+
+    def __init__(self, key: str = "contexts"):
+        self.key = key
+        self.closed = False       # top-level object fully received
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string = []
+        self._last_key = None
+        self._in_array = False
+        self._capturing = False
+        self._buffer = []
+
+    def feed(self, chunk: str) -> list:
+        completed = []
+        for ch in chunk:
+            if self._capturing:
+                self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = "".join(self._string)
+                elif self._depth == 1:
+                    self._string.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string = []
+            elif ch == "{" or ch == "[":
+                self._depth += 1
+                if ch == "[" and self._depth == 2 and self._last_key == self.key:
+                    self._in_array = True
+                elif ch == "{" and self._in_array and self._depth == 3:
+                    self._capturing = True
+                    self._buffer = ["{"]
+            elif ch == "}" or ch == "]":
+                if ch == "}" and self._capturing and self._depth == 3:
+                    self._capturing = False
+                    completed.append(json.loads("".join(self._buffer)))
+                elif ch == "]" and self._in_array and self._depth == 2:
+                    self._in_array = False
+                self._depth -= 1
+                if self._depth == 0:
+                    self.closed = True
+        return completed
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.utils.config import OLLAMA_HOST, LLM_MAX_CONCURRENCY, LLM_TIMEOUT, LLM_RETRIES
+from app.utils.metrics import LLM_TTFT, LLM_TOKENS, LLM_TOKENS_PER_SECOND
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class BackendUnavailable(LLMError):
+    """The host could not be reached or kept failing with 5xx before any output."""
+
+
+class _Retryable(Exception):
+    pass
+
+
+class LLMClient:
+    """
+    Async client for the Ollama HTTP API.
+
+    A single pooled keep-alive connection set is shared by all requests, and
+    a semaphore bounds how many generations run at once so bursts queue here
+    instead of piling onto the model server.
+    """
+
+    def __init__(
+        self,
+        host: str = OLLAMA_HOST,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT,
+        retries: int = LLM_RETRIES,
+        backoff: float = 0.5,
+    ):
+        self.host = host.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.host,
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        return self._client
+
+    async def chat_stream(self, model: str, messages: list, format=None, options=None):
+        """
+        Yield content tokens of a streaming /api/chat call. Connection errors
+        and 5xx responses are retried, but only before the first token arrives.
+        """
+        payload = {"model": model, "messages": messages, "stream": True}
+        if format is not None:
+            payload["format"] = format
+        if options:
+            payload["options"] = options
+
+        async with self._semaphore:
+            requested = time.perf_counter()
+            for attempt in range(self.retries + 1):
+                started = False
+                try:
+                    async with self._http().stream("POST", "/api/chat", json=payload) as response:
+                        if response.status_code >= 500:
+                            await response.aread()
+                            raise _Retryable(f"{response.status_code}: {response.text}")
+                        if response.status_code >= 400:
+                            await response.aread()
+                            raise LLMError(f"{response.status_code}: {response.text}")
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            data = json.loads(line)
+                            if "error" in data:
+                                raise LLMError(data["error"])
+                            content = data.get("message", {}).get("content", "")
+                            if content:
+                                if not started:
+                                    LLM_TTFT.observe(time.perf_counter() - requested, model=model)
+                                started = True
+                                yield content
+                            if data.get("done"):
+                                self._record_usage(model, data)
+                                break
+                    return
+                except (httpx.TransportError, _Retryable) as exc:
+                    if started:
+                        raise LLMError(f"LLM request to {self.host} failed: {exc}") from exc
+                    if attempt == self.retries:
+                        raise BackendUnavailable(f"LLM request to {self.host} failed: {exc}") from exc
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    @staticmethod
+    def _record_usage(model: str, data: dict):
+        # Ollama reports generated tokens and generation time (ns) in the final message
+        tokens = data.get("eval_count")
+        duration = data.get("eval_duration")
+        if tokens:
+            LLM_TOKENS.inc(tokens, model=model)
+            if duration:
+                LLM_TOKENS_PER_SECOND.observe(tokens / (duration / 1e9), model=model)
+
+    async def chat(self, model: str, messages: list, format=None, options=None) -> str:
+        parts = []
+        async for content in self.chat_stream(model, messages, format, options):
+            parts.append(content)
+        return "".join(parts)
+
+    async def models(self) -> list:
+        """Names of the models the host has pulled (also a cheap health check)."""
+        try:
+            response = await self._http().get("/api/tags", timeout=5.0)
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            raise BackendUnavailable(f"{self.host}: {exc}") from exc
+        return [model["name"] for model in response.json().get("models", [])]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
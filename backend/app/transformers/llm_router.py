@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+
+from app.transformers.llm_client import LLMClient, LLMError, BackendUnavailable
+from app.utils.config import (
+    OLLAMA_HOSTS, LLM_MAX_CONCURRENCY, LLM_RETRIES,
+    LLM_HEALTH_INTERVAL, LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN, LLM_INTERACTIVE_SLOTS,
+)
+from app.utils.metrics import LLM_BACKEND_OUTSTANDING, LLM_BACKEND_UP
+
+logger = logging.getLogger(__name__)
+
+
+def model_tag(name: str) -> str:
+    """Ollama model name with its implicit tag: "qwen3" and "qwen3:latest" are the same model."""
+    return name if ":" in name.rpartition("/")[2] else f"{name}:latest"
+
+
+class Backend:
+    """
+    One Ollama host: its client, in-flight count, concurrency cap and
+    circuit breaker state. The breaker opens after `failures` consecutive
+    failures and lets a single trial request through once `cooldown` has
+    passed (half-open); a success or a passing health check closes it.
+    """
+
+    def __init__(self, host: str, max_concurrency: int, failures: int, cooldown: float):
+        self.client = LLMClient(host, max_concurrency=max_concurrency + LLM_INTERACTIVE_SLOTS, retries=0)
+        self.host = self.client.host
+        self.max_concurrency = max_concurrency
+        self.failure_threshold = failures
+        self.cooldown = cooldown
+        self.outstanding = 0
+        self.failures = 0
+        self.opened_at = None       # 斷路器開啟時間，None 表示關閉
+        self.trial = False          # half-open 試探請求進行中
+        self.models = None          # 健康檢查取得的模型（含 tag），None 表示未知
+        self.num_ctx = None         # 目前載入的 num_ctx，Ollama 換 num_ctx 需重新載入模型
+
+    @classmethod
+    def parse(cls, spec: str, default_concurrency: int, failures: int, cooldown: float) -> "Backend":
+        host, _, cap = spec.partition("#")
+        return cls(host, int(cap) if cap else default_concurrency, failures, cooldown)
+
+    def context_for(self, num_ctx):
+        """
+        num_ctx to run a request at. The requested size is a minimum: while
+        requests are in flight at a larger size the new one joins them there
+        instead of forcing a reload under them.
+        """
+        if num_ctx is not None and self.outstanding and self.num_ctx is not None and self.num_ctx > num_ctx:
+            return self.num_ctx
+        return num_ctx
+
+    def reloads(self, num_ctx) -> bool:
+        return self.num_ctx is not None and self.context_for(num_ctx) != self.num_ctx
+
+    def available(self, model: str, now: float, reserve: int = 0) -> bool:
+        if self.outstanding >= self.max_concurrency + reserve:
+            return False
+        if not self.has_model(model):
+            return False
+        if self.opened_at is None:
+            return True
+        return not self.trial and now - self.opened_at >= self.cooldown
+
+    def has_model(self, model: str) -> bool:
+        return self.models is None or model_tag(model) in self.models
+
+    def acquire(self, now: float):
+        if self.opened_at is not None:
+            self.trial = True
+        self.outstanding += 1
+        LLM_BACKEND_OUTSTANDING.set(self.outstanding, backend=self.host)
+
+    def release(self):
+        self.outstanding -= 1
+        LLM_BACKEND_OUTSTANDING.set(self.outstanding, backend=self.host)
+
+    def succeeded(self):
+        self.failures = 0
+        self.trial = False
+        if self.opened_at is not None:
+            logger.info("LLM backend recovered", extra={"backend": self.host})
+            self.opened_at = None
+        LLM_BACKEND_UP.set(1, backend=self.host)
+
+    def failed(self, now: float):
+        self.failures += 1
+        self.trial = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("LLM backend circuit opened", extra={"backend": self.host})
+            self.opened_at = now
+            LLM_BACKEND_UP.set(0, backend=self.host)
+
+    def status(self) -> dict:
+        return {
+            "host": self.host,
+            "outstanding": self.outstanding,
+            "max_concurrency": self.max_concurrency,
+            "circuit": "closed" if self.opened_at is None else "open",
+            "failures": self.failures,
+            "models": None if self.models is None else sorted(self.models),
+        }
+
+
+class LLMRouter:
+    """
+    Spreads chat requests over a pool of Ollama hosts. Each request goes to
+    the available backend with the fewest outstanding requests; when every
+    backend is at its cap the request waits for a slot. A backend that
+    fails before producing output counts towards its circuit breaker and
+    the request is retried on another one.
+    """
+
+    def __init__(
+        self,
+        hosts: list = OLLAMA_HOSTS,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        retries: int = LLM_RETRIES,
+        health_interval: float = LLM_HEALTH_INTERVAL,
+        failures: int = LLM_BREAKER_FAILURES,
+        cooldown: float = LLM_BREAKER_COOLDOWN,
+    ):
+        self.backends = [Backend.parse(h, max_concurrency, failures, cooldown) for h in hosts]
+        self.retries = retries
+        self.health_interval = health_interval
+        self._changed = asyncio.Event()
+        self._health_task = None
+
+    def _pick(self, model: str, exclude: set, reserve: int = 0, num_ctx=None):
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b not in exclude and b.available(model, now, reserve)]
+        if not candidates:
+            return None
+        # 優先選不必重新載入模型的後端，再比負載
+        return min(candidates, key=lambda b: (b.reloads(num_ctx), b.outstanding))
+
+    def _reachable(self, model: str, exclude: set) -> bool:
+        """Whether any backend could take the request once it has a free slot."""
+        now = time.monotonic()
+        return any(
+            b not in exclude
+            and b.has_model(model)
+            and (b.opened_at is None or (not b.trial and now - b.opened_at >= b.cooldown))
+            for b in self.backends
+        )
+
+    async def _acquire(self, model: str, exclude: set, reserve: int = 0, num_ctx=None) -> tuple:
+        """(backend, num_ctx to run the request at) once a slot is free."""
+        while True:
+            backend = self._pick(model, exclude, reserve, num_ctx)
+            if backend is not None:
+                run_ctx = backend.context_for(num_ctx)
+                backend.acquire(time.monotonic())
+                backend.num_ctx = run_ctx
+                return backend, run_ctx
+            if not self._reachable(model, exclude):
+                # 所有後端的斷路器都開著：立即失敗，不排隊等待
+                raise BackendUnavailable(f"No LLM backend available for {model}")
+            # 全部滿載：等任一後端釋放名額
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    def _release(self, backend: Backend):
+        backend.release()
+        self._changed.set()
+
+    async def chat_stream(self, model: str, messages: list, format=None, options=None, interactive: bool = False):
+        """
+        Same contract as LLMClient.chat_stream, over the backend pool.
+        Interactive requests may also use LLM_INTERACTIVE_SLOTS extra slots
+        per backend, so user-facing answers never queue behind a backfill.
+        options["num_ctx"] is treated as a minimum (see Backend.context_for).
+        """
+        tried = set()
+        reserve = LLM_INTERACTIVE_SLOTS if interactive else 0
+        num_ctx = (options or {}).get("num_ctx")
+        for attempt in range(self.retries + 1):
+            backend, run_ctx = await self._acquire(model, tried if len(tried) < len(self.backends) else set(), reserve, num_ctx)
+            run_options = options if run_ctx == num_ctx else {**options, "num_ctx": run_ctx}
+            started = False
+            try:
+                # 呼叫端提早關閉時一併關閉後端串流，讓 Ollama 停止生成
+                async with aclosing(backend.client.chat_stream(model, messages, format, run_options)) as stream:
+                    async for content in stream:
+                        started = True
+                        yield content
+                backend.succeeded()
+                return
+            except BackendUnavailable:
+                backend.failed(time.monotonic())
+                tried.add(backend)
+                if attempt == self.retries:
+                    raise
+                logger.warning("LLM backend failed, retrying elsewhere", extra={"backend": backend.host})
+            except LLMError:
+                # 串流中斷是後端問題；未開始就失敗（4xx）是請求本身的問題，後端有回應
+                if started:
+                    backend.failed(time.monotonic())
+                else:
+                    backend.trial = False
+                raise
+            finally:
+                self._release(backend)
+            if len(tried) >= len(self.backends):
+                # 每台都失敗過，重試前先退避
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def chat(self, model: str, messages: list, format=None, options=None) -> str:
+        parts = []
+        async for content in self.chat_stream(model, messages, format, options):
+            parts.append(content)
+        return "".join(parts)
+
+    async def check_health(self):
+        """Refresh each backend's model list; the result drives the circuit breakers."""
+        async def check(backend: Backend):
+            try:
+                backend.models = {model_tag(name) for name in await backend.client.models()}
+                backend.succeeded()
+            except Exception as exc:
+                # 無法連線或 /api/tags 回應格式不對都算失敗；不能讓 gather 中斷健康檢查迴圈
+                if not isinstance(exc, BackendUnavailable):
+                    logger.warning("LLM health check failed", extra={"backend": backend.host, "error": repr(exc)})
+                backend.failed(time.monotonic())
+
+        await asyncio.gather(*(check(b) for b in self.backends))
+        self._changed.set()
+
+    async def _health_loop(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    def start(self):
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    def status(self) -> list:
+        return [b.status() for b in self.backends]
+
+    async def aclose(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for backend in self.backends:
+            await backend.client.aclose()
+
+
+llm_router = LLMRouter()
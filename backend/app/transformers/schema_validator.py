@@ -0,0 +1,109 @@
+import re
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def compile_schema(schema: dict):
+    """
+    Compile the JSON-schema subset used by extraction_schema.json (type,
+    properties, required, items, enum, pattern, minimum, maximum) into a
+    validator function. Patterns are compiled once here; the returned
+    function takes a value and returns a list of "path: problem" strings,
+    empty when the value is valid. Unknown keywords raise SchemaError so a
+    schema edit cannot silently go unchecked.
+    """
+    return _compile(schema, "$")
+
+
+_KNOWN = {"type", "properties", "required", "items", "enum", "pattern", "minimum", "maximum", "description"}
+
+
+def _compile(schema: dict, where: str):
+    unknown = set(schema) - _KNOWN
+    if unknown:
+        raise SchemaError(f"{where}: unsupported keywords {sorted(unknown)}")
+
+    checks = []
+
+    if "type" in schema:
+        if schema["type"] not in _TYPES:
+            raise SchemaError(f"{where}: unsupported type {schema['type']!r}")
+        expected, name = _TYPES[schema["type"]], schema["type"]
+
+        def check_type(value, path):
+            # bool 是 int 的子類別，數字型別不可接受 True/False
+            if not isinstance(value, expected) or (isinstance(value, bool) and name != "boolean"):
+                return [f"{path}: expected {name}"]
+            return []
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        checks.append(lambda value, path: [] if value in allowed else [f"{path}: not one of {allowed}"])
+
+    if "pattern" in schema:
+        pattern = re.compile(schema["pattern"])
+        checks.append(
+            lambda value, path: [] if not isinstance(value, str) or pattern.search(value)
+            else [f"{path}: does not match {pattern.pattern}"]
+        )
+
+    if "minimum" in schema or "maximum" in schema:
+        low, high = schema.get("minimum"), schema.get("maximum")
+
+        def check_range(value, path):
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                return []
+            if (low is not None and value < low) or (high is not None and value > high):
+                return [f"{path}: {value} outside [{low}, {high}]"]
+            return []
+        checks.append(check_range)
+
+    if "required" in schema:
+        required = list(schema["required"])
+        checks.append(
+            lambda value, path: [] if not isinstance(value, dict)
+            else [f"{path}: missing {key!r}" for key in required if key not in value]
+        )
+
+    if "properties" in schema:
+        properties = {key: _compile(sub, f"{where}.{key}") for key, sub in schema["properties"].items()}
+
+        def check_properties(value, path):
+            if not isinstance(value, dict):
+                return []
+            errors = []
+            for key, validate in properties.items():
+                if key in value:
+                    errors.extend(validate(value[key], f"{path}.{key}"))
+            return errors
+        checks.append(check_properties)
+
+    if "items" in schema:
+        validate_item = _compile(schema["items"], f"{where}[]")
+        checks.append(
+            lambda value, path: [] if not isinstance(value, list)
+            else [e for i, item in enumerate(value) for e in validate_item(item, f"{path}[{i}]")]
+        )
+
+    def validate(value, path: str = "$") -> list:
+        errors = []
+        for check in checks:
+            errors.extend(check(value, path))
+            if errors:
+                # 第一個失敗的檢查即停止，例如型別錯誤之後的其他檢查沒有意義
+                break
+        return errors
+
+    return validate
@@ -0,0 +1,61 @@
+import numpy as np
+
+from app.utils.config import SPEAKER_MATCH_THRESHOLD
+
+
+class SpeakerTracker:
+    """
+    Meeting-wide speaker labels for audio diarized window by window.
+
+    pyannote labels speakers per call, so SPEAKER_00 of one window need not
+    be SPEAKER_00 of the next. Each window's speaker embeddings are matched
+    to the running centroid of every speaker seen so far (cosine similarity,
+    greedy best pair first, one local speaker per global one); speakers
+    below the threshold get a new label.
+    """
+
+    def __init__(self, threshold: float = SPEAKER_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.centroids = []     # 各說話者 embedding 的累計（未正規化）
+
+    @staticmethod
+    def label(index: int) -> str:
+        return f"SPEAKER_{index:02}"
+
+    def assign(self, embeddings: dict) -> dict:
+        """Map the window's {local label: embedding} to meeting-wide labels."""
+        local = []
+        mapping = {}
+        for label, vector in embeddings.items():
+            vector = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(vector) if vector.size else 0.0
+            if not np.isfinite(norm) or norm == 0:
+                # 語音太短，pyannote 無法算出 embedding：給新標籤但不作為之後比對的依據
+                mapping[label] = self.label(len(self.centroids))
+                self.centroids.append(np.zeros(0, dtype=np.float32))
+                continue
+            local.append((label, vector / norm))
+
+        pairs = []
+        for i, (_, vector) in enumerate(local):
+            for j, centroid in enumerate(self.centroids):
+                if centroid.size == vector.size:
+                    similarity = float(vector @ centroid) / (float(np.linalg.norm(centroid)) or 1.0)
+                    if similarity >= self.threshold:
+                        pairs.append((similarity, i, j))
+
+        matched = {}
+        taken = set()
+        for _, i, j in sorted(pairs, reverse=True):
+            if i not in matched and j not in taken:
+                matched[i] = j
+                taken.add(j)
+
+        for i, (label, vector) in enumerate(local):
+            j = matched.get(i)
+            if j is None:
+                j = len(self.centroids)
+                self.centroids.append(np.zeros_like(vector))
+            self.centroids[j] = self.centroids[j] + vector
+            mapping[label] = self.label(j)
+        return mapping
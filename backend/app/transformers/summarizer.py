@@ -1,45 +1,280 @@
-import ollama
+import asyncio
 import os
 import json
+import hashlib
+import logging
+from contextlib import aclosing
+from functools import lru_cache
 
-async def summarize(text: str) -> dict:
-    print(f"User: {text}")
+from app.transformers.chunking import chunk_document, merge_extractions, shift_pages, ContextMerger
+from app.transformers.json_stream import ContextStreamParser
+from app.transformers.llm_router import llm_router
+from app.transformers.schema_validator import compile_schema, SchemaError
+from app.transformers.tokens import estimate_tokens, fit_num_ctx
+from app.utils.config import (
+    CHUNK_MAX_CHARS, CHUNK_ANCHOR_PAGES, EXTRACT_PARALLELISM, LLM_MODEL, LLM_NUM_CTX, LLM_ROUTES,
+    LLM_NUM_CTX_BUCKETS, EXTRACT_OUTPUT_RATIO, EXTRACT_MIN_OUTPUT_TOKENS,
+)
+from app.utils.file_parser import ParsedDocument
+from app.utils.metrics import INVALID_CONTEXTS, EXTRACTION_NUM_CTX, EXTRACTION_TOKENS
+from app.utils.tracing import span
 
-    current_dir = os.path.dirname(os.path.abspath(__file__))
+logger = logging.getLogger(__name__)
+
+MODEL = LLM_MODEL
+OPTIONS = {
+    'temperature': 0,      # High determinism for extraction
+    'num_ctx': LLM_NUM_CTX # Qwen3 supports large context
+}
+PROMPT_OVERHEAD = 32       # chat template tokens around the two messages
+
+
+def context_bucket(prompt_tokens: int, limit: int = LLM_NUM_CTX) -> int:
+    """
+    Smallest LLM_NUM_CTX_BUCKETS size that holds the prompt plus the
+    expected output, else limit (the full context, as before).
+    """
+    needed = prompt_tokens + max(EXTRACT_MIN_OUTPUT_TOKENS, int(prompt_tokens * EXTRACT_OUTPUT_RATIO))
+    return fit_num_ctx(needed, limit)
+
+
+def prompt_tokens_of(text: str) -> int:
+    return estimate_tokens(load_system_prompt()) + estimate_tokens(text) + PROMPT_OVERHEAD
+
+
+def document_num_ctx(texts: list) -> int:
+    """
+    One num_ctx for all chunks of a document: the bucket of its largest
+    chunk. Chunks of one document run in parallel on the same backends, and
+    Ollama reloads the model whenever num_ctx changes.
+    """
+    return max((context_bucket(prompt_tokens_of(text)) for text in texts), default=LLM_NUM_CTX)
+
+
+def route(text: str, num_ctx: int = None) -> tuple:
+    """
+    (model, options, prompt tokens) for an input: the first LLM_ROUTES
+    entry whose max_chars covers the text, else MODEL / OPTIONS. Unless
+    the route pins num_ctx, it is sized to the estimated prompt, or set to
+    num_ctx when the caller sized it for the whole document.
+    """
+    prompt_tokens = prompt_tokens_of(text)
+    model, options = MODEL, dict(OPTIONS)
+    for entry in LLM_ROUTES:
+        if len(text) <= entry["max_chars"]:
+            model = entry.get("model", MODEL)
+            if "num_ctx" in entry:
+                options["num_ctx"] = entry["num_ctx"]
+                return model, options, prompt_tokens
+            break
+    bucket = min(num_ctx, options["num_ctx"]) if num_ctx else context_bucket(prompt_tokens, options["num_ctx"])
+    if bucket < options["num_ctx"]:
+        # 輸出超出小 bucket 時截斷而不是讓 Ollama 丟掉 prompt 開頭，再以完整 num_ctx 重跑
+        options.update(num_ctx=bucket, num_predict=bucket - prompt_tokens)
+    return model, options, prompt_tokens
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=None)
+def load_system_prompt() -> str:
     system_prompt_path = os.path.join(current_dir, "system_prompt.txt")
     with open(system_prompt_path, "r", encoding="utf-8") as file:
-        system_prompt = file.read()
+        return file.read()
+
 
+@lru_cache(maxsize=None)
+def load_extraction_schema() -> dict:
     extraction_schema_path = os.path.join(current_dir, "extraction_schema.json")
     with open(extraction_schema_path, "r", encoding="utf-8") as file:
-        extraction_schema = json.load(file)
-
-    response = ollama.chat(
-        model="qwen3:8b",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": text}
-        ],
-        format=extraction_schema, # The core constraint
-        options={
-            'temperature': 0,      # High determinism for extraction
-            'num_ctx': 32768       # Qwen3 supports large context
-        },
-        stream=True
+        return json.load(file)
+
+
+@lru_cache(maxsize=None)
+def extraction_validators() -> tuple:
+    """Compiled validators for (the whole extraction, a single context)."""
+    schema = load_extraction_schema()
+    return compile_schema(schema), compile_schema(schema["properties"]["contexts"]["items"])
+
+
+def load_assets():
+    """
+    Read and check the prompt and schema once at startup, so a broken asset
+    fails the deploy instead of the first request. Everything is cached
+    afterwards; restart to pick up edits.
+    """
+    if not load_system_prompt().strip():
+        raise SchemaError("system_prompt.txt is empty")
+    extraction_validators()
+    _key_suffix()
+
+
+@lru_cache(maxsize=None)
+def _key_suffix() -> bytes:
+    parts = (
+        load_system_prompt(),
+        json.dumps(load_extraction_schema(), sort_keys=True),
+        MODEL,
+        json.dumps(OPTIONS, sort_keys=True),
+        str(CHUNK_MAX_CHARS),
+        str(CHUNK_ANCHOR_PAGES),
+        json.dumps(sorted(LLM_NUM_CTX_BUCKETS)),
     )
+    if LLM_ROUTES:
+        parts += (json.dumps(LLM_ROUTES, sort_keys=True),)
+    return b"".join(part.encode("utf-8") + b"\0" for part in parts)
+
+
+def extraction_key(text: str) -> str:
+    """
+    Content address of an extraction: everything that can change the model
+    output (input text, prompt, schema, model and options) goes into the hash.
+    """
+    h = hashlib.sha256(text.encode("utf-8"))
+    h.update(b"\0")
+    h.update(_key_suffix())
+    return h.hexdigest()
 
-    response_content = ""
-    print("Response: ", end='', flush=True)
-    for chunk in response:
-        content = chunk['message']['content']
-        print(content, end='', flush=True)
-        response_content += content
 
-    print()
+def _valid_context(context: dict, report: bool = True) -> bool:
+    errors = extraction_validators()[1](context, "$.contexts[]")
+    if errors and report:
+        INVALID_CONTEXTS.inc()
+        logger.warning("dropping invalid context", extra={"errors": errors[:5]})
+    return not errors
 
-    response_dict = json.loads(response_content)
+
+def validate_extraction(result: dict) -> dict:
+    """
+    Check model output against the schema. Contexts that do not validate
+    are dropped (the rest of the document is still usable); a broken
+    top level raises ValueError.
+    """
+    contexts = result.get("contexts") if isinstance(result, dict) else None
+    errors = extraction_validators()[0]({**result, "contexts": []} if isinstance(contexts, list) else result)
+    if errors:
+        raise ValueError(f"Model output does not match the extraction schema: {'; '.join(errors[:5])}")
+    result["contexts"] = [context for context in contexts if _valid_context(context)]
+    return result
+
+
+async def _generate(model: str, messages: list, options: dict, on_context=None) -> tuple:
+    """
+    Stream one extraction, stopping as soon as the top-level JSON object is
+    closed instead of waiting for the model to end its turn (it may pad the
+    output with whitespace). Returns (response text, closed).
+    """
+    parser = ContextStreamParser()
+    parts = []
+    stream = llm_router.chat_stream(model=model, messages=messages, format=load_extraction_schema(), options=options)
+    # 提早離開時關閉串流，連線中斷後 Ollama 停止生成
+    async with aclosing(stream):
+        async for content in stream:
+            parts.append(content)
+            for context in parser.feed(content):
+                # 與最終結果一致：不合 schema 的情境不送出（計數在 validate_extraction）
+                if on_context and _valid_context(context, report=False):
+                    on_context(context)
+            if parser.closed:
+                break
+    return "".join(parts), parser.closed
+
+
+async def summarize(text: str, on_context=None, num_ctx: int = None) -> dict:
+    """
+    Run one extraction. If on_context is given it is called with each
+    decision context as soon as it is complete in the token stream.
+    num_ctx overrides the per-input bucket (see document_num_ctx).
+    """
+    messages = [
+        {"role": "system", "content": load_system_prompt()},
+        {"role": "user", "content": text}
+    ]
+    model, options, prompt_tokens = route(text, num_ctx)
+
+    with span("summarize", model=model, chars=len(text), prompt_tokens=prompt_tokens) as attrs:
+        emitted = set()
+
+        def forward(context: dict):
+            # 重跑時不重複送出已送過的情境
+            key = json.dumps(context, sort_keys=True, ensure_ascii=False)
+            if on_context and key not in emitted:
+                emitted.add(key)
+                on_context(context)
+
+        response_content, closed = await _generate(model, messages, options, forward)
+        if not closed and "num_predict" in options:
+            logger.warning("extraction outgrew its num_ctx bucket, retrying with the full context",
+                           extra={"num_ctx": options["num_ctx"], "prompt_tokens": prompt_tokens})
+            EXTRACTION_NUM_CTX.inc(num_ctx=str(options["num_ctx"]))
+            options = dict(OPTIONS)
+            response_content, closed = await _generate(model, messages, options, forward)
+
+        output_tokens = estimate_tokens(response_content)
+        EXTRACTION_NUM_CTX.inc(num_ctx=str(options["num_ctx"]))
+        EXTRACTION_TOKENS.observe(prompt_tokens, kind="prompt")
+        EXTRACTION_TOKENS.observe(output_tokens, kind="output")
+        attrs.update(num_ctx=options["num_ctx"], output_tokens=output_tokens, response_chars=len(response_content))
+
+    logger.debug("extraction response", extra={"chars": len(text), "response_chars": len(response_content)})
+
+    # 物件結束後的多餘字元不影響解析
+    response_dict, _ = json.JSONDecoder().raw_decode(response_content.lstrip())
+    response_dict = validate_extraction(response_dict)
 
     # with open("./test/test3.json", "r", encoding="utf-8") as f:
     #     response_dict = json.load(f)
 
     return response_dict
+
+
+async def summarize_chunks(
+    chunks: list,
+    parallelism: int = EXTRACT_PARALLELISM,
+    on_context=None,
+    known: dict = None,
+) -> tuple:
+    """
+    Map-reduce extraction over chunks from chunk_document: extract each chunk
+    concurrently (at most `parallelism` at a time), then merge. Contexts are
+    deduped and renumbered as they arrive, so the ids passed to on_context
+    match the final result.
+
+    `known` maps chunk fingerprints to stored {"first_page", "result"}
+    records; those chunks reuse the stored result instead of calling the
+    model. Returns (summary, [(chunk result, chunk), ...]).
+    """
+    semaphore = asyncio.Semaphore(parallelism)
+    merger = ContextMerger()
+    known = known or {}
+    num_ctx = document_num_ctx([c["text"] for c in chunks if c["fingerprint"] not in known])
+
+    async def extract(chunk: dict) -> dict:
+        def collect(context: dict):
+            merged = merger.add(context, chunk)
+            if merged is not None and on_context:
+                on_context(merged)
+
+        stored = known.get(chunk["fingerprint"])
+        if stored is not None:
+            result = shift_pages(stored["result"], chunk["first_page"] - stored["first_page"])
+            for context in result.get("contexts") or []:
+                collect(context)
+            return result
+
+        async with semaphore:
+            return await summarize(chunk["text"], on_context=collect, num_ctx=num_ctx)
+
+    results = await asyncio.gather(*(extract(chunk) for chunk in chunks))
+    results = list(zip(results, chunks))
+    return merge_extractions(results, merger), results
+
+
+async def summarize_chunked(
+    document: ParsedDocument,
+    parallelism: int = EXTRACT_PARALLELISM,
+    on_context=None,
+) -> dict:
+    """Chunk the document along page/section boundaries and extract it map-reduce style."""
+    summary, _ = await summarize_chunks(chunk_document(document), parallelism, on_context)
+    return summary
@@ -0,0 +1,26 @@
+import re
+
+# 常見口語贅詞
+FILLERS = re.compile(r"(?:\b(?:um+|uh+|erm|you know)\b|嗯+|呃+|那個那個)[，,、\s]*", re.IGNORECASE)
+SPACES = re.compile(r"\s+")
+
+
+def clean_text(text: str) -> str:
+    text = FILLERS.sub("", text)
+    return SPACES.sub(" ", text).strip()
+
+
+def clean_segments(segments: list, max_gap: float = 1.0) -> list:
+    """Clean each segment and merge consecutive turns of the same speaker."""
+    cleaned = []
+    for segment in segments:
+        text = clean_text(segment["text"])
+        if not text:
+            continue
+        last = cleaned[-1] if cleaned else None
+        if last and last["speaker"] == segment["speaker"] and segment["start"] - last["end"] <= max_gap:
+            last["text"] = f"{last['text']} {text}"
+            last["end"] = segment["end"]
+        else:
+            cleaned.append({**segment, "text": text})
+    return cleaned
@@ -0,0 +1,26 @@
+import re
+
+from app.utils.config import LLM_NUM_CTX, LLM_NUM_CTX_BUCKETS
+
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token count without a tokenizer: about one token per CJK
+    character and one per four characters of everything else, which is
+    close enough to Qwen's tokenizer for budgeting (it errs high on
+    Latin text).
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def fit_num_ctx(needed: int, limit: int = LLM_NUM_CTX) -> int:
+    """Smallest LLM_NUM_CTX_BUCKETS size below limit that holds `needed` tokens, else limit."""
+    for size in sorted(LLM_NUM_CTX_BUCKETS):
+        if needed <= size < limit:
+            return size
+    return limit
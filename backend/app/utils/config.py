@@ -1,6 +1,92 @@
+import json
+import os
+
 DATAPATH = "./app/data"
 FONT_MSYH = 'C:/Windows/Fonts/msyh.ttc'
 FONT_MYSHBD = 'C:/Windows/Fonts/msyhbd.ttc'
 FONT_ARIALUNI = 'C:/Windows/Fonts/ARIALUNI.TTF'
 WHISPER_LOCAL_DIR = 'D:/Programing/Artificial_Intelligence/Models/ASR/whisper-large-v3'
-PYANNOTE_LOCAL_DIR = 'D:/Programing/Artificial_Intelligence/Models/ASR/pyannote-speaker-diarization'
\ No newline at end of file
+PYANNOTE_LOCAL_DIR = 'D:/Programing/Artificial_Intelligence/Models/ASR/pyannote-speaker-diarization'
+
+CACHE_PATH = "./app/data/extraction_cache.sqlite3"
+CACHE_MAX_ENTRIES = 512
+
+CHUNK_MAX_CHARS = 12000
+CHUNK_ANCHOR_PAGES = 4
+EXTRACT_PARALLELISM = 4
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+# 多台推論機以逗號分隔，"host#N" 指定該台的並行上限
+OLLAMA_HOSTS = [h.strip() for h in os.getenv("OLLAMA_HOSTS", OLLAMA_HOST).split(",") if h.strip()]
+LLM_MODEL = os.getenv("LLM_MODEL", "qwen3:8b")
+LLM_NUM_CTX = 32768
+# 擷取依估計的 prompt + 輸出 token 數選最小的 num_ctx；Ollama 換 num_ctx 會重新載入模型，設為 "" 停用
+LLM_NUM_CTX_BUCKETS = [int(n) for n in os.getenv("LLM_NUM_CTX_BUCKETS", "4096,8192,16384").split(",") if n.strip()]
+EXTRACT_OUTPUT_RATIO = 1.0        # expected output tokens per input token (bilingual JSON)
+EXTRACT_MIN_OUTPUT_TOKENS = 3072
+# 依輸入長度選模型 / num_ctx，例如 [{"max_chars": 8000, "model": "qwen3:4b", "num_ctx": 8192}]
+LLM_ROUTES = json.loads(os.getenv("LLM_ROUTES", "[]"))
+LLM_MAX_CONCURRENCY = 4
+LLM_TIMEOUT = 600
+LLM_RETRIES = 2
+LLM_HEALTH_INTERVAL = 15
+LLM_BREAKER_FAILURES = 3
+LLM_BREAKER_COOLDOWN = 30
+LLM_INTERACTIVE_SLOTS = 1  # extra slots per backend only interactive requests (answers) may use
+
+JOBS_PATH = "./app/data/jobs.sqlite3"
+JOBS_DIR = "./app/data/jobs"
+JOB_WORKERS = 2
+
+BATCH_DIR = "./app/data/batches"
+BATCH_QUEUE_SIZE = 4      # parsed documents waiting per LLM slot
+
+PROCESS_POOL_WORKERS = os.cpu_count() or 2
+
+SPOOL_THRESHOLD = 8 * 1024 * 1024
+PDF_PAGES_PER_TASK = 16
+OCR_ENABLED = os.getenv("OCR_ENABLED", "1") == "1"   # needs pytesseract and the tesseract binary
+OCR_LANGS = os.getenv("OCR_LANGS", "chi_tra+eng")
+OCR_MIN_CHARS = 16        # pages with less extracted text than this (and images) are OCR'd
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024      # per request, larger uploads get 413
+MEMORY_BUDGET = 1024 * 1024 * 1024        # upload buffers + estimated parser memory, all requests
+PARSE_MEMORY_FACTOR = 4                   # parser working set relative to the upload size
+MEMORY_WAIT_TIMEOUT = 30                  # seconds to queue for budget before 503
+
+REVISIONS_PATH = "./app/data/revisions.sqlite3"
+REVISION_MIN_OVERLAP = 0.5   # share of a new document's chunks a stored document must contain to be its previous revision
+
+GRAPH_PATH = "./app/data/graph.jsonl"
+GRAPH_COMPACT_MIN_OPS = 10_000   # the log is rewritten once it exceeds twice this or twice the last snapshot
+
+RESULTS_DIR = "./app/data/results"
+ARTIFACT_DIR = "./app/data/artifacts"
+ARTIFACT_MAX_BYTES = 2 * 1024 * 1024 * 1024   # rendered PDFs kept on disk, least recently used evicted first
+
+VECTOR_DIR = "./app/data/vectors"
+EMBEDDING_DIM = 256
+EMBEDDING_BATCH = 64
+EMBEDDING_FN = os.getenv("EMBEDDING_FN")   # "module:function", defaults to hashed n-grams
+IVF_MIN_VECTORS = 50_000
+IVF_NPROBE = 8
+HYBRID_ALPHA = 0.7
+
+RAG_MODEL = os.getenv("RAG_MODEL", LLM_MODEL)
+RAG_SEED_CONTEXTS = 8       # contexts retrieved by the hybrid index
+RAG_EXPAND_CONTEXTS = 12    # related contexts added through shared entities / roles
+RAG_PROMPT_TOKENS = 6000    # budget for the packed contexts
+RAG_CACHE_SIZE = 256        # assembled context packs kept per store version
+RAG_MAX_ANSWER_TOKENS = 1024
+
+ASR_BATCH_SIZE = 8
+ASR_NUM_THREADS = None   # torch.set_num_threads, None keeps torch's default
+ASR_INT8 = False         # dynamic int8 quantization of Whisper on CPU
+MEETING_WINDOW_SECONDS = 30
+MEETING_WINDOW_OVERLAP = 5        # seconds shared by consecutive windows; each turn is kept from one window only
+SPEAKER_MATCH_THRESHOLD = 0.5     # cosine similarity for a window's speaker to count as one already heard
+
+PARSE_TIMEOUT = 300
+RENDER_TIMEOUT = 120
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+TRACING = os.getenv("TRACING", "0") == "1"
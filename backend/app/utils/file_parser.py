@@ -1,48 +1,265 @@
 from fastapi import UploadFile
+from array import array
+from bisect import bisect_right
+import asyncio
+import hashlib
+import logging
 import os
-import io
+import tempfile
 
-from PyPDF2 import PdfReader
-import docx
+from app.services.memory_budget import memory_budget
+from app.services.worker_pool import run_cpu
+from app.utils import parsers
+from app.utils.config import SPOOL_THRESHOLD, PDF_PAGES_PER_TASK, MAX_UPLOAD_BYTES, PARSE_MEMORY_FACTOR, OCR_ENABLED
+from app.utils.metrics import UPLOAD_SIZE, PAGE_PARSE_SECONDS
+from app.utils.tracing import span
 
+logger = logging.getLogger(__name__)
 
-async def parse_file(file: UploadFile) -> str:
+PAGE_BREAK = "\f"
+READ_CHUNK = 1024 * 1024
+
+
+class ParsedDocument:
+    """
+    Extracted text of a document: the page texts joined by form feeds in one
+    string, plus the character offset where each page starts. `timings`
+    holds per-page parse times where the parser measures them (PDF).
+    """
+
+    def __init__(self, pages: list, timings: list = None):
+        self.timings = timings or []
+        self.offsets = array("Q")
+        position = 0
+        for page in pages:
+            self.offsets.append(position)
+            position += len(page) + len(PAGE_BREAK)
+        self.text = PAGE_BREAK.join(pages)
+
+    @classmethod
+    def from_text(cls, text: str) -> "ParsedDocument":
+        return cls(text.split(PAGE_BREAK))
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def page(self, number: int) -> str:
+        """Text of a page, numbered from 1."""
+        start = self.offsets[number - 1]
+        end = self.offsets[number] - len(PAGE_BREAK) if number < len(self.offsets) else len(self.text)
+        return self.text[start:end]
+
+    def pages(self):
+        for number in range(1, len(self) + 1):
+            yield number, self.page(number)
+
+    def page_at(self, offset: int) -> int:
+        """Page number (from 1) containing the given character offset."""
+        return max(bisect_right(self.offsets, offset), 1)
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class NoExtractableText(ValueError):
+    pass
+
+
+class SpooledUpload:
+    """
+    An upload read in chunks: `source` is the bytes (small files) or a temp
+    file path (anything above the spool threshold), with the size and
+    sha256 computed on the way through.
+    """
+
+    def __init__(self, filename: str, source, size: int, sha256: str, reserved: int = 0):
+        self.filename = filename
+        self.source = source
+        self.size = size
+        self.sha256 = sha256
+        self.reserved = reserved    # bytes of memory_budget held for the in-memory buffer
+
+    @property
+    def spooled(self) -> bool:
+        return isinstance(self.source, str)
+
+    def close(self):
+        if self.spooled and os.path.exists(self.source):
+            os.remove(self.source)
+        if self.reserved:
+            memory_budget.release(self.reserved)
+            self.reserved = 0
+
+
+async def parse_file(file: UploadFile) -> ParsedDocument:
+    """
+    Parse the uploaded file and extract text content page by page.
+    Supports the formats registered in app.utils.parsers, recognised by
+    content rather than extension. Raises ValueError for unsupported files.
     """
-    Parse the uploaded file and extract text content.
-    Supports PDF, DOCX, and TXT files.
-    Raises ValueError for unsupported file types.
+    upload = await spool_upload(file)
+    try:
+        return await parse_upload(upload)
+    finally:
+        upload.close()
+
+
+async def parse_upload(upload: SpooledUpload) -> ParsedDocument:
+    """
+    Parse an already spooled upload. The parser's working set (estimated as
+    PARSE_MEMORY_FACTOR x the upload size) is reserved from memory_budget
+    first, so concurrent large uploads queue instead of exhausting memory.
+    Raises NoExtractableText when no page yields any text.
     """
+    filename = (upload.filename or "").lower()
+    # 依內容判斷格式，副檔名只用來區分純文字格式；暫存檔的讀取與 zip 目錄解析不佔用事件迴圈
+    fmt = await asyncio.to_thread(parsers.detect, filename, upload.source)
 
-    filename = file.filename.lower()
+    async with memory_budget.reserve(upload.size * PARSE_MEMORY_FACTOR):
+        with span("parse_file", kind=fmt.name, spooled=upload.spooled, bytes=upload.size) as attrs:
+            if fmt.name == "pdf":
+                document = await _parse_pdf(upload.source)
+            else:
+                # 文字擷取是 CPU 密集工作，在 process pool 中執行
+                document = await run_cpu(parse_source, fmt.name, upload.source)
+            attrs["pages"] = len(document)
+            if document.timings:
+                attrs["ocr_pages"] = sum(1 for t in document.timings if "ocr" in t)
+                attrs["slowest_pages"] = sorted(document.timings, key=lambda t: -t["ms"])[:3]
+    if not document.text.replace(PAGE_BREAK, "").strip():
+        raise NoExtractableText(_empty_reason(document))
+    return document
 
-    if filename.endswith(".pdf"):
-        return await _parse_pdf(file)
 
-    elif filename.endswith(".docx"):
-        return await _parse_docx(file)
+def _empty_reason(document: ParsedDocument) -> str:
+    unavailable = sum(1 for t in document.timings if t.get("ocr") == "unavailable")
+    if unavailable:
+        return (f"No extractable text: {unavailable} scanned page(s) need OCR,"
+                " install pytesseract and the tesseract binary")
+    if not OCR_ENABLED and document.timings:
+        return "No extractable text: the document has no text layer and OCR is disabled (OCR_ENABLED=0)"
+    return "No extractable text in the upload"
 
-    elif filename.endswith(".txt"):
-        content = await file.read()
-        return content.decode("utf-8")
 
-    else:
-        raise ValueError("Unsupported file type")
+async def spool_upload(
+    file: UploadFile,
+    threshold: int = SPOOL_THRESHOLD,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+) -> SpooledUpload:
+    """
+    Read the upload in chunks, hashing as it goes. It stays in memory while
+    it is at most `threshold` bytes and memory_budget has room for it, and
+    is written to a temp file otherwise. Raises UploadTooLarge past max_bytes.
+    """
+    kind = os.path.splitext(file.filename or "")[1].lower()
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(f"Upload is {file.size} bytes, the limit is {max_bytes}")
 
+    # 記憶體預算不足時直接寫入暫存檔，不佔用緩衝
+    reserved = threshold if threshold and memory_budget.try_acquire(threshold) else 0
+    digest = hashlib.sha256()
+    parts, size = [], 0
+    spool = None
+    try:
+        while chunk := await file.read(READ_CHUNK):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+            digest.update(chunk)
+            if spool is None and size > reserved:
+                spool = tempfile.NamedTemporaryFile(prefix="upload-", delete=False)
+                spool.writelines(parts)
+                parts.clear()
+            if spool is None:
+                parts.append(chunk)
+            else:
+                spool.write(chunk)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        if reserved:
+            memory_budget.release(reserved)
+        raise
 
-async def _parse_pdf(file: UploadFile) -> str:
-    content = await file.read()
-    reader = PdfReader(io.BytesIO(content))
+    UPLOAD_SIZE.observe(size, kind=kind)
+    if spool is None:
+        # 只保留實際用到的額度
+        if reserved > size:
+            memory_budget.release(reserved - size)
+        return SpooledUpload(file.filename, b"".join(parts), size, digest.hexdigest(), min(reserved, size))
+
+    spool.close()
+    if reserved:
+        memory_budget.release(reserved)
+    return SpooledUpload(file.filename, spool.name, size, digest.hexdigest())
+
+
+def parse_source(fmt: str, source) -> ParsedDocument:
+    """Synchronous parser entry point for an already detected format; source is bytes or a file path."""
+    return ParsedDocument(parsers.FORMATS[fmt].parse(source))
+
+
+def _spool_bytes(data: bytes) -> str:
+    with tempfile.NamedTemporaryFile(prefix="upload-", suffix=".pdf", delete=False) as f:
+        f.write(data)
+    return f.name
+
+
+async def _parse_pdf(source, pages_per_task: int = PDF_PAGES_PER_TASK) -> ParsedDocument:
+    """
+    Extract page ranges in parallel in the process pool. The pages of a range
+    without a text layer are sent to OCR as one task as soon as the range is
+    done, so OCR runs alongside the remaining text extraction. Per-page times
+    are recorded. An in-memory upload is written to a temp file first, so
+    the workers open a path instead of each receiving a pickled copy.
+    """
+    if isinstance(source, bytes):
+        path = await asyncio.to_thread(_spool_bytes, source)
+        try:
+            return await _parse_pdf(path, pages_per_task)
+        finally:
+            os.remove(path)
 
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
+    count = await run_cpu(parsers.pdf_page_count, source)
+    pages = [""] * count
+    timings = [None] * count
+    ocr = []
 
-    return text
+    async def recognize(indices: list):
+        for index, (text, seconds, status) in zip(indices, await run_cpu(parsers.ocr_pdf_pages, source, indices)):
+            timings[index].update(ocr=status, ocr_ms=round(seconds * 1000, 1))
+            timings[index]["ms"] += timings[index]["ocr_ms"]
+            if status != "unavailable":
+                PAGE_PARSE_SECONDS.observe(seconds, method="ocr")
+            if text:
+                pages[index] = text
 
+    async def extract(start: int, stop: int):
+        scanned = []
+        for index, (text, seconds, needs_ocr) in enumerate(await run_cpu(parsers.pdf_pages, source, start, stop), start):
+            pages[index] = text
+            timings[index] = {"page": index + 1, "ms": round(seconds * 1000, 1), "chars": len(text)}
+            PAGE_PARSE_SECONDS.observe(seconds, method="text")
+            if needs_ocr:
+                scanned.append(index)
+        if scanned:
+            # 同一範圍的掃描頁一次送出，worker 只讀一次檔案
+            ocr.append(asyncio.ensure_future(recognize(scanned)))
 
-async def _parse_docx(file: UploadFile) -> str:
-    content = await file.read()
-    doc = docx.Document(io.BytesIO(content))
+    try:
+        await asyncio.gather(*(
+            extract(start, min(start + pages_per_task, count))
+            for start in range(0, count, pages_per_task)
+        ))
+        await asyncio.gather(*ocr)
+    finally:
+        for task in ocr:
+            task.cancel()
 
-    paragraphs = [p.text for p in doc.paragraphs]
-    return "\n".join(paragraphs)
+    unavailable = sum(1 for t in timings if t.get("ocr") == "unavailable")
+    if unavailable:
+        logger.warning("pages without a text layer were not OCR'd: pytesseract/tesseract not installed",
+                       extra={"pages": unavailable})
+    return ParsedDocument(pages, timings)
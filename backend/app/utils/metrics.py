@@ -0,0 +1,149 @@
+import threading
+from bisect import bisect_left
+
+# 秒數用的預設分桶
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Counter incremented explicitly, or read from `function` at scrape time."""
+    kind = "counter"
+
+    def __init__(self, name, help, labels=(), function=None):
+        super().__init__(name, help, labels)
+        self._values = {}
+        self.function = function
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        if self.function is not None:
+            return [f"{self.name} {self.function()}"]
+        return [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Gauge set explicitly, or read from `function` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), function=None):
+        super().__init__(name, help, labels)
+        self._values = {}
+        self.function = function
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def _samples(self):
+        if self.function is not None:
+            return [f"{self.name} {self.function()}"]
+        return [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------- backend metrics ----------
+
+REQUEST_LATENCY = Histogram(
+    "graphrag_request_duration_seconds", "End-to-end /api/process latency.", labels=("mode", "stream"))
+STEP_DURATION = Histogram(
+    "graphrag_pipeline_step_duration_seconds", "Wall time of each pipeline step.", labels=("pipeline", "step", "status"))
+LLM_TTFT = Histogram(
+    "graphrag_llm_time_to_first_token_seconds", "Time from request to first generated token.", labels=("model",))
+LLM_TOKENS_PER_SECOND = Histogram(
+    "graphrag_llm_tokens_per_second", "Generation speed per LLM call.", labels=("model",),
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400))
+LLM_TOKENS = Counter(
+    "graphrag_llm_generated_tokens_total", "Tokens generated by the LLM.", labels=("model",))
+LLM_BACKEND_OUTSTANDING = Gauge(
+    "graphrag_llm_backend_outstanding", "In-flight requests per Ollama backend.", labels=("backend",))
+LLM_BACKEND_UP = Gauge(
+    "graphrag_llm_backend_up", "1 while the backend's circuit breaker is closed.", labels=("backend",))
+UPLOAD_SIZE = Histogram(
+    "graphrag_upload_size_bytes", "Size of uploaded files.", labels=("kind",),
+    buckets=tuple(2 ** n for n in range(10, 31, 2)))
+INVALID_CONTEXTS = Counter(
+    "graphrag_extraction_invalid_contexts_total", "Model-produced contexts dropped by schema validation.")
+STARTUP_TO_FIRST_TOKEN = Gauge(
+    "graphrag_startup_to_first_token_seconds", "Process start until the warm-up request produced its first token.")
+ANSWER_LATENCY = Histogram(
+    "graphrag_answer_duration_seconds", "Question answering latency per phase.", labels=("phase",))
+CONTEXT_PACK_CACHE = Counter(
+    "graphrag_context_pack_cache_total", "Context pack lookups by result.", labels=("result",))
+EXTRACTION_NUM_CTX = Counter(
+    "graphrag_extraction_num_ctx_total", "Extraction calls per chosen num_ctx bucket.", labels=("num_ctx",))
+EXTRACTION_TOKENS = Histogram(
+    "graphrag_extraction_tokens", "Estimated prompt and output tokens per extraction call.", labels=("kind",),
+    buckets=tuple(2 ** n for n in range(8, 17)))
+PAGE_PARSE_SECONDS = Histogram(
+    "graphrag_page_parse_seconds", "Time to extract one PDF page, by text layer or OCR.", labels=("method",))
@@ -0,0 +1,412 @@
+"""
+Format registry for uploaded documents.
+
+Each format registers the extensions it accepts and a parser turning the
+source (bytes or a file path) into a list of page texts; binary formats
+also register a `magic` check on the first bytes (and zip member names).
+Binary formats are detected from the content, so a mislabelled upload
+still goes to the right parser; for text content the extension picks
+between the text formats.
+"""
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+import io
+import logging
+import mmap
+import re
+import time
+import zipfile
+
+from PyPDF2 import PdfReader
+import docx
+
+from app.utils.config import OCR_ENABLED, OCR_LANGS, OCR_MIN_CHARS
+
+logger = logging.getLogger(__name__)
+
+SNIFF_BYTES = 4096
+
+
+class Format:
+    def __init__(self, name: str, extensions: tuple, parse, magic=None):
+        self.name = name
+        self.extensions = extensions
+        self.parse = parse      # source -> list of page texts
+        self.magic = magic      # (head bytes, zip member names or None) -> bool; None for text formats
+
+
+FORMATS = {}
+
+
+def register(name: str, extensions: tuple, magic=None):
+    """Register the decorated function as the parser of a format."""
+    def decorate(parse):
+        FORMATS[name] = Format(name, tuple(extensions), parse, magic)
+        return parse
+    return decorate
+
+
+def extensions() -> tuple:
+    return tuple(ext for fmt in FORMATS.values() for ext in fmt.extensions)
+
+
+def format_for_extension(filename: str):
+    filename = filename.lower()
+    return next((fmt for fmt in FORMATS.values() if filename.endswith(fmt.extensions)), None)
+
+
+@contextmanager
+def open_source(source):
+    if isinstance(source, bytes):
+        yield io.BytesIO(source)
+        return
+    with open(source, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def open_zip(source) -> zipfile.ZipFile:
+    # zipfile 需要可 seek 的檔案物件，暫存檔直接以路徑開啟
+    return zipfile.ZipFile(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def detect(filename: str, source) -> Format:
+    """
+    Format of an upload from its content, falling back to its extension.
+    Raises ValueError when neither identifies a registered format.
+    """
+    with open_source(source) as stream:
+        head = stream.read(SNIFF_BYTES)
+    names = None
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with open_zip(source) as archive:
+                names = archive.namelist()
+        except zipfile.BadZipFile:
+            pass
+    for fmt in FORMATS.values():
+        if fmt.magic is not None and fmt.magic(head, names):
+            return fmt
+    if _is_text(head):
+        # 純文字內容依副檔名選格式（.md / .html / .txt），不明時判斷是否為 HTML
+        by_extension = format_for_extension(filename or "")
+        if by_extension is not None and by_extension.magic is None:
+            return by_extension
+        return FORMATS["html"] if _HTML_START.match(head.lstrip(b"\xef\xbb\xbf")) else FORMATS["txt"]
+    raise ValueError("Unsupported file type")
+
+
+# ---------- PDF ----------
+
+def pdf_page_count(source) -> int:
+    with open_source(source) as stream:
+        return len(PdfReader(stream).pages)
+
+
+def pdf_pages(source, start: int, stop) -> list:
+    """
+    Text of pages [start, stop) as (text, seconds, needs_ocr) tuples. A page
+    needs OCR when it has (almost) no text layer but carries images, which
+    is what a scanned page looks like.
+    """
+    results = []
+    with open_source(source) as stream:
+        reader = PdfReader(stream)
+        for page in reader.pages[start:stop]:
+            started = time.perf_counter()
+            text = page.extract_text() or ""
+            needs_ocr = OCR_ENABLED and len(text.strip()) < OCR_MIN_CHARS and _has_images(page)
+            results.append((text, time.perf_counter() - started, needs_ocr))
+    return results
+
+
+def _image_xobjects(resources, depth: int = 0):
+    """Image XObjects of a page, including those nested in form XObjects."""
+    try:
+        xobjects = resources["/XObject"].get_object()
+    except (KeyError, TypeError, AttributeError):
+        return
+    for name in xobjects:
+        obj = xobjects[name].get_object()
+        if obj.get("/Subtype") == "/Image":
+            yield obj
+        elif obj.get("/Subtype") == "/Form" and "/Resources" in obj and depth < 3:
+            yield from _image_xobjects(obj["/Resources"], depth + 1)
+
+
+def _has_images(page) -> bool:
+    return next(_image_xobjects(page.get("/Resources") or {}), None) is not None
+
+
+_MODES = {
+    "/DeviceRGB": "RGB", "/CalRGB": "RGB", "/Lab": "RGB",
+    "/DeviceGray": "L", "/CalGray": "L",
+    "/DeviceCMYK": "CMYK",
+}
+_ICC_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+
+
+def _color_mode(space) -> str:
+    """PIL mode of a colour space: a name, or an array such as [/ICCBased stream] or [/Indexed base hival lookup]."""
+    space = space.get_object() if hasattr(space, "get_object") else space
+    if isinstance(space, list):
+        family = space[0] if space else None
+        if family == "/ICCBased" and len(space) > 1:
+            return _ICC_MODES.get(space[1].get_object().get("/N"), "RGB")
+        if family == "/Indexed":
+            return "P"
+        return _MODES.get(family, "RGB")
+    return _MODES.get(space, "RGB")
+
+
+def _bytes_of(value) -> bytes:
+    value = value.get_object() if hasattr(value, "get_object") else value
+    if hasattr(value, "get_data"):
+        return value.get_data()
+    return value if isinstance(value, bytes) else bytes(value, "latin-1")
+
+
+def _to_image(obj):
+    """PIL image of a PDF image XObject: encoded formats (JPEG, JPEG 2000, CCITT) or raw pixels."""
+    from PIL import Image
+
+    data = obj.get_data()
+    try:
+        return Image.open(io.BytesIO(data))
+    except OSError:
+        pass
+    space = obj.get("/ColorSpace")
+    mode = "1" if obj.get("/BitsPerComponent", 8) == 1 else _color_mode(space)
+    image = Image.frombytes(mode, (obj["/Width"], obj["/Height"]), data)
+    if mode == "P":
+        # 索引色：查表轉成底層色彩空間
+        space = space.get_object()
+        base, palette = _color_mode(space[1]), _bytes_of(space[3])
+        if base == "L":
+            palette = bytes(b for gray in palette for b in (gray, gray, gray))
+        if base in ("L", "RGB"):
+            image.putpalette(palette, "RGB")
+            image = image.convert("RGB")
+        else:
+            image = image.convert("L")
+    return image
+
+
+def ocr_pdf_pages(source, indices: list) -> list:
+    """
+    OCR the images of the given PDF pages with Tesseract, reading the file
+    once for the whole batch. Returns one (text, seconds, status) per page,
+    status being "ok", "empty" or "unavailable" when pytesseract or the
+    tesseract binary is not installed. An image that cannot be decoded or
+    recognised is logged and skipped; it never fails the document.
+    """
+    try:
+        import pytesseract
+    except ImportError:
+        return [("", 0.0, "unavailable")] * len(indices)
+
+    results = []
+    with open_source(source) as stream:
+        reader = PdfReader(stream)
+        for index in indices:
+            started = time.perf_counter()
+            texts = []
+            for obj in _image_xobjects(reader.pages[index].get("/Resources") or {}):
+                try:
+                    with _to_image(obj) as image:
+                        texts.append(pytesseract.image_to_string(image, lang=OCR_LANGS))
+                except pytesseract.TesseractNotFoundError:
+                    return [("", 0.0, "unavailable")] * len(indices)
+                except Exception as exc:
+                    logger.warning("OCR failed", extra={"page": index + 1, "error": repr(exc)})
+            text = "\n".join(t.strip() for t in texts if t.strip())
+            results.append((text, time.perf_counter() - started, "ok" if text else "empty"))
+    return results
+
+
+@register("pdf", (".pdf",), magic=lambda head, names: head.startswith(b"%PDF-"))
+def parse_pdf(source) -> list:
+    return [text for text, _, _ in pdf_pages(source, 0, None)]
+
+
+# ---------- Office (zip containers) ----------
+
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def _members(prefix: str):
+    return lambda head, names: names is not None and any(n.startswith(prefix) for n in names)
+
+
+def _numbered(names: list, pattern: str) -> list:
+    """Zip members matching pattern (with one numeric group), in numeric order."""
+    regex = re.compile(pattern)
+    found = [(int(m.group(1)), name) for name in names if (m := regex.fullmatch(name))]
+    return [name for _, name in sorted(found)]
+
+
+@register("docx", (".docx",), magic=_members("word/"))
+def parse_docx(source) -> list:
+    doc = docx.Document(io.BytesIO(source) if isinstance(source, bytes) else source)
+    paragraphs = [p.text for p in doc.paragraphs]
+    return ["\n".join(paragraphs)]
+
+
+@register("pptx", (".pptx",), magic=_members("ppt/"))
+def parse_pptx(source) -> list:
+    """One page per slide: the text runs of each paragraph, then the speaker notes."""
+    pages = []
+    with open_zip(source) as archive:
+        names = archive.namelist()
+        for slide in _numbered(names, r"ppt/slides/slide(\d+)\.xml"):
+            lines = _drawing_paragraphs(archive.read(slide))
+            rels = slide.replace("slides/slide", "slides/_rels/slide") + ".rels"
+            if rels in names:
+                for rel in ElementTree.fromstring(archive.read(rels)).iter(f"{_REL}Relationship"):
+                    notes = "ppt/" + rel.get("Target", "").removeprefix("../")
+                    if rel.get("Type", "").endswith("/notesSlide") and notes in names:
+                        lines += _drawing_paragraphs(archive.read(notes))
+            pages.append("\n".join(lines))
+    return pages
+
+
+def _drawing_paragraphs(xml: bytes) -> list:
+    root = ElementTree.fromstring(xml)
+    lines = []
+    for paragraph in root.iter(f"{_A}p"):
+        text = "".join(run.text or "" for run in paragraph.iter(f"{_A}t"))
+        if text.strip():
+            lines.append(text)
+    return lines
+
+
+@register("xlsx", (".xlsx",), magic=_members("xl/"))
+def parse_xlsx(source) -> list:
+    """One page per worksheet, headed by the sheet name; cells tab-separated, one row per line."""
+    pages = []
+    with open_zip(source) as archive:
+        names = set(archive.namelist())
+        shared = []
+        if "xl/sharedStrings.xml" in names:
+            root = ElementTree.fromstring(archive.read("xl/sharedStrings.xml"))
+            shared = ["".join(t.text or "" for t in si.iter(f"{_S}t")) for si in root.iter(f"{_S}si")]
+
+        workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+        for sheet in workbook.iter(f"{_S}sheet"):
+            target = targets.get(sheet.get(f"{_R}id"), "")
+            path = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+            if path not in names:
+                continue
+            rows = [sheet.get("name")]
+            for row in ElementTree.fromstring(archive.read(path)).iter(f"{_S}row"):
+                cells = [_cell_text(cell, shared) for cell in row.iter(f"{_S}c")]
+                if any(cells):
+                    rows.append("\t".join(cells))
+            pages.append("\n".join(rows))
+    return pages
+
+
+def _cell_text(cell, shared: list) -> str:
+    kind = cell.get("t")
+    if kind == "inlineStr":
+        return "".join(t.text or "" for t in cell.iter(f"{_S}t"))
+    value = cell.find(f"{_S}v")
+    if value is None or value.text is None:
+        return ""
+    if kind == "s":
+        return shared[int(value.text)]
+    return value.text
+
+
+# ---------- markup and plain text ----------
+
+def _decode(source) -> str:
+    with open_source(source) as stream:
+        data = stream.read()
+    return data.decode("utf-8-sig", errors="replace")
+
+
+def _is_text(head: bytes) -> bool:
+    if b"\0" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        # 截斷在多位元組字元中間
+        return exc.start >= len(head) - 3
+    return True
+
+
+_HTML_START = re.compile(rb"^\s*(<\?xml[^>]*>\s*)?(<!--.*?-->\s*)*<(!doctype\s+html|html|head|body)\b", re.I | re.S)
+
+
+class _HTMLText(HTMLParser):
+    BLOCKS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "table", "pre", "blockquote"}
+    SKIP = {"script", "style", "noscript", "template", "head"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+@register("html", (".html", ".htm"))
+def parse_html(source) -> list:
+    parser = _HTMLText()
+    parser.feed(_decode(source))
+    parser.close()
+    text = re.sub(r"[ \t\r\f\v]+", " ", "".join(parser.parts))
+    return [re.sub(r"\n\s*\n+", "\n\n", text).strip()]
+
+
+_MD_RULES = [
+    (re.compile(r"^```.*$|^~~~.*$", re.M), ""),                 # code fences (content kept)
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"),              # images -> alt text
+    (re.compile(r"\[([^\]]+)\]\([^)]*\)"), r"\1"),               # links -> label
+    (re.compile(r"^[ \t]{0,3}#{1,6}[ \t]*", re.M), ""),                # heading markers
+    (re.compile(r"^[ \t]{0,3}>[ \t]?", re.M), ""),                     # blockquotes
+    (re.compile(r"(\*\*|__|~~)(.+?)\1"), r"\2"),                 # bold / strike
+    (re.compile(r"(?<![\w*])[*_](?!\s)(.+?)(?<!\s)[*_](?![\w*])"), r"\1"),  # italics
+    (re.compile(r"`([^`]+)`"), r"\1"),                           # inline code
+    (re.compile(r"^[ \t]*(-{3,}|\*{3,}|_{3,})[ \t]*$", re.M), ""),     # horizontal rules
+    (re.compile(r"<[^>\n]+>"), ""),                              # inline html
+]
+
+
+@register("markdown", (".md", ".markdown"))
+def parse_markdown(source) -> list:
+    """Markdown reduced to plain text; a form feed still separates pages."""
+    pages = []
+    # 逐頁套用規則：換頁符號後的第一行也是行首
+    for page in _decode(source).split("\f"):
+        for pattern, replacement in _MD_RULES:
+            page = pattern.sub(replacement, page)
+        pages.append(page)
+    return pages
+
+
+@register("txt", (".txt",))
+def parse_txt(source) -> list:
+    return _decode(source).split("\f")
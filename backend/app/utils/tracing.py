@@ -0,0 +1,59 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from app.utils.config import LOG_LEVEL, TRACING
+
+logger = logging.getLogger("app.trace")
+
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields are emitted as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        data.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = LOG_LEVEL):
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    # httpx 每個請求都記一筆 INFO，Ollama 呼叫量大時會淹沒其他記錄
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a block and log it as a structured "span" record. A no-op apart
+    from one perf_counter call when TRACING is off.
+    """
+    if not TRACING:
+        yield attrs
+        return
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield attrs
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        logger.info(
+            "span",
+            extra={"span": name, "duration_ms": round((time.perf_counter() - started) * 1000, 2), "status": status, **attrs},
+        )
@@ -0,0 +1,46 @@
+"""
+ASR throughput on CPU, in seconds of audio per wall-clock second.
+
+Models are loaded once before timing; each run diarizes and transcribes the
+whole file from an in-memory waveform.
+
+    cd backend
+    python -m benchmarks.bench_asr path/to/audio.wav --threads 8 --int8 --batch-size 8
+"""
+import argparse
+import time
+
+from app.transformers.ASR import ASRService, SAMPLE_RATE, load_audio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("audio")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    service = ASRService(batch_size=args.batch_size, num_threads=args.threads, int8=args.int8)
+    print(f"model load: {time.perf_counter() - started:.1f} s")
+
+    waveform = load_audio(args.audio)
+    duration = len(waveform) / SAMPLE_RATE
+
+    for run in range(1, args.runs + 1):
+        started = time.perf_counter()
+        segments = service.diarize(waveform)
+        diarized = time.perf_counter()
+        results = service.transcribe_segments(waveform, segments)
+        elapsed = time.perf_counter() - started
+        print(
+            f"run {run}: {duration:.1f} s audio, {len(results)} segments, "
+            f"diarize {diarized - started:.1f} s, transcribe {elapsed - (diarized - started):.1f} s, "
+            f"{duration / elapsed:.2f} audio-s/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
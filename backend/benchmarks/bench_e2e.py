@@ -0,0 +1,265 @@
+"""
+End-to-end benchmark of POST /api/process (parse -> summarize -> pdf).
+
+Starts the fake Ollama server and the backend as subprocesses (the backend
+runs in a scratch directory so its caches and stores start empty), uploads
+a synthetic corpus at each concurrency level and reports p50/p95/p99
+latency, throughput and peak RSS of the backend process tree. Results are
+written as JSON; pass --compare to diff against an earlier run.
+
+    cd backend
+    python -m benchmarks.bench_e2e --requests 20 --concurrency 1,2,4,8 --pages 10 \
+        --tokens-per-second 40 --llm-backends 2 --out results.json --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from benchmarks import corpus
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _proc_children(pid: int) -> list:
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def tree_rss_mb(pid: int):
+    """Current RSS of a process and all its descendants (Linux only, else None)."""
+    if not os.path.exists(f"/proc/{pid}/status"):
+        return None
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+        pending.extend(_proc_children(current))
+    return total / 1024
+
+
+class RssSampler:
+    """Track the peak RSS of a process tree from a background thread."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = tree_rss_mb(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0.0, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+async def run_level(base_url: str, paths: list, concurrency: int) -> dict:
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    latencies, errors = [], []
+
+    async def client(http: httpx.AsyncClient):
+        while not queue.empty():
+            path = queue.get_nowait()
+            with open(path, "rb") as f:
+                started = time.perf_counter()
+                try:
+                    response = await http.post(
+                        "/api/process",
+                        files={"file": (os.path.basename(path), f)},
+                        data={"mode": "document"},
+                    )
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError as exc:
+                    errors.append(f"{os.path.basename(path)}: {exc}")
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = {"concurrency": concurrency, "requests": len(paths), "errors": len(errors), "wall_s": round(elapsed, 3)}
+    if latencies:
+        result.update({
+            "p50_s": round(percentile(latencies, 50), 4),
+            "p95_s": round(percentile(latencies, 95), 4),
+            "p99_s": round(percentile(latencies, 99), 4),
+            "mean_s": round(statistics.fmean(latencies), 4),
+            "throughput_rps": round(len(latencies) / elapsed, 3),
+        })
+    if errors:
+        result["error_samples"] = errors[:5]
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict):
+    previous = {r["concurrency"]: r for r in baseline["results"]}
+    print(f"\nvs {baseline.get('commit') or 'baseline'} ({baseline.get('started_at')})")
+    for result in current["results"]:
+        before = previous.get(result["concurrency"])
+        if not before:
+            continue
+        cells = []
+        for key in ("p50_s", "p95_s", "p99_s", "throughput_rps"):
+            if key in result and before.get(key):
+                cells.append(f"{key} {(result[key] - before[key]) / before[key] * 100:+.1f}%")
+        print(f"  c={result['concurrency']:<3} " + "  ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20, help="requests per concurrency level")
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--formats", default="pdf,docx,txt")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--contexts", type=int, default=10, help="contexts in the replayed extraction")
+    parser.add_argument("--response", help="recorded extraction JSON to replay")
+    parser.add_argument("--backend-port", type=int, default=18000)
+    parser.add_argument("--llm-port", type=int, default=11435, help="first fake Ollama port")
+    parser.add_argument("--llm-backends", type=int, default=1, help="fake Ollama servers behind the router")
+    parser.add_argument("--out", default="bench_e2e.json")
+    parser.add_argument("--compare", help="earlier result JSON to diff against")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    workdir = tempfile.mkdtemp(prefix="bench-e2e-")
+    # 每個請求一份獨立文件，加上一份暖機用
+    paths = corpus.generate(
+        os.path.join(workdir, "corpus"), args.requests * len(levels) + 1, args.pages, args.formats.split(","),
+    )
+
+    llm_ports = [args.llm_port + i for i in range(args.llm_backends)]
+    llm_cmd = [
+        sys.executable, "-m", "benchmarks.fake_ollama",
+        "--tokens-per-second", str(args.tokens_per_second), "--ttft", str(args.ttft),
+        "--contexts", str(args.contexts),
+    ]
+    if args.response:
+        llm_cmd += ["--response", os.path.abspath(args.response)]
+    env = dict(
+        os.environ,
+        PYTHONPATH=BACKEND_DIR,
+        OLLAMA_HOSTS=",".join(f"http://127.0.0.1:{port}" for port in llm_ports),
+        LOG_LEVEL="WARNING",
+    )
+    base_url = f"http://127.0.0.1:{args.backend_port}"
+
+    llms = [subprocess.Popen(llm_cmd + ["--port", str(port)], cwd=BACKEND_DIR) for port in llm_ports]
+    # 後端以暫存目錄為工作目錄，./app/data 下的快取與資料庫都從空的開始
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.backend_port), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": [],
+    }
+    try:
+        for port, llm in zip(llm_ports, llms):
+            wait_ready(f"http://127.0.0.1:{port}/api/tags", llm)
+        wait_ready(f"{base_url}/api/ready", backend)
+        asyncio.run(run_level(base_url, paths[:1], 1))
+
+        for index, concurrency in enumerate(levels):
+            batch = paths[1 + index * args.requests:1 + (index + 1) * args.requests]
+            with RssSampler(backend.pid) as sampler:
+                result = asyncio.run(run_level(base_url, batch, concurrency))
+            result["peak_rss_mb"] = round(sampler.peak, 1) if sampler.peak else None
+            report["results"].append(result)
+            print(
+                f"c={concurrency:<3} p50={result.get('p50_s', 0):.3f}s p95={result.get('p95_s', 0):.3f}s "
+                f"p99={result.get('p99_s', 0):.3f}s {result.get('throughput_rps', 0):.2f} req/s "
+                f"rss={result['peak_rss_mb']} MB errors={result['errors']}"
+            )
+    finally:
+        for process in (backend, *llms):
+            process.terminate()
+        for process in (backend, *llms):
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Per-document render time of decision PDFs.
+
+"before" rebuilds the renderer (font registration, stylesheet, table styles)
+for every document, which is what decision_pdf used to do on each call;
+"after" renders every document with one shared PdfRenderer.
+
+    cd backend
+    python -m benchmarks.bench_pdf_render --docs 20 --contexts 30
+"""
+import argparse
+import io
+import time
+
+from app.services.pdf_service import PdfRenderer
+
+
+def make_view(contexts: int) -> dict:
+    return {
+        "document_metadata": {
+            "document_id": "BENCH-001",
+            "document_title": "基準測試文件 Benchmark Document",
+            "document_type": "Manual",
+            "version": "1.0",
+        },
+        "contexts": [
+            {
+                "context_id": f"CTX-{i:03d}",
+                "decision_level": "LMS"[i % 3],
+                "title": {"zh": f"決策情境 {i}", "en": f"Decision context {i}"},
+                "primary_roles": ["Operator", "Maintenance Engineer"],
+                "decision_boundaries": [
+                    {
+                        "boundary_type": "Safety-Critical",
+                        "description": {"zh": "不可在運轉中拆卸。" * 3, "en": "Never disassemble while running. " * 3},
+                    },
+                    {
+                        "boundary_type": "Operational",
+                        "description": {"zh": "需先確認壓力歸零。", "en": "Confirm pressure is zero first."},
+                    },
+                ],
+                "non_applicability_notes": {"zh": "不適用於舊型號。", "en": "Does not apply to legacy models."},
+                "confidence_score": 0.85,
+            }
+            for i in range(1, contexts + 1)
+        ],
+    }
+
+
+def bench(label: str, docs: int, view: dict, shared: bool) -> float:
+    renderer = PdfRenderer() if shared else None
+    started = time.perf_counter()
+    for _ in range(docs):
+        r = renderer if shared else PdfRenderer()
+        r.render(view, io.BytesIO())
+    per_doc = (time.perf_counter() - started) / docs
+    print(f"{label:>6}: {per_doc * 1000:8.1f} ms/document")
+    return per_doc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--contexts", type=int, default=30)
+    args = parser.parse_args()
+
+    view = make_view(args.contexts)
+    before = bench("before", args.docs, view, shared=False)
+    after = bench("after", args.docs, view, shared=True)
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
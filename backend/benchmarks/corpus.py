@@ -0,0 +1,90 @@
+"""
+Synthetic PDF/DOCX/TXT documents for benchmarking. Every document gets its
+own seeded text, so extraction cache hits never hide the real pipeline cost.
+
+    cd backend
+    python -m benchmarks.corpus --out /tmp/corpus --docs 50 --pages 20 --formats pdf,docx,txt
+"""
+import argparse
+import os
+import random
+
+import docx
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+WORDS = (
+    "valve pressure pump operator maintenance engineer inspect isolate shutdown "
+    "procedure hazard lockout tagout calibrate sensor alarm threshold coolant "
+    "temperature motor bearing vibration replace torque verify log supervisor "
+    "approval emergency restart sequence interlock flow rate discharge seal"
+).split()
+WORDS_PER_LINE = 12
+LINES_PER_PAGE = 45
+
+
+def page_lines(rng: random.Random, doc_index: int, page: int) -> list:
+    lines = [f"Document {doc_index} - Section {page}: Operating procedure"]
+    for _ in range(LINES_PER_PAGE - 1):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(WORDS_PER_LINE)) + ".")
+    return lines
+
+
+def write_pdf(path: str, pages: list):
+    pdf = canvas.Canvas(path, pagesize=A4)
+    _, height = A4
+    for lines in pages:
+        text = pdf.beginText(40, height - 50)
+        text.setFont("Helvetica", 9)
+        for line in lines:
+            text.textLine(line)
+        pdf.drawText(text)
+        pdf.showPage()
+    pdf.save()
+
+
+def write_docx(path: str, pages: list):
+    document = docx.Document()
+    for lines in pages:
+        document.add_heading(lines[0], level=2)
+        document.add_paragraph(" ".join(lines[1:]))
+    document.save(path)
+
+
+def write_txt(path: str, pages: list):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join("\n".join(lines) for lines in pages))
+
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx, "txt": write_txt}
+
+
+def generate(out_dir: str, docs: int, pages: int, formats=("pdf", "docx", "txt"), seed: int = 0) -> list:
+    """Write `docs` documents round-robin over `formats`; returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for index in range(docs):
+        rng = random.Random(seed * 1_000_003 + index)
+        fmt = formats[index % len(formats)]
+        path = os.path.join(out_dir, f"doc-{index:04d}.{fmt}")
+        WRITERS[fmt](path, [page_lines(rng, index, page) for page in range(1, pages + 1)])
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--formats", default="pdf,docx,txt")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate(args.out, args.docs, args.pages, args.formats.split(","), args.seed)
+    size = sum(os.path.getsize(p) for p in paths)
+    print(f"{len(paths)} documents, {size / 1e6:.1f} MB in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Stand-in for the Ollama /api/chat endpoint that replays a recorded
+extraction at a fixed token rate, so the backend can be benchmarked without
+a GPU or a model. Each request gets its own document_id, derived from its
+messages, so replayed documents stay distinct in the stores.
+
+    cd backend
+    python -m benchmarks.fake_ollama --port 11435 --tokens-per-second 40 --response recorded.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+
+import uvicorn
+from fastapi import FastAPI
+from starlette.responses import StreamingResponse
+
+from benchmarks.bench_pdf_render import make_view
+
+CHARS_PER_TOKEN = 4
+# 兩次送出之間至少間隔這麼久，高 token rate 時合併多個 token，避免 sleep 本身成為瓶頸
+FLUSH_INTERVAL = 0.02
+
+
+def request_document_id(body: dict) -> str:
+    """Document id derived from the request's messages: the same document always gets the same id."""
+    messages = json.dumps(body.get("messages") or [], sort_keys=True, ensure_ascii=False)
+    return f"BENCH-{hashlib.sha256(messages.encode('utf-8')).hexdigest()[:12]}"
+
+
+def response_for(response: str, body: dict) -> str:
+    """
+    The replayed response with document_metadata.document_id replaced by
+    request_document_id, so different benchmark documents do not all look
+    like revisions of one document to the stores.
+    """
+    try:
+        extraction = json.loads(response)
+    except ValueError:
+        return response
+    metadata = extraction.get("document_metadata") if isinstance(extraction, dict) else None
+    if not isinstance(metadata, dict):
+        return response
+    extraction["document_metadata"] = {**metadata, "document_id": request_document_id(body)}
+    return json.dumps(extraction, ensure_ascii=False)
+
+
+def create_app(response: str, tokens_per_second: float, ttft: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/chat")
+    async def chat(body: dict):
+        content = response_for(response, body)
+        tokens = [content[i:i + CHARS_PER_TOKEN] for i in range(0, len(content), CHARS_PER_TOKEN)]
+
+        async def generate():
+            started = time.perf_counter()
+            await asyncio.sleep(ttft)
+            generation_started = time.perf_counter()
+            sent = 0
+            while sent < len(tokens):
+                # 依照經過時間計算此刻應已產生的 token 數（第一個 token 立即送出）
+                elapsed = time.perf_counter() - generation_started
+                due = min(len(tokens), int(elapsed * tokens_per_second) + 1)
+                if due > sent:
+                    content = "".join(tokens[sent:due])
+                    sent = due
+                    yield json.dumps({"model": body.get("model"), "message": {"role": "assistant", "content": content}, "done": False}) + "\n"
+                if sent < len(tokens):
+                    await asyncio.sleep(max(FLUSH_INTERVAL, sent / tokens_per_second - elapsed))
+            done = time.perf_counter()
+            yield json.dumps({
+                "model": body.get("model"),
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "total_duration": int((done - started) * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int((done - generation_started) * 1e9),
+            }) + "\n"
+
+        if not body.get("stream", True):
+            return {"model": body.get("model"), "message": {"role": "assistant", "content": content}, "done": True}
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "qwen3:8b"}]}
+
+    return app
+
+
+def load_response(path: str = None, contexts: int = 10) -> str:
+    """Recorded extraction JSON, or a synthetic one shaped like the real schema."""
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.dumps(json.load(f), ensure_ascii=False)
+    return json.dumps(make_view(contexts), ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--response", help="recorded extraction JSON to replay")
+    parser.add_argument("--contexts", type=int, default=10, help="contexts in the synthetic response")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    args = parser.parse_args()
+
+    app = create_app(load_response(args.response, args.contexts), args.tokens_per_second, args.ttft)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,39 @@
+from contextlib import asynccontextmanager, suppress
+import asyncio
+from app.services.readiness import readiness
 from fastapi import FastAPI
 from app.api.router import router
+from app.transformers.llm_router import llm_router
+from app.services.job_service import job_queue
+from app.services.batch_service import batch_manager
+from app.services import worker_pool
+from app.services.graph_service import graph_store
+from app.services.vector_service import vector_index
+from app.utils.tracing import setup_logging
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-app = FastAPI()
+setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    readiness.load_assets()
+    await asyncio.to_thread(graph_store.load)
+    await asyncio.to_thread(vector_index.load)
+    readiness.checks["stores"] = True
+    llm_router.start()
+    warm_up = asyncio.create_task(readiness.warm_up())
+    await job_queue.start()
+    yield
+    warm_up.cancel()
+    with suppress(asyncio.CancelledError):
+        await warm_up
+    await batch_manager.stop()
+    await job_queue.stop()
+    await llm_router.aclose()
+    worker_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,4 +46,4 @@ app.add_middleware(
 app.include_router(router)
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import json
+import os
+import zipfile
+
+from app.services import batch_service
+from app.services.batch_service import BatchIngest, Checkpoint, _Archive, iter_sources
+
+
+def test_checkpoint_resumes_completed_documents(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.record({"name": "a.pdf", "sha256": "aaa", "status": "completed", "result": "r/a.json"})
+    checkpoint.record({"name": "b.pdf", "sha256": "bbb", "status": "failed", "error": "boom"})
+    checkpoint.close()
+
+    resumed = Checkpoint(path)
+    try:
+        assert set(resumed.done) == {"aaa"}
+        assert resumed.done["aaa"]["result"] == "r/a.json"
+        # 失敗的文件下次重試，成功後才記為完成
+        resumed.record({"name": "b.pdf", "sha256": "bbb", "status": "completed"})
+        assert set(resumed.done) == {"aaa", "bbb"}
+    finally:
+        resumed.close()
+
+    checkpoint = Checkpoint(path)
+    checkpoint.close()
+    assert set(checkpoint.done) == {"aaa", "bbb"}
+
+
+def test_checkpoint_appends_to_existing_log(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    for sha in ("one", "two"):
+        checkpoint = Checkpoint(path)
+        checkpoint.record({"name": sha, "sha256": sha, "status": "completed"})
+        checkpoint.close()
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["sha256"] for line in f] == ["one", "two"]
+
+
+def test_checkpoint_ignores_blank_lines(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    path.write_text('{"name": "a", "sha256": "a", "status": "completed"}\n\n', encoding="utf-8")
+    checkpoint = Checkpoint(str(path))
+    checkpoint.close()
+    assert set(checkpoint.done) == {"a"}
+
+
+def test_iter_sources_walks_directories_and_archives(tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "sub").mkdir(parents=True)
+    (docs / "b.txt").write_text("b")
+    (docs / "sub" / "a.md").write_text("a")
+    (docs / "image.png").write_bytes(b"\x89PNG")
+    with zipfile.ZipFile(docs / "bundle.zip", "w") as archive:
+        archive.writestr("inner/c.txt", "c")
+        archive.writestr("inner/skip.bin", "x")
+    loose = tmp_path / "no-extension"
+    loose.write_text("d")
+
+    sources = dict(iter_sources([str(docs), str(loose)]))
+    assert sorted(sources) == sorted([
+        "b.txt", "bundle.zip/inner/c.txt", os.path.join("sub", "a.md"), "no-extension",
+    ])
+    stream, size = sources["bundle.zip/inner/c.txt"]()
+    with stream:
+        assert stream.read() == b"c" and size == 1
+
+
+def test_batch_skips_documents_done_in_an_earlier_run(tmp_path):
+    doc = tmp_path / "a.txt"
+    doc.write_text("already ingested")
+    out = tmp_path / "out"
+    out.mkdir()
+    sha = hashlib.sha256(b"already ingested").hexdigest()
+    (out / "checkpoint.jsonl").write_text(json.dumps({"name": "a.txt", "sha256": sha, "status": "completed"}) + "\n")
+
+    batch = BatchIngest([], str(out))
+    try:
+        source = next(iter_sources([str(doc)]))
+        assert asyncio.run(batch._parse(source)) is None
+        assert batch.counts["skipped"] == 1
+    finally:
+        batch.checkpoint.close()
+
+
+def test_archive_is_closed_once_every_member_is_open(tmp_path, monkeypatch):
+    path = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("a.txt", "a")
+        archive.writestr("b.txt", "b")
+
+    archives = []
+    monkeypatch.setattr(batch_service, "_Archive", lambda p: archives.append(_Archive(p)) or archives[-1])
+    sources = list(iter_sources([str(path)]))
+    archive, = archives
+    streams = []
+    for _, opener in sources:
+        assert archive.zip.fp is not None
+        streams.append(opener()[0])
+    assert archive.zip.fp is None
+    # 已開啟的成員仍可讀到結尾
+    assert [stream.read() for stream in streams] == [b"a", b"b"]
+    for stream in streams:
+        stream.close()
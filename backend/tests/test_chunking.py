@@ -0,0 +1,65 @@
+from app.transformers.chunking import ContextMerger, merge_extractions
+
+
+def context(title_en, level="M", **extra):
+    return {"decision_level": level, "title": {"en": title_en, "zh": ""}, **extra}
+
+
+def test_merger_renumbers_in_arrival_order():
+    merger = ContextMerger()
+    merger.add(context("Pick a database", context_id="CTX-007"))
+    merger.add(context("Pick a queue", context_id="CTX-001"))
+    assert [c["context_id"] for c in merger.contexts] == ["CTX-001", "CTX-002"]
+    assert merger.contexts[0]["title"]["en"] == "Pick a database"
+
+
+def test_merger_drops_duplicates_across_chunks():
+    merger = ContextMerger()
+    assert merger.add(context("Pick a Database")) is not None
+    # 大小寫與空白不同仍視為同一情境
+    assert merger.add(context("  pick a   database ")) is None
+    # 不同層級不算重複
+    assert merger.add(context("Pick a database", level="L")) is not None
+    assert len(merger.contexts) == 2
+
+
+def test_merger_keeps_untitled_contexts():
+    merger = ContextMerger()
+    merger.add({"decision_level": "S", "title": {}})
+    merger.add({"decision_level": "S", "title": {}})
+    assert len(merger.contexts) == 2
+
+
+def test_merger_fills_page_from_chunk():
+    merger = ContextMerger()
+    added = merger.add(context("A"), {"first_page": 3, "last_page": 5})
+    kept = merger.add(context("B", source_reference={"page": "9"}), {"first_page": 3, "last_page": 5})
+    single = merger.add(context("C"), {"first_page": 4, "last_page": 4})
+    assert added["source_reference"]["page"] == "3-5"
+    assert kept["source_reference"]["page"] == "9"
+    assert single["source_reference"]["page"] == "4"
+
+
+def test_merger_does_not_mutate_input():
+    original = context("A", source_reference={})
+    ContextMerger().add(original, {"first_page": 1, "last_page": 2})
+    assert "context_id" not in original
+    assert original["source_reference"] == {}
+
+
+def test_merge_extractions_combines_metadata_and_contexts():
+    chunk = {"first_page": 1, "last_page": 1}
+    results = [
+        ({"document_metadata": {"document_id": "", "document_title": "Spec"}, "contexts": [context("A")]}, chunk),
+        ({"document_metadata": {"document_id": "DOC-1", "document_title": "Other"}, "contexts": [context("a"), context("B")]}, chunk),
+    ]
+    merged = merge_extractions(results)
+    assert merged["document_metadata"] == {"document_id": "DOC-1", "document_title": "Spec"}
+    assert [c["title"]["en"] for c in merged["contexts"]] == ["A", "B"]
+
+
+def test_merge_extractions_keeps_streamed_numbering():
+    merger = ContextMerger()
+    merger.add(context("A"))
+    merged = merge_extractions([({"document_metadata": {}, "contexts": [context("Z")]}, None)], merger)
+    assert [c["title"]["en"] for c in merged["contexts"]] == ["A"]
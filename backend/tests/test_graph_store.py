@@ -0,0 +1,53 @@
+from app.services.graph_service import GraphStore, context_node, document_node
+
+
+def summary(doc_id, title, *boundaries):
+    return {
+        "document_metadata": {"document_id": doc_id, "document_title": title},
+        "contexts": [
+            {
+                "context_id": f"CTX-{i:03d}",
+                "decision_level": "M",
+                "title": {"en": f"{title} decision {i}", "zh": ""},
+                "primary_roles": ["Operator"],
+                "decision_boundaries": [{"boundary_type": boundary, "description": {"en": title}}],
+            }
+            for i, boundary in enumerate(boundaries, 1)
+        ],
+    }
+
+
+def test_documents_sharing_an_id_are_kept_apart(tmp_path):
+    graph = GraphStore(str(tmp_path / "graph.jsonl"))
+    graph.ingest(summary("DOC-001", "Pump manual", "Safety-Critical", "Technical"), lineage="pump")
+    # 另一份手冊，模型擷取出相同的 document_id 與標題
+    graph.ingest(summary("DOC-001", "Pump manual", "Operational"), lineage="valve")
+
+    assert graph.context(context_node("pump", "CTX-002"))[0] == "DOC-001"
+    assert graph.context(context_node("valve", "CTX-001"))[0] == "DOC-001"
+    assert {b["document_key"] for b in graph.boundaries(document_id="DOC-001")} == {"pump", "valve"}
+    assert len(graph.boundaries(document_id="pump")) == 2
+    # 兩份文件透過共用的角色互相關聯
+    assert context_node("valve", "CTX-001") in graph.related_contexts({context_node("pump", "CTX-001"): 1.0})
+
+
+def test_new_revision_replaces_only_its_lineage(tmp_path):
+    path = str(tmp_path / "graph.jsonl")
+    graph = GraphStore(path)
+    graph.ingest(summary("DOC-001", "Pump manual", "Safety-Critical", "Technical"), lineage="pump")
+    graph.ingest(summary("DOC-001", "Valve manual", "Operational"), lineage="valve")
+    graph.ingest(summary("DOC-001", "Pump manual", "Irreversible"), lineage="pump")
+
+    for store in (graph, GraphStore(path)):
+        kinds = sorted((b["document_key"], b["boundary_type"]) for b in store.boundaries())
+        assert kinds == [("pump", "Irreversible"), ("valve", "Operational")]
+        assert store.context(context_node("pump", "CTX-002")) is None
+        assert store.node(document_node("pump"))["document_title"] == "Pump manual"
+
+
+def test_results_without_lineage_are_kept_apart(tmp_path):
+    graph = GraphStore(str(tmp_path / "graph.jsonl"))
+    first = graph.ingest(summary("", "", "Technical"))
+    second = graph.ingest(summary("", "", "Operational"))
+    assert first != second
+    assert len(graph.boundaries()) == 2
@@ -0,0 +1,22 @@
+import asyncio
+import io
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from app.services.job_service import JobQueue, JobStore
+
+
+@pytest.mark.parametrize("filename", [None, "", "../nested/report.txt"])
+def test_submit_stores_uploads_under_a_safe_name(tmp_path, filename):
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), workers=0, jobs_dir=str(tmp_path / "jobs"))
+    upload = UploadFile(io.BytesIO(b"plain text"), filename=filename)
+
+    job_id = asyncio.run(queue.submit(upload))
+    job = queue.store.get(job_id)
+    expected = "report.txt" if filename else "upload"
+    assert job["filename"] == expected
+    assert job["upload_path"] == str(tmp_path / "jobs" / job_id / expected)
+    with open(job["upload_path"], "rb") as f:
+        assert f.read() == b"plain text"
+    assert queue.depth() == 1
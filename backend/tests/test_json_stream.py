@@ -0,0 +1,56 @@
+import json
+
+from app.transformers.json_stream import ContextStreamParser
+
+DOCUMENT = {
+    "document_metadata": {"document_id": "DOC-1", "document_title": "contexts [\"quoted\"] {braces}"},
+    "contexts": [
+        {"context_id": "CTX-001", "title": {"en": "A } tricky \\ title", "zh": "決策"}, "decision_boundaries": [{"boundary_type": "Technical"}]},
+        {"context_id": "CTX-002", "title": {"en": "B", "zh": ""}, "primary_roles": ["[lead]", "{ops}"]},
+    ],
+    "notes": [{"context_id": "not a context"}],
+}
+
+
+def feed_all(parser, text, size):
+    completed = []
+    for i in range(0, len(text), size):
+        completed.extend(parser.feed(text[i:i + size]))
+    return completed
+
+
+def test_contexts_complete_at_any_chunk_size():
+    text = json.dumps(DOCUMENT, ensure_ascii=False)
+    for size in (1, 2, 3, 7, 64, len(text)):
+        parser = ContextStreamParser()
+        assert feed_all(parser, text, size) == DOCUMENT["contexts"]
+        assert parser.closed
+
+
+def test_context_is_emitted_as_soon_as_it_closes():
+    parser = ContextStreamParser()
+    text = json.dumps(DOCUMENT)
+    end_of_first = text.index('"CTX-002"')
+    assert parser.feed(text[:end_of_first]) == [DOCUMENT["contexts"][0]]
+    assert not parser.closed
+    assert parser.feed(text[end_of_first:]) == [DOCUMENT["contexts"][1]]
+
+
+def test_nested_key_with_same_name_is_ignored():
+    parser = ContextStreamParser()
+    text = json.dumps({"document_metadata": {"contexts": [{"x": 1}]}, "contexts": [{"y": 2}]})
+    assert parser.feed(text) == [{"y": 2}]
+
+
+def test_custom_key_and_whitespace():
+    parser = ContextStreamParser(key="items")
+    text = '{\n  "contexts": [{"a": 1}],\n  "items" : [\n    {"b": "\\"}"}\n  ]\n}'
+    assert parser.feed(text) == [{"b": '"}'}]
+    assert parser.closed
+
+
+def test_truncated_stream_is_not_closed():
+    parser = ContextStreamParser()
+    text = json.dumps(DOCUMENT)
+    assert parser.feed(text[:-1]) == DOCUMENT["contexts"]
+    assert not parser.closed
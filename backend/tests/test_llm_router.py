@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.transformers.llm_client import BackendUnavailable, LLMError
+from app.transformers.llm_router import LLMRouter, model_tag
+from benchmarks.fake_ollama import create_app
+
+MODEL = "qwen3:8b"
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def failing_app(calls: list, status: int = 503) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/chat")
+    async def chat(body: dict):
+        calls.append(body)
+        return JSONResponse({"error": "overloaded"}, status_code=status)
+
+    @app.get("/api/tags")
+    async def tags():
+        return JSONResponse({"error": "down"}, status_code=status)
+
+    return app
+
+
+def make_router(apps: list, failures: int = 2, cooldown: float = 30.0, retries: int = 2) -> LLMRouter:
+    hosts = [f"http://backend-{i}" for i in range(len(apps))]
+    router = LLMRouter(hosts=hosts, max_concurrency=2, retries=retries, failures=failures, cooldown=cooldown)
+    for backend, app in zip(router.backends, apps):
+        backend.client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=backend.host)
+    return router
+
+
+def run(router: LLMRouter, coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await router.aclose()
+    return asyncio.run(main())
+
+
+def fake(response: str = '{"ok": true}'):
+    return create_app(response, tokens_per_second=10_000, ttft=0)
+
+
+def test_replays_fake_ollama_response():
+    router = make_router([fake()])
+    assert run(router, router.chat(MODEL, MESSAGES)) == '{"ok": true}'
+    assert router.backends[0].status()["circuit"] == "closed"
+    assert router.backends[0].outstanding == 0
+
+
+def test_failing_backend_opens_its_breaker_and_is_skipped():
+    calls = []
+    router = make_router([failing_app(calls), fake()])
+    broken, healthy = router.backends
+    # 第一台負載最低時會先被選到；失敗後改送第二台
+    healthy.outstanding = 1
+
+    async def requests():
+        first = await router.chat(MODEL, MESSAGES)
+        second = await router.chat(MODEL, MESSAGES)
+        return first, second
+
+    assert run(router, requests()) == ('{"ok": true}', '{"ok": true}')
+    assert len(calls) == 2
+    assert broken.status()["circuit"] == "open"
+    assert healthy.status()["circuit"] == "closed"
+
+
+def test_all_breakers_open_fails_fast():
+    calls = []
+    router = make_router([failing_app(calls), failing_app(calls)], failures=1, retries=1)
+    with pytest.raises(BackendUnavailable):
+        run(router, router.chat(MODEL, MESSAGES))
+    assert all(b.opened_at is not None for b in router.backends)
+
+    router = make_router([failing_app([])], failures=1)
+    router.backends[0].opened_at = time.monotonic()
+    started = time.perf_counter()
+    with pytest.raises(BackendUnavailable, match="No LLM backend available"):
+        run(router, router.chat(MODEL, MESSAGES))
+    assert time.perf_counter() - started < 1.0
+
+
+def test_half_open_trial_closes_the_breaker():
+    router = make_router([fake()], failures=1, cooldown=5.0)
+    backend = router.backends[0]
+    backend.failed(time.monotonic())
+    assert not backend.available(MODEL, time.monotonic())
+    # cooldown 過後只放行一個試探請求
+    backend.opened_at -= 5.0
+    assert backend.available(MODEL, time.monotonic())
+    backend.trial = True
+    assert not backend.available(MODEL, time.monotonic())
+    backend.trial = False
+
+    assert run(router, router.chat(MODEL, MESSAGES)) == '{"ok": true}'
+    assert backend.opened_at is None and backend.failures == 0
+
+
+def test_failed_trial_reopens_the_breaker():
+    router = make_router([failing_app([])], failures=3, cooldown=5.0, retries=0)
+    backend = router.backends[0]
+    for _ in range(3):
+        backend.failed(time.monotonic() - 10)
+    assert backend.available(MODEL, time.monotonic())
+    with pytest.raises(BackendUnavailable):
+        run(router, router.chat(MODEL, MESSAGES))
+    # 試探失敗：重新計時
+    assert time.monotonic() - backend.opened_at < 1.0
+    assert not backend.trial
+
+
+def test_rejected_trial_frees_the_half_open_slot():
+    router = make_router([failing_app([], status=400)], failures=1, cooldown=5.0)
+    backend = router.backends[0]
+    backend.failed(time.monotonic() - 10)
+    with pytest.raises(LLMError):
+        run(router, router.chat(MODEL, MESSAGES))
+    # 請求本身有問題不算後端失敗，下一個試探請求仍可送出
+    assert not backend.trial
+    assert backend.available(MODEL, time.monotonic())
+
+
+def test_health_check_drives_breaker_and_models():
+    router = make_router([fake(), failing_app([])], failures=1)
+    healthy, broken = router.backends
+    run(router, router.check_health())
+    assert healthy.models == {MODEL}
+    assert healthy.has_model(MODEL) and not healthy.has_model("llama3")
+    assert broken.opened_at is not None and broken.models is None
+
+
+def test_malformed_health_response_counts_as_failure():
+    app = FastAPI()
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"title": "qwen3:8b"}]}
+
+    router = make_router([app], failures=1)
+    run(router, router.check_health())
+    assert router.backends[0].opened_at is not None
+
+
+def test_model_tag():
+    assert model_tag("qwen3") == "qwen3:latest"
+    assert model_tag("qwen3:8b") == "qwen3:8b"
+    assert model_tag("registry:5000/team/qwen3") == "registry:5000/team/qwen3:latest"
@@ -0,0 +1,73 @@
+import pytest
+
+from app.transformers import summarizer, tokens
+from app.transformers.llm_router import Backend, LLMRouter
+from app.utils.config import EXTRACT_MIN_OUTPUT_TOKENS
+
+
+@pytest.fixture(autouse=True)
+def buckets(monkeypatch):
+    monkeypatch.setattr(tokens, "LLM_NUM_CTX_BUCKETS", [16384, 4096, 8192])
+
+
+def test_fit_num_ctx_picks_the_smallest_bucket():
+    assert tokens.fit_num_ctx(0, 32768) == 4096
+    assert tokens.fit_num_ctx(4096, 32768) == 4096
+    assert tokens.fit_num_ctx(4097, 32768) == 8192
+    assert tokens.fit_num_ctx(16385, 32768) == 32768
+    # 不超過上限：bucket 比 limit 大時用 limit
+    assert tokens.fit_num_ctx(5000, 8192) == 8192
+    assert tokens.fit_num_ctx(100, 4096) == 4096
+
+
+def test_context_bucket_reserves_room_for_the_output():
+    assert summarizer.context_bucket(0, 32768) == 4096
+    assert summarizer.context_bucket(4096 - EXTRACT_MIN_OUTPUT_TOKENS, 32768) == 4096
+    assert summarizer.context_bucket(4096 - EXTRACT_MIN_OUTPUT_TOKENS + 1, 32768) == 8192
+    # 輸出與輸入等長：8000 token 的輸入需要 16000
+    assert summarizer.context_bucket(8000, 32768) == 16384
+    assert summarizer.context_bucket(9000, 32768) == 32768
+
+
+def test_document_num_ctx_uses_the_largest_chunk():
+    short, long = "短" * 10, "字" * 6000
+    assert summarizer.document_num_ctx([short]) < summarizer.document_num_ctx([short, long])
+    assert summarizer.document_num_ctx([short, long]) == summarizer.document_num_ctx([long])
+
+
+def test_route_sizes_options_to_the_bucket():
+    _, options, prompt_tokens = summarizer.route("short text")
+    assert options["num_ctx"] == 4096
+    assert options["num_predict"] == 4096 - prompt_tokens
+    # 呼叫端為整份文件決定 num_ctx 時沿用
+    _, options, _ = summarizer.route("short text", num_ctx=16384)
+    assert options["num_ctx"] == 16384
+
+
+def backend(num_ctx=None, outstanding=0) -> Backend:
+    b = Backend("http://backend", 4, 3, 30.0)
+    b.num_ctx, b.outstanding = num_ctx, outstanding
+    return b
+
+
+def test_busy_backend_keeps_its_larger_context():
+    assert backend(16384, outstanding=1).context_for(4096) == 16384
+    assert not backend(16384, outstanding=1).reloads(4096)
+    # 閒置時換回較小的 num_ctx
+    assert backend(16384).context_for(4096) == 4096
+    # 較大的請求一定要換
+    assert backend(4096, outstanding=1).context_for(8192) == 8192
+    assert backend(4096, outstanding=1).reloads(8192)
+    assert not backend(None).reloads(4096)
+
+
+def test_router_prefers_a_backend_without_reload():
+    router = LLMRouter(hosts=["http://a", "http://b"], max_concurrency=4)
+    loaded_small, loaded_large = router.backends
+    loaded_small.num_ctx, loaded_small.outstanding = 4096, 1
+    loaded_large.num_ctx, loaded_large.outstanding = 16384, 2
+    # 負載較高但不必重新載入的後端優先
+    assert router._pick(summarizer.MODEL, set(), num_ctx=16384) is loaded_large
+    assert router._pick(summarizer.MODEL, set(), num_ctx=8192) is loaded_large
+    # 兩台都不必重新載入時比負載
+    assert router._pick(summarizer.MODEL, set(), num_ctx=4096) is loaded_small
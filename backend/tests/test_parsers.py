@@ -0,0 +1,209 @@
+import io
+import zipfile
+
+import docx
+import pytest
+from PIL import Image
+from PyPDF2.generic import ArrayObject, ByteStringObject, DictionaryObject, NameObject, NumberObject
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from app.utils import parsers
+
+
+def make_pdf(*pages, image_page=False) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for text in pages:
+        pdf.drawString(72, 720, text)
+        pdf.showPage()
+    if image_page:
+        pdf.drawImage(ImageReader(Image.new("RGB", (40, 20), "white")), 72, 600, 200, 100)
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def make_zip(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def make_docx(*paragraphs) -> bytes:
+    document = docx.Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+A = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+S = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+REL = 'xmlns="http://schemas.openxmlformats.org/package/2006/relationships"'
+
+
+def slide(*lines) -> str:
+    paragraphs = "".join(f"<a:p><a:r><a:t>{line}</a:t></a:r></a:p>" for line in lines)
+    return f'<p:sld xmlns:p="urn:p" {A}><p:txBody>{paragraphs}</p:txBody></p:sld>'
+
+
+def make_pptx() -> bytes:
+    return make_zip({
+        "[Content_Types].xml": "<Types/>",
+        "ppt/slides/slide10.xml": slide("Tenth"),
+        "ppt/slides/slide2.xml": slide("Second", "  "),
+        "ppt/slides/_rels/slide2.xml.rels": (
+            f'<Relationships {REL}><Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide" '
+            'Target="../notesSlides/notesSlide1.xml"/></Relationships>'
+        ),
+        "ppt/notesSlides/notesSlide1.xml": slide("Speaker note"),
+    })
+
+
+def make_xlsx() -> bytes:
+    return make_zip({
+        "[Content_Types].xml": "<Types/>",
+        "xl/workbook.xml": f'<workbook {S} {R}><sheets><sheet name="Budget" r:id="rId1"/></sheets></workbook>',
+        "xl/_rels/workbook.xml.rels": f'<Relationships {REL}><Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>',
+        "xl/sharedStrings.xml": f"<sst {S}><si><t>Item</t></si><si><r><t>Co</t></r><r><t>st</t></r></si></sst>",
+        "xl/worksheets/sheet1.xml": (
+            f'<worksheet {S}><sheetData>'
+            '<row><c t="s"><v>0</v></c><c t="s"><v>1</v></c></row>'
+            '<row><c t="inlineStr"><is><t>Servers</t></is></c><c><v>1200</v></c></row>'
+            '<row><c/></row>'
+            '</sheetData></worksheet>'
+        ),
+    })
+
+
+@pytest.mark.parametrize("filename, data, expected", [
+    ("report.pdf", make_pdf("x"), "pdf"),
+    ("mislabelled.txt", make_pdf("x"), "pdf"),
+    ("", make_docx("x"), "docx"),
+    ("deck.bin", make_pptx(), "pptx"),
+    ("sheet", make_xlsx(), "xlsx"),
+    ("notes.md", b"# Title", "markdown"),
+    ("page.HTML", b"hello", "html"),
+    ("plain.txt", b"<html><body>x</body></html>", "txt"),
+    ("", b"<!DOCTYPE html><html>x</html>", "html"),
+    ("", "純文字".encode("utf-8"), "txt"),
+])
+def test_detect_by_content(filename, data, expected):
+    assert parsers.detect(filename, data).name == expected
+
+
+def test_detect_reads_spooled_files(tmp_path):
+    path = tmp_path / "upload-1234"
+    path.write_bytes(make_docx("from disk"))
+    fmt = parsers.detect("", str(path))
+    assert fmt.name == "docx"
+    assert fmt.parse(str(path)) == ["from disk"]
+
+
+def test_detect_rejects_unknown_binary():
+    with pytest.raises(ValueError):
+        parsers.detect("image.png", b"\x89PNG\r\n\x1a\n\0\0\0")
+    with pytest.raises(ValueError):
+        parsers.detect("archive.zip", make_zip({"data/x.bin": "x"}))
+
+
+def test_text_cut_inside_a_multibyte_character_is_still_text():
+    data = ("中" * (parsers.SNIFF_BYTES // 3 + 1)).encode("utf-8")
+    assert parsers.detect("", data).name == "txt"
+
+
+def test_parse_pdf_pages():
+    assert [page.strip() for page in parsers.parse_pdf(make_pdf("First page", "Second page"))] == ["First page", "Second page"]
+    assert parsers.pdf_page_count(make_pdf("a", "b", "c")) == 3
+
+
+def test_pdf_pages_flags_scanned_pages(monkeypatch):
+    monkeypatch.setattr(parsers, "OCR_ENABLED", True)
+    data = make_pdf("A page with a real text layer", image_page=True)
+    flags = [needs_ocr for _, _, needs_ocr in parsers.pdf_pages(data, 0, None)]
+    assert flags == [False, True]
+    assert [needs_ocr for _, _, needs_ocr in parsers.pdf_pages(data, 1, 2)] == [True]
+    monkeypatch.setattr(parsers, "OCR_ENABLED", False)
+    assert [needs_ocr for _, _, needs_ocr in parsers.pdf_pages(data, 0, None)] == [False, False]
+
+
+def test_ocr_without_tesseract_reports_unavailable(monkeypatch):
+    import builtins
+
+    real_import = builtins.__import__
+
+    def no_pytesseract(name, *args, **kwargs):
+        if name == "pytesseract":
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", no_pytesseract)
+    data = make_pdf(image_page=True)
+    assert parsers.ocr_pdf_pages(data, [0]) == [("", 0.0, "unavailable")]
+
+
+def test_color_mode_of_names_and_arrays():
+    icc = DictionaryObject({NameObject("/N"): NumberObject(1)})
+    assert parsers._color_mode(NameObject("/DeviceCMYK")) == "CMYK"
+    assert parsers._color_mode(NameObject("/CalGray")) == "L"
+    assert parsers._color_mode(ArrayObject([NameObject("/ICCBased"), icc])) == "L"
+    assert parsers._color_mode(ArrayObject([NameObject("/Indexed"), NameObject("/DeviceRGB"), NumberObject(1), ByteStringObject(b"")])) == "P"
+    assert parsers._color_mode(ArrayObject([NameObject("/Separation")])) == "RGB"
+    assert parsers._color_mode(None) == "RGB"
+
+
+class RawImage(dict):
+    """Stand-in for an uncompressed image XObject."""
+
+    def __init__(self, data: bytes, **entries):
+        super().__init__(entries)
+        self.data = data
+
+    def get_data(self):
+        return self.data
+
+
+@pytest.mark.parametrize("base, palette, expected", [
+    ("/DeviceRGB", bytes([255, 0, 0, 0, 0, 255]), [(255, 0, 0), (0, 0, 255)]),
+    ("/DeviceGray", bytes([10, 200]), [(10, 10, 10), (200, 200, 200)]),
+])
+def test_indexed_images_are_converted_through_the_palette(base, palette, expected):
+    space = ArrayObject([NameObject("/Indexed"), NameObject(base), NumberObject(1), ByteStringObject(palette)])
+    obj = RawImage(bytes([0, 1]), **{"/ColorSpace": space, "/Width": 2, "/Height": 1, "/BitsPerComponent": 8})
+    image = parsers._to_image(obj)
+    assert image.mode == "RGB"
+    assert [image.getpixel((x, 0)) for x in range(2)] == expected
+
+
+def test_raw_gray_image():
+    obj = RawImage(bytes([0, 128, 255]), **{"/ColorSpace": NameObject("/DeviceGray"), "/Width": 3, "/Height": 1})
+    image = parsers._to_image(obj)
+    assert image.mode == "L" and [image.getpixel((x, 0)) for x in range(3)] == [0, 128, 255]
+
+
+def test_parse_office_formats():
+    assert parsers.parse_docx(make_docx("Line one", "Line two")) == ["Line one\nLine two"]
+    # 投影片依編號排序，備忘稿接在投影片文字之後
+    assert parsers.parse_pptx(make_pptx()) == ["Second\nSpeaker note", "Tenth"]
+    assert parsers.parse_xlsx(make_xlsx()) == ["Budget\nItem\tCost\nServers\t1200"]
+
+
+def test_parse_markup_and_text():
+    html = b"<html><head><title>t</title></head><body><p>One &amp; two</p><script>x()</script><p>Three</p></body></html>"
+    assert parsers.parse_html(html) == ["One & two\n\nThree"]
+    markdown = "# Heading\n\nSome **bold** and [a link](http://x) `code`\n\f> Quoted".encode("utf-8")
+    assert parsers.parse_markdown(markdown) == ["Heading\n\nSome bold and a link code\n", "Quoted"]
+    assert parsers.parse_txt("\ufeffpage one\fpage two".encode("utf-8")) == ["page one", "page two"]
+
+
+def test_parse_source_uses_the_detected_format():
+    from app.utils.file_parser import parse_source
+
+    assert parse_source("markdown", b"# Title").text == "Title"
+    assert parse_source("txt", b"# Title").text == "# Title"
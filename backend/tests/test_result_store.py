@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services.result_service import COLUMNS, ResultStore, document_id, result_key
+
+
+def summary(doc_id, *levels, title="Spec"):
+    return {
+        "document_metadata": {"document_id": doc_id, "document_title": title},
+        "contexts": [
+            {
+                "context_id": f"CTX-{i:03d}",
+                "decision_level": level,
+                "title": {"en": f"{doc_id} decision {i}", "zh": ""},
+                "primary_roles": ["Architect", "Operator"],
+                "decision_boundaries": [{"boundary_type": "Technical", "affected_roles": ["Operator"]}],
+            }
+            for i, level in enumerate(levels, 1)
+        ],
+    }
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "results")
+
+
+def test_round_trip_and_reopen(directory):
+    first, second = summary("DOC-1", "L", "S"), summary("DOC-2", "M")
+    store = ResultStore(directory)
+    key = store.put(first, source_hash="abc")
+    store.put(second)
+    assert store.put(first) == key
+    assert store.load_summary(key) == first
+    assert store.context(key, 1) == first["contexts"][1]
+    assert store.context(key, 2) is None
+
+    reopened = ResultStore(directory)
+    reopened.load()
+    assert reopened.load_summary(key) == first
+    assert reopened.entry(key)["source_sha256"] == "abc"
+    assert reopened.count() == {"L": 1, "M": 1, "S": 1}
+    # 角色字串只存一次
+    assert reopened.strings.count("Operator") == 1
+
+
+def test_partial_catalog_line_is_cut_off(directory):
+    store = ResultStore(directory)
+    kept = store.put(summary("DOC-1", "L"))
+    store.put(summary("DOC-2", "M", "S"))
+    catalog = os.path.join(directory, "catalog.jsonl")
+    size = os.path.getsize(catalog)
+    with open(catalog, "rb+") as f:
+        # 模擬第二筆 catalog 寫到一半時當機
+        lines = f.read().splitlines(keepends=True)
+        f.truncate(len(lines[0]) + len(lines[1]) // 2)
+    assert os.path.getsize(catalog) < size
+
+    reopened = ResultStore(directory)
+    reopened.load()
+    assert [e["key"] for e in reopened.documents] == [kept]
+    assert reopened.rows == 1
+    for name, dtype in COLUMNS.items():
+        assert os.path.getsize(os.path.join(directory, f"{name}.col")) == np.dtype(dtype).itemsize
+    assert os.path.getsize(catalog) == len(lines[0])
+
+    # 之後的寫入接在完整的資料後面
+    again = reopened.put(summary("DOC-3", "S", "S"))
+    assert ResultStore(directory).load_summary(again) == summary("DOC-3", "S", "S")
+    assert ResultStore(directory).count() == {"L": 1, "M": 0, "S": 2}
+
+
+def test_rows_without_catalog_entry_are_ignored(directory):
+    store = ResultStore(directory)
+    store.put(summary("DOC-1", "L"))
+    # 欄位寫完但 catalog 尚未寫入
+    for name, dtype in COLUMNS.items():
+        with open(os.path.join(directory, f"{name}.col"), "ab") as f:
+            f.write(np.zeros(3, dtype=dtype).tobytes())
+    reopened = ResultStore(directory)
+    reopened.load()
+    assert reopened.rows == 1
+    key = reopened.put(summary("DOC-2", "M"))
+    assert reopened.context(key, 0)["decision_level"] == "M"
+
+
+def test_newer_revision_supersedes_only_its_lineage(directory):
+    store = ResultStore(directory)
+    old = store.put(summary("DOC-1", "L", "L"), lineage="lineage-a")
+    new = store.put(summary("DOC-1", "M"), lineage="lineage-a")
+    # 模型給了相同的 document_id，但是不同文件
+    other = store.put(summary("DOC-1", "S", title="Other"), lineage="lineage-b")
+
+    assert [e["key"] for e in store.catalog()] == [other, new]
+    assert [e["key"] for e in store.catalog(latest=False)] == [other, new, old]
+    assert store.count() == {"L": 0, "M": 1, "S": 1}
+    assert store.count(latest=False) == {"L": 2, "M": 1, "S": 1}
+    assert ResultStore(directory).count() == {"L": 0, "M": 1, "S": 1}
+
+
+def test_scan_filters_and_pages(directory):
+    store = ResultStore(directory)
+    store.put(summary("DOC-1", "L", "M", "L"))
+    store.put(summary("DOC-2", "L", "S"))
+    titles = [c["title"]["en"] for _, c in store.scan("L")]
+    assert titles == ["DOC-1 decision 1", "DOC-1 decision 3", "DOC-2 decision 1"]
+    page = [(e["document_id"], c["title"]["en"]) for e, c in store.scan("L", offset=1, limit=1)]
+    assert page == [("DOC-1", "DOC-1 decision 3")]
+    assert len(list(store.scan())) == 5
+    assert list(store.scan("L", offset=10)) == []
+
+
+def test_document_id_falls_back_to_title_then_content_hash():
+    assert document_id(summary("DOC-1")) == "DOC-1"
+    assert document_id(summary("", title="Spec")) == "Spec"
+    untitled = summary("", "L", title="")
+    assert document_id(untitled) == result_key(untitled)[:16]
+    assert document_id(summary("", "M", title="")) != document_id(untitled)
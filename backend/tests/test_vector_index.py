@@ -0,0 +1,46 @@
+from app.services.vector_service import VectorIndex
+
+
+def summary(doc_id, title, *decisions):
+    return {
+        "document_metadata": {"document_id": doc_id, "document_title": title},
+        "contexts": [
+            {"context_id": f"CTX-{i:03d}", "decision_level": "M", "title": {"en": text, "zh": ""}}
+            for i, text in enumerate(decisions, 1)
+        ],
+    }
+
+
+def ids(results):
+    return {(r["document_key"], r["context_id"]) for r in results}
+
+
+def test_documents_sharing_an_id_stay_searchable(tmp_path):
+    index = VectorIndex(str(tmp_path))
+    index.add_summary(summary("DOC-001", "Pump manual", "replace the pump seal"), lineage="pump")
+    # 另一份文件，模型擷取出相同的 document_id
+    index.add_summary(summary("DOC-001", "Valve manual", "calibrate the valve"), lineage="valve")
+
+    assert ids(index.search("pump seal", k=5)) >= {("pump", "CTX-001")}
+    assert ids(index.search("valve", k=5)) >= {("valve", "CTX-001")}
+    assert {r["document_id"] for r in index.search("pump seal valve", k=5)} == {"DOC-001"}
+
+
+def test_new_revision_replaces_only_its_lineage(tmp_path):
+    index = VectorIndex(str(tmp_path))
+    index.add_summary(summary("DOC-001", "Pump manual", "replace the pump seal"), lineage="pump")
+    index.add_summary(summary("DOC-001", "Valve manual", "calibrate the valve"), lineage="valve")
+    index.add_summary(summary("DOC-001", "Pump manual", "inspect the pump bearing"), lineage="pump")
+
+    for reopened in (index, VectorIndex(str(tmp_path))):
+        found = ids(reopened.search("pump seal bearing valve", k=10))
+        assert found == {("pump", "CTX-001"), ("valve", "CTX-001")}
+        titles = {r["title"] for r in reopened.search("pump", k=10)}
+        assert "replace the pump seal" not in titles
+
+
+def test_results_without_lineage_are_kept_apart(tmp_path):
+    index = VectorIndex(str(tmp_path))
+    index.add_summary(summary("", "", "first untitled decision"))
+    index.add_summary(summary("", "", "second untitled decision"))
+    assert len(ids(index.search("untitled decision", k=10))) == 2
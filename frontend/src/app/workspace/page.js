@@ -63,7 +63,7 @@ export default function WorkspacePage() {
           <label>上傳檔案</label>
           <input
             type="file"
-            accept=".pdf,.docx,.txt"
+            accept=".pdf,.docx,.pptx,.xlsx,.html,.htm,.md,.markdown,.txt"
             onChange={(e) => setFile(e.target.files[0])}
           />
 